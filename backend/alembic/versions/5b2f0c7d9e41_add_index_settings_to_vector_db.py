@@ -0,0 +1,34 @@
+"""Add index settings to vector_db
+
+Revision ID: 5b2f0c7d9e41
+Revises: 87fe3a21c65b
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2f0c7d9e41'
+down_revision = '87fe3a21c65b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Add index selection columns to vector_dbs table
+    op.add_column('vector_dbs', sa.Column('index_type', sa.String(), nullable=True))
+    op.add_column('vector_dbs', sa.Column('index_params', sa.JSON(), nullable=True))
+    
+    # Existing vector databases keep exact search
+    op.execute("UPDATE vector_dbs SET index_type = 'flat' WHERE index_type IS NULL")
+    
+    # Make index_type column not nullable
+    op.alter_column('vector_dbs', 'index_type', nullable=False)
+
+
+def downgrade():
+    # Drop the new columns
+    op.drop_column('vector_dbs', 'index_params')
+    op.drop_column('vector_dbs', 'index_type')
@@ -0,0 +1,37 @@
+"""Add embedding cache
+
+Revision ID: 8d4e6a1b2c93
+Revises: 5b2f0c7d9e41
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e6a1b2c93'
+down_revision = '5b2f0c7d9e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create embedding_cache table keyed by (model, sha256 of chunk text)
+    op.create_table('embedding_cache',
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.Column('dtype', sa.String(), nullable=False),
+        sa.Column('dimensions', sa.Integer(), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('model', 'text_hash')
+    )
+    op.create_index('ix_embedding_cache_last_used_at', 'embedding_cache', ['last_used_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_embedding_cache_last_used_at', table_name='embedding_cache')
+    op.drop_table('embedding_cache')
@@ -0,0 +1,92 @@
+"""Add chunks table
+
+Revision ID: a4d6f1c8b357
+Revises: f2c8a3e9d614
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d6f1c8b357'
+down_revision = 'f2c8a3e9d614'
+branch_labels = None
+depends_on = None
+
+
+chunks_table = sa.table('chunks',
+    sa.column('id', sa.String()),
+    sa.column('embedding_id', sa.String()),
+    sa.column('position', sa.Integer()),
+    sa.column('start', sa.Integer()),
+    sa.column('end', sa.Integer()),
+    sa.column('token_count', sa.Integer()),
+    sa.column('text', sa.Text()),
+    sa.column('text_hash', sa.String())
+)
+
+
+def upgrade():
+    # Create chunks table, one row per chunk, keyed by the chunk's vector id
+    op.create_table('chunks',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('embedding_id', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('start', sa.Integer(), nullable=False),
+        sa.Column('end', sa.Integer(), nullable=False),
+        sa.Column('token_count', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('text_hash', sa.String(length=64), nullable=False),
+        sa.ForeignKeyConstraint(['embedding_id'], ['embeddings.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_chunks_embedding_id_position', 'chunks', ['embedding_id', 'position'], unique=True)
+    op.add_column('embeddings', sa.Column('num_chunks', sa.Integer(), nullable=False, server_default='0'))
+    
+    # Move chunks stored as a JSON list of {"text", "metadata": {...}} into rows
+    connection = op.get_bind()
+    embeddings = connection.execute(sa.text(
+        "SELECT id, chunks FROM embeddings WHERE chunks IS NOT NULL"
+    )).fetchall()
+    for embedding_id, chunks_json in embeddings:
+        try:
+            chunks = json.loads(chunks_json)
+        except ValueError:
+            continue
+        if not isinstance(chunks, list):
+            continue
+        rows = [
+            {
+                'id': f"{embedding_id}:{chunk['metadata']['position']}",
+                'embedding_id': embedding_id,
+                'position': chunk['metadata']['position'],
+                'start': chunk['metadata']['start'],
+                'end': chunk['metadata']['end'],
+                'token_count': len(chunk['text'].split()),
+                'text': chunk['text'],
+                'text_hash': hashlib.sha256(chunk['text'].encode('utf-8')).hexdigest()
+            }
+            for chunk in chunks
+        ]
+        if rows:
+            op.bulk_insert(chunks_table, rows)
+        connection.execute(
+            sa.text("UPDATE embeddings SET num_chunks = :n WHERE id = :id"),
+            {'n': len(rows), 'id': embedding_id}
+        )
+    
+    with op.batch_alter_table('embeddings') as batch_op:
+        batch_op.drop_column('chunks')
+
+
+def downgrade():
+    with op.batch_alter_table('embeddings') as batch_op:
+        batch_op.add_column(sa.Column('chunks', sa.Text(), nullable=True))
+        batch_op.drop_column('num_chunks')
+    op.drop_index('ix_chunks_embedding_id_position', table_name='chunks')
+    op.drop_table('chunks')
@@ -0,0 +1,46 @@
+"""Add background jobs
+
+Revision ID: c3a9e5f17b20
+Revises: 8d4e6a1b2c93
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e5f17b20'
+down_revision = '8d4e6a1b2c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create background_jobs table backing the durable job queue
+    op.create_table('background_jobs',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('progress', sa.JSON(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_background_jobs_claim', 'background_jobs', ['status', 'priority', 'created_at'], unique=False)
+    op.create_index('ix_background_jobs_heartbeat_at', 'background_jobs', ['heartbeat_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_background_jobs_heartbeat_at', table_name='background_jobs')
+    op.drop_index('ix_background_jobs_claim', table_name='background_jobs')
+    op.drop_table('background_jobs')
@@ -0,0 +1,37 @@
+"""Add blob storage to documents
+
+Revision ID: e7b1d4a6f052
+Revises: c3a9e5f17b20
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b1d4a6f052'
+down_revision = 'c3a9e5f17b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Uploaded files live in the blob store; the row keeps metadata and the blob address
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.add_column(sa.Column('storage', sa.String(), nullable=False, server_default='inline'))
+        batch_op.add_column(sa.Column('content_sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('mime_type', sa.String(), nullable=True))
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=True)
+        batch_op.create_index('ix_documents_content_sha256', ['content_sha256'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_index('ix_documents_content_sha256')
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('mime_type')
+        batch_op.drop_column('size_bytes')
+        batch_op.drop_column('content_sha256')
+        batch_op.drop_column('storage')
@@ -0,0 +1,34 @@
+"""Add extracted texts
+
+Revision ID: f2c8a3e9d614
+Revises: e7b1d4a6f052
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8a3e9d614'
+down_revision = 'e7b1d4a6f052'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create extracted_texts table caching extraction output by content hash
+    op.create_table('extracted_texts',
+        sa.Column('content_sha256', sa.String(length=64), nullable=False),
+        sa.Column('file_type', sa.String(), nullable=False),
+        sa.Column('extractor_version', sa.String(), nullable=False),
+        sa.Column('page_offsets', sa.JSON(), nullable=False),
+        sa.Column('num_pages', sa.Integer(), nullable=False),
+        sa.Column('num_chars', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('content_sha256', 'file_type', 'extractor_version')
+    )
+
+
+def downgrade():
+    op.drop_table('extracted_texts')
@@ -1,31 +1,72 @@
 import os
-import requests
-from fastapi import APIRouter, Depends, HTTPException, Body
+import json
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 
 from app.api.dependencies.users import get_current_active_user
+from app.core import ollama_client
+from app.core.ollama_client import OllamaError
 from app.db.database import get_db
 from app.models.user import User
 from app.services.tool_service import get_tools_for_model
 from app.services.prompt_service import get_prompt_by_id
 
-# Ollama API URL
-OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api")
-
 # OpenAI API details (will be used in future implementations)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
 
 router = APIRouter(prefix="/api/v1/chat", tags=["chat"])
 
+def _format_event(event: Dict[str, Any], sse: bool) -> str:
+    data = json.dumps(event)
+    return f"data: {data}\n\n" if sse else data + "\n"
+
+async def _stream_chat_response(ollama_request: Dict[str, Any], sse: bool) -> StreamingResponse:
+    """Open a streamed Ollama generation and relay tokens as they arrive."""
+    try:
+        upstream = await ollama_client.open_stream("generate", ollama_request)
+    except OllamaError as e:
+        # Errors before the first token still get a proper status code
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    
+    async def _relay() -> AsyncIterator[str]:
+        try:
+            async for line in upstream.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    yield _format_event({"error": chunk["error"], "done": True}, sse)
+                    break
+                event = {"response": chunk.get("response", ""), "done": chunk.get("done", False)}
+                if event["done"]:
+                    event["context"] = chunk.get("context", [])
+                    event["tool_calls"] = []
+                yield _format_event(event, sse)
+        except Exception as e:
+            yield _format_event({"error": f"Error streaming from Ollama: {str(e)}", "done": True}, sse)
+        finally:
+            await upstream.aclose()
+    
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(_relay(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
 @router.post("/generate")
 async def generate_chat_response(
+    http_request: Request,
     request: Dict = Body(...),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Generate chat response with optional tool support."""
+    """Generate chat response with optional tool support.
+    
+    With "stream": true the response is streamed as NDJSON, or as
+    Server-Sent Events when the client accepts text/event-stream. Each event
+    carries only the text generated since the previous one (the client
+    appends it); the final one has "done": true and the conversation context.
+    """
     try:
         model = request.get("model", "")
         prompt = request.get("prompt", "")
@@ -33,11 +74,12 @@ async def generate_chat_response(
         tools_enabled = request.get("tools", False)
         selected_tools = request.get("selectedTools", [])
         context = request.get("context", [])
+        stream = bool(request.get("stream", False))
 
         # Get system prompt if prompt_id is provided
         if system and system.startswith("prompt:"):
             prompt_id = system.replace("prompt:", "")
-            prompt_obj = get_prompt_by_id(db, prompt_id)
+            prompt_obj = await get_prompt_by_id(db, prompt_id, current_user.id)
             if prompt_obj:
                 system = prompt_obj.content
         
@@ -51,7 +93,7 @@ async def generate_chat_response(
             "model": model,
             "prompt": prompt,
             "system": system,
-            "stream": False,
+            "stream": stream,
         }
         
         # Add context if provided
@@ -82,25 +124,15 @@ async def generate_chat_response(
                 else:
                     ollama_request["system"] = tools_description
         
-        # Make the request to Ollama
-        response = requests.post(
-            f"{OLLAMA_API_URL}/generate", 
-            json=ollama_request,
-            timeout=180  # Add a 180-second timeout
-        )
+        if stream:
+            sse = "text/event-stream" in http_request.headers.get("accept", "")
+            return await _stream_chat_response(ollama_request, sse)
         
-        # Check for errors
-        if not response.ok:
-            error_msg = "Error from Ollama API"
-            try:
-                error_data = response.json()
-                if "error" in error_data:
-                    error_msg = error_data["error"]
-            except:
-                pass
-            raise HTTPException(status_code=response.status_code, detail=error_msg)
-            
-        result = response.json()
+        # Make the request to Ollama
+        try:
+            result = await ollama_client.post("generate", ollama_request)
+        except OllamaError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.message)
         
         # Process the response
         response_text = result.get("response", "")
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Path, Body, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -8,8 +9,10 @@ from app.models.user import User
 from app.schemas.document import DocumentCreate, DocumentUpdate, Document, DocumentList
 from app.services.document_service import (
     get_documents, get_document_by_id, create_document, 
-    upload_document, update_document, delete_document, extract_text
+    upload_document, update_document, delete_document, extract_pages,
+    get_document_content
 )
+from app.services.extraction import ExtractionError, UnsupportedFileType, PAGE_SEPARATOR
 
 router = APIRouter(prefix="/api/v1/documents", tags=["documents"])
 
@@ -38,11 +41,33 @@ async def get_document(
     db: Session = Depends(get_db)
 ):
     """Get a specific document by ID."""
-    document = get_document_by_id(db, document_id, current_user.id)
+    document = get_document_by_id(db, document_id, current_user.id, with_content=True)
     if document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     return document
 
+@router.get("/{document_id}/content")
+async def get_document_raw_content(
+    document_id: str = Path(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Download a document's original file content."""
+    document = get_document_by_id(db, document_id, current_user.id, with_content=True)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    headers = {}
+    if document.size_bytes is not None:
+        headers["Content-Length"] = str(document.size_bytes)
+    if document.content_sha256:
+        headers["ETag"] = f'"{document.content_sha256}"'
+    return StreamingResponse(
+        get_document_content(document),
+        media_type=document.mime_type or "application/octet-stream",
+        headers=headers
+    )
+
 @router.post("", response_model=Document, status_code=201)
 async def create_new_document(
     document_in: DocumentCreate,
@@ -73,8 +98,14 @@ async def extract_document_text(
     if document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    text = await extract_text(document)
-    return {"text": text, "document_id": document_id}
+    try:
+        pages = list(await extract_pages(db, document))
+    except UnsupportedFileType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return {"text": PAGE_SEPARATOR.join(pages), "pages": len(pages), "document_id": document_id}
 
 @router.put("/{document_id}", response_model=Document)
 async def update_existing_document(
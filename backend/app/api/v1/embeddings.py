@@ -8,13 +8,16 @@ from app.models.user import User
 from app.models.embedding import Embedding
 from app.schemas.embedding import (
     EmbeddingCreate, Embedding as EmbeddingSchema, 
-    EmbeddingList, EmbeddingTaskResponse
+    EmbeddingList, EmbeddingTaskResponse, Chunk as ChunkSchema, ChunkList,
+    EmbeddingBulkCreate, EmbeddingBulkTaskResponse
 )
 from app.services.embedding_service import (
     get_embeddings, get_embedding_by_id, 
-    create_embedding, delete_embedding,
+    create_embedding, create_embeddings_bulk, delete_embedding,
     get_embedding_task_status
 )
+from app.services.embedding_cache import get_embedding_cache_stats
+from app.services.chunk_service import get_chunks, get_chunk
 
 router = APIRouter(prefix="/api/v1/embeddings", tags=["embeddings"])
 
@@ -28,7 +31,7 @@ async def list_embeddings(
     db: Session = Depends(get_db)
 ):
     """Get all embeddings with filtering and pagination."""
-    embeddings, total = get_embeddings(
+    embeddings, total = await get_embeddings(
         db, 
         user_id=current_user.id, 
         skip=skip, 
@@ -72,6 +75,14 @@ async def get_embedding_models(
         }
     ]
 
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_cache_stats(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get embedding cache hit/miss counters and size."""
+    return get_embedding_cache_stats(db)
+
 @router.get("/{embedding_id}", response_model=EmbeddingSchema)
 async def get_embedding(
     embedding_id: str = Path(...),
@@ -79,11 +90,44 @@ async def get_embedding(
     db: Session = Depends(get_db)
 ):
     """Get a specific embedding by ID."""
-    embedding = get_embedding_by_id(db, embedding_id, current_user.id)
+    embedding = await get_embedding_by_id(db, embedding_id, current_user.id)
     if embedding is None:
         raise HTTPException(status_code=404, detail="Embedding not found")
     return embedding
 
+@router.get("/{embedding_id}/chunks", response_model=ChunkList)
+async def list_embedding_chunks(
+    embedding_id: str = Path(...),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get an embedding's chunks in document order with pagination."""
+    embedding = await get_embedding_by_id(db, embedding_id, current_user.id)
+    if embedding is None:
+        raise HTTPException(status_code=404, detail="Embedding not found")
+    
+    chunks, total = get_chunks(db, embedding_id, skip=skip, limit=limit)
+    return {"items": chunks, "total": total}
+
+@router.get("/{embedding_id}/chunks/{position}", response_model=ChunkSchema)
+async def get_embedding_chunk(
+    embedding_id: str = Path(...),
+    position: int = Path(..., ge=0),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get one chunk of an embedding by its position."""
+    embedding = await get_embedding_by_id(db, embedding_id, current_user.id)
+    if embedding is None:
+        raise HTTPException(status_code=404, detail="Embedding not found")
+    
+    chunk = get_chunk(db, embedding_id, position)
+    if chunk is None:
+        raise HTTPException(status_code=404, detail="Chunk not found")
+    return chunk
+
 @router.post("", response_model=EmbeddingTaskResponse)
 async def create_embedding_task(
     embedding_request: EmbeddingCreate,
@@ -91,7 +135,16 @@ async def create_embedding_task(
     db: Session = Depends(get_db)
 ):
     """Create an embedding (starts async task)."""
-    return create_embedding(db, embedding_request, current_user.id)
+    return await create_embedding(db, embedding_request, current_user.id)
+
+@router.post("/bulk", response_model=EmbeddingBulkTaskResponse)
+async def create_bulk_embedding_task(
+    bulk_request: EmbeddingBulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Embed many documents in one pipelined job; progress is reported under its task ID."""
+    return await create_embeddings_bulk(db, bulk_request, current_user.id)
 
 @router.get("/tasks/{task_id}")
 async def check_task_status(
@@ -100,7 +153,7 @@ async def check_task_status(
     db: Session = Depends(get_db)
 ):
     """Check embedding task status."""
-    return get_embedding_task_status(task_id)
+    return await get_embedding_task_status(task_id)
 
 @router.delete("/{embedding_id}", status_code=204)
 async def delete_existing_embedding(
@@ -109,9 +162,9 @@ async def delete_existing_embedding(
     db: Session = Depends(get_db)
 ):
     """Delete an embedding."""
-    embedding = get_embedding_by_id(db, embedding_id, current_user.id)
+    embedding = await get_embedding_by_id(db, embedding_id, current_user.id)
     if embedding is None:
         raise HTTPException(status_code=404, detail="Embedding not found")
     
-    delete_embedding(db, embedding_id)
+    await delete_embedding(db, embedding_id)
     return None
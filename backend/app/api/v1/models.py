@@ -16,7 +16,7 @@ async def get_model_list(
 ):
     """Get list of available Ollama models."""
     try:
-        return list_models()
+        return await list_models()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error connecting to Ollama: {str(e)}")
 
@@ -33,7 +33,7 @@ async def create_new_model(
         if not name or not modelfile:
             raise HTTPException(status_code=400, detail="Name and modelfile are required")
         
-        return create_model(name, modelfile)
+        return await create_model(name, modelfile)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating model: {str(e)}")
 
@@ -44,7 +44,7 @@ async def get_model_file(
 ):
     """Get the modelfile for a specific model."""
     try:
-        return get_modelfile(name)
+        return await get_modelfile(name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting modelfile: {str(e)}")
 
@@ -55,7 +55,7 @@ async def delete_existing_model(
 ):
     """Delete an Ollama model."""
     try:
-        return delete_model(name)
+        return await delete_model(name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting model: {str(e)}")
 @router.post("/generate")
@@ -65,7 +65,7 @@ async def generate_text(
 ):
     """Generate text using an Ollama model."""
     try:
-        return generate(request)
+        return await generate(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating text: {str(e)}")
 
@@ -76,6 +76,6 @@ async def create_embeddings(
 ):
     """Create embeddings using an Ollama model."""
     try:
-        return get_embeddings(request)
+        return await get_embeddings(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating embeddings: {str(e)}")
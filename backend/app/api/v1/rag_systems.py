@@ -5,11 +5,15 @@ from typing import List, Dict, Any
 from app.api.dependencies.users import get_current_active_user
 from app.db.database import get_db
 from app.models.user import User
-from app.schemas.rag_system import RAGSystemCreate, RAGSystemUpdate, RAGSystem, RAGSystemList, RAGSystemQuery
+from app.schemas.rag_system import (
+    RAGSystemCreate, RAGSystemUpdate, RAGSystem, RAGSystemList, RAGSystemQuery,
+    RAGSystemBatchQuery, RAGSystemBatchRetrieval
+)
 from app.services.rag_service import (
     get_rag_systems, get_rag_system_by_id, create_rag_system, 
-    update_rag_system, delete_rag_system, test_rag_system
+    update_rag_system, delete_rag_system, test_rag_system, retrieve_batch
 )
+from app.services.query_embedding_cache import get_query_cache_stats
 
 router = APIRouter(prefix="/api/v1/rag-systems", tags=["rag systems"])
 
@@ -29,6 +33,13 @@ async def list_all_rag_systems(
     )
     return {"items": rag_systems, "total": total}
 
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_cache_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get query-embedding cache hit/miss counters and size."""
+    return get_query_cache_stats()
+
 @router.get("/{rag_system_id}", response_model=RAGSystem)
 async def get_rag_system(
     rag_system_id: str = Path(...),
@@ -90,4 +101,32 @@ async def test_existing_rag_system(
     if rag_system is None:
         raise HTTPException(status_code=404, detail="RAG system not found")
     
-    return await test_rag_system(db, rag_system, query.text)
+    options = {
+        name: value for name, value in {
+            "top_k": query.top_k,
+            "model": query.model,
+            "max_context_tokens": query.max_context_tokens,
+            "retrieval": query.retrieval
+        }.items() if value is not None
+    }
+    return await test_rag_system(db, rag_system, query.text, **options)
+
+@router.post("/{rag_system_id}/retrieve", response_model=RAGSystemBatchRetrieval)
+async def retrieve_from_rag_system(
+    rag_system_id: str = Path(...),
+    batch: RAGSystemBatchQuery = Body(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Retrieve ranked chunks for many queries in one batched pass (no generation)."""
+    rag_system = get_rag_system_by_id(db, rag_system_id, current_user.id)
+    if rag_system is None:
+        raise HTTPException(status_code=404, detail="RAG system not found")
+    
+    options = {
+        name: value for name, value in {
+            "top_k": batch.top_k,
+            "retrieval": batch.retrieval
+        }.items() if value is not None
+    }
+    return await retrieve_batch(db, rag_system, batch.queries, **options)
@@ -5,10 +5,14 @@ from typing import List, Optional, Dict
 from app.api.dependencies.users import get_current_active_user
 from app.db.database import get_db
 from app.models.user import User
-from app.schemas.vector_db import VectorDBCreate, VectorDBUpdate, VectorDB, VectorDBList
+from app.schemas.vector_db import (
+    VectorDBCreate, VectorDBUpdate, VectorDB, VectorDBList,
+    VectorSearchRequest, VectorSearchResponse
+)
 from app.services.vector_db_service import (
     get_vector_dbs, get_vector_db_by_id, create_vector_db, 
-    delete_vector_db, get_vector_db_types
+    delete_vector_db, get_vector_db_types, search_vector_db,
+    get_vector_index_stats, attach_chunk_text
 )
 
 router = APIRouter(prefix="/api/v1/vector-dbs", tags=["vector databases"])
@@ -80,6 +84,42 @@ async def create_new_vector_db(
     """Create a new vector database configuration."""
     return create_vector_db(db, vector_db_in, current_user.id)
 
+@router.post("/{db_id}/search", response_model=VectorSearchResponse)
+async def search_vectors(
+    db_id: str = Path(...),
+    search_in: VectorSearchRequest = Body(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Top-k similarity search for one or more query vectors."""
+    vector_db = get_vector_db_by_id(db, db_id, current_user.id)
+    if vector_db is None:
+        raise HTTPException(status_code=404, detail="Vector database not found")
+    
+    results = search_vector_db(
+        vector_db,
+        search_in.vectors,
+        top_k=search_in.top_k,
+        embedding_ids=search_in.embedding_ids,
+        nprobe=search_in.nprobe
+    )
+    if search_in.include_text:
+        results = attach_chunk_text(db, results)
+    return {"results": results}
+
+@router.get("/{db_id}/index", response_model=Dict)
+async def get_vector_index_info(
+    db_id: str = Path(...),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get size and configuration of a vector database's index."""
+    vector_db = get_vector_db_by_id(db, db_id, current_user.id)
+    if vector_db is None:
+        raise HTTPException(status_code=404, detail="Vector database not found")
+    
+    return get_vector_index_stats(vector_db)
+
 @router.delete("/{db_id}", status_code=204)
 async def delete_existing_vector_db(
     db_id: str = Path(...),
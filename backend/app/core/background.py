@@ -1,14 +1,46 @@
+"""
+Durable background job queue.
+
+Jobs are rows in the `background_jobs` table, so their state survives
+restarts and any worker process can report on them. Every app process runs
+JOB_WORKER_CONCURRENCY worker coroutines that claim pending jobs (highest
+priority first, then oldest) with a conditional UPDATE, so a job runs in one
+place only. Failed attempts are retried with exponential backoff, and jobs
+whose worker stopped heartbeating (crash, kill -9) go back to the queue.
+
+Handlers are registered by name and receive the job's JSON payload as
+keyword arguments:
+
+    @job_handler("embeddings.process")
+    async def process(embedding_id: str, ...): ...
+
+    job_id = enqueue_job("embeddings.process", {"embedding_id": ...})
+"""
 from fastapi import BackgroundTasks
-from typing import Callable, Any, Dict, List
+from typing import Callable, Any, Awaitable, Dict, List, Optional
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
 import asyncio
-import time
-import uuid
 import os
+import socket
+
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+
+from app.db.database import SessionLocal
+from app.models.job import Job
 from app.utils.logging import logger
 
-# In-memory storage for task results
-# In production, use Redis or another persistent store
-_tasks = {}
+# Queue configuration
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))  # Jobs run at once per process
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "1000"))  # Backpressure limit, 0 disables it
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_MAX_WAIT = float(os.getenv("JOB_RETRY_MAX_WAIT", "60"))  # Seconds, cap of the backoff
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))  # Seconds between idle polls
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "300"))  # Seconds without a heartbeat
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))  # Keep finished jobs this long
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_CLAIM_CANDIDATES = 5
+JOB_HOUSEKEEPING_INTERVAL = 60
 
 # Task status constants
 class TaskStatus:
@@ -17,68 +49,300 @@ class TaskStatus:
     COMPLETED = "completed"
     FAILED = "failed"
 
+class JobQueueFull(Exception):
+    """Raised by enqueue_job when JOB_MAX_PENDING jobs are already waiting."""
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+_handlers: Dict[str, JobHandler] = {}
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+_current_job: ContextVar[Optional[str]] = ContextVar("current_job", default=None)
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register an async function as the handler for jobs of `kind`."""
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return decorator
+
+def _worker_id() -> str:
+    # Evaluated per call: gunicorn forks workers after import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+def _update_job(job_id: str, **values) -> None:
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == job_id).update(
+            {getattr(Job, name): value for name, value in values.items()},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def enqueue_job(
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    max_attempts: int = JOB_MAX_ATTEMPTS
+) -> str:
+    """Persist a job and wake a local worker. Returns the job id.
+
+    Raises JobQueueFull when the backlog is over JOB_MAX_PENDING so callers
+    can push back (HTTP 503) instead of queueing without bound.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No job handler registered for '{kind}'")
+
+    db = SessionLocal()
+    try:
+        if JOB_MAX_PENDING:
+            pending = db.query(Job).filter(Job.status == TaskStatus.PENDING).count()
+            if pending >= JOB_MAX_PENDING:
+                raise JobQueueFull(f"{pending} jobs are already waiting")
+
+        job = Job(
+            kind=kind,
+            status=TaskStatus.PENDING,
+            priority=priority,
+            payload=payload or {},
+            max_attempts=max_attempts,
+            created_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+
+    if _wakeup is not None:
+        _wakeup.set()
+    return job_id
+
 def get_task_info(task_id: str) -> Dict[str, Any]:
-    """Get information about a task."""
-    if task_id not in _tasks:
-        return {"task_id": task_id, "status": "not_found"}
-    
-    return _tasks[task_id]
-
-async def run_in_background(func: Callable, *args, **kwargs) -> str:
-    """Run a function in the background."""
-    task_id = str(uuid.uuid4())
-    
-    # Create task record
-    _tasks[task_id] = {
-        "task_id": task_id,
-        "status": TaskStatus.PENDING,
-        "created_at": time.time(),
-        "result": None,
-        "error": None
-    }
-    
-    # Create background task
-    async def _run_task():
-        _tasks[task_id]["status"] = TaskStatus.RUNNING
-        _tasks[task_id]["started_at"] = time.time()
-        
+    """Get information about a job, whichever worker ran or is running it."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == task_id).first()
+        if job is None:
+            return {"task_id": task_id, "status": "not_found"}
+
+        info = {
+            "task_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "priority": job.priority,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "progress": job.progress,
+            "result": job.result,
+            "error": job.error,
+            "created_at": _epoch(job.created_at),
+            "started_at": _epoch(job.started_at),
+            "completed_at": _epoch(job.completed_at)
+        }
+        if job.started_at and job.completed_at:
+            info["duration"] = (job.completed_at - job.started_at).total_seconds()
+        return info
+    finally:
+        db.close()
+
+def report_progress(**progress: Any) -> None:
+    """Record progress of the job running in the current task (no-op outside jobs).
+
+    Also counts as a heartbeat.
+    """
+    job_id = _current_job.get()
+    if job_id is not None:
+        _update_job(job_id, progress=progress, heartbeat_at=datetime.utcnow())
+
+# Workers
+
+def _claim_next_job() -> Optional[Dict[str, Any]]:
+    """Atomically move the next pending job to running and return it."""
+    db = SessionLocal()
+    try:
+        candidates = db.query(Job.id).filter(
+            Job.status == TaskStatus.PENDING
+        ).order_by(Job.priority.desc(), Job.created_at.asc()).limit(JOB_CLAIM_CANDIDATES).all()
+
+        for (job_id,) in candidates:
+            now = datetime.utcnow()
+            # Only one worker's UPDATE can match while the job is still pending
+            claimed = db.query(Job).filter(
+                Job.id == job_id,
+                Job.status == TaskStatus.PENDING
+            ).update({
+                Job.status: TaskStatus.RUNNING,
+                Job.worker_id: _worker_id(),
+                Job.started_at: now,
+                Job.heartbeat_at: now,
+                Job.completed_at: None
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                job = db.query(Job).filter(Job.id == job_id).one()
+                return {
+                    "id": job.id,
+                    "kind": job.kind,
+                    "payload": job.payload or {},
+                    "attempts": job.attempts,
+                    "max_attempts": job.max_attempts
+                }
+        return None
+    finally:
+        db.close()
+
+async def _heartbeat(job_id: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        _update_job(job_id, heartbeat_at=datetime.utcnow())
+
+async def _run_job(job: Dict[str, Any]) -> None:
+    job_id = job["id"]
+    handler = _handlers.get(job["kind"])
+    if handler is None:
+        _update_job(
+            job_id,
+            status=TaskStatus.FAILED,
+            error=f"No job handler registered for '{job['kind']}'",
+            completed_at=datetime.utcnow()
+        )
+        return
+
+    attempts = job["attempts"]
+
+    def _start_attempt(retry_state) -> None:
+        nonlocal attempts
+        attempts += 1
+        _update_job(job_id, attempts=attempts, heartbeat_at=datetime.utcnow())
+
+    def _log_retry(retry_state) -> None:
+        error = retry_state.outcome.exception()
+        logger.warning(f"Job {job_id} ({job['kind']}) attempt {attempts} failed, retrying: {error}")
+        _update_job(job_id, error=str(error))
+
+    token = _current_job.set(job_id)
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        # Attempts made before a crash count towards the limit
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(max(job["max_attempts"] - attempts, 1)),
+            wait=wait_exponential(multiplier=1, min=1, max=JOB_RETRY_MAX_WAIT),
+            before=_start_attempt,
+            before_sleep=_log_retry,
+            reraise=True
+        )
+        result = await retrying(handler, **job["payload"])
+        _update_job(
+            job_id,
+            status=TaskStatus.COMPLETED,
+            result=result,
+            error=None,
+            completed_at=datetime.utcnow()
+        )
+    except asyncio.CancelledError:
+        # Shutdown: hand the interrupted attempt back to the queue
+        _update_job(job_id, status=TaskStatus.PENDING, attempts=max(attempts - 1, 0), worker_id=None)
+        raise
+    except Exception as e:
+        logger.exception(f"Job {job_id} ({job['kind']}) failed after {attempts} attempts: {e}")
+        _update_job(job_id, status=TaskStatus.FAILED, error=str(e), completed_at=datetime.utcnow())
+    finally:
+        heartbeat.cancel()
+        _current_job.reset(token)
+
+async def _worker_loop(worker_no: int) -> None:
+    while True:
         try:
-            if asyncio.iscoroutinefunction(func):
-                result = await func(*args, **kwargs)
-            else:
-                # Run synchronous function in a thread pool
-                result = await asyncio.to_thread(func, *args, **kwargs)
-                
-            _tasks[task_id]["result"] = result
-            _tasks[task_id]["status"] = TaskStatus.COMPLETED
+            job = _claim_next_job()
         except Exception as e:
-            logger.exception(f"Background task failed: {e}")
-            _tasks[task_id]["error"] = str(e)
-            _tasks[task_id]["status"] = TaskStatus.FAILED
-        finally:
-            _tasks[task_id]["completed_at"] = time.time()
-            _tasks[task_id]["duration"] = _tasks[task_id]["completed_at"] - _tasks[task_id]["started_at"]
-            
-            # Clean up old tasks (keep only for 1 hour)
+            logger.exception(f"Job worker {worker_no} could not claim a job: {e}")
+            job = None
+
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await _run_job(job)
+
+def requeue_stale_jobs(stale_after: int = JOB_STALE_AFTER) -> int:
+    """Return running jobs whose worker stopped heartbeating to the queue.
+
+    Jobs that already used all their attempts are marked failed instead.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    db = SessionLocal()
+    try:
+        stale = db.query(Job).filter(
+            Job.status == TaskStatus.RUNNING,
+            Job.heartbeat_at < cutoff
+        )
+        failed = stale.filter(Job.attempts >= Job.max_attempts).update({
+            Job.status: TaskStatus.FAILED,
+            Job.error: "Worker stopped responding",
+            Job.completed_at: datetime.utcnow()
+        }, synchronize_session=False)
+        requeued = stale.filter(Job.attempts < Job.max_attempts).update({
+            Job.status: TaskStatus.PENDING,
+            Job.worker_id: None
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    if requeued or failed:
+        logger.warning(f"Requeued {requeued} and failed {failed} jobs from unresponsive workers")
+    return requeued
+
+def clean_old_tasks(max_age: int = JOB_RETENTION_HOURS * 3600) -> int:
+    """Delete finished jobs older than max_age seconds."""
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+    db = SessionLocal()
+    try:
+        deleted = db.query(Job).filter(
+            Job.status.in_([TaskStatus.COMPLETED, TaskStatus.FAILED]),
+            Job.completed_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return deleted
+
+async def _housekeeping_loop() -> None:
+    while True:
+        try:
+            requeue_stale_jobs()
             clean_old_tasks()
-    
-    # Start the task
-    asyncio.create_task(_run_task())
-    
-    return task_id
-
-def clean_old_tasks(max_age: int = 3600):
-    """Clean up tasks older than max_age seconds."""
-    now = time.time()
-    to_delete = []
-    
-    for task_id, task in _tasks.items():
-        if task["status"] in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
-            if "completed_at" in task and now - task["completed_at"] > max_age:
-                to_delete.append(task_id)
-    
-    for task_id in to_delete:
-        del _tasks[task_id]
+        except Exception as e:
+            logger.exception(f"Job housekeeping failed: {e}")
+        await asyncio.sleep(JOB_HOUSEKEEPING_INTERVAL)
+
+async def start_job_workers(concurrency: int = JOB_WORKER_CONCURRENCY) -> None:
+    """Start this process's job workers (called on app startup)."""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    _workers.append(asyncio.create_task(_housekeeping_loop()))
+    for worker_no in range(concurrency):
+        _workers.append(asyncio.create_task(_worker_loop(worker_no)))
+    logger.info(f"Started {concurrency} job workers")
+
+async def stop_job_workers() -> None:
+    """Stop the workers, returning jobs they were running to the queue."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
 
 def register_background_task(background_tasks: BackgroundTasks, func: Callable, *args, **kwargs):
     """Add a task to FastAPI's BackgroundTasks."""
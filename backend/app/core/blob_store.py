@@ -0,0 +1,165 @@
+"""
+Content-addressed blob store on local disk.
+
+Blobs are stored once per sha256 under BLOB_STORE_PATH/ab/cd/<sha256>, so
+uploading the same file twice costs no extra space. Writes stream into a
+temporary file while hashing and are moved into place atomically, so a
+partially written blob is never visible under its address.
+
+Blobs are not deleted when the last document using them goes away; a
+periodic sweep (app.services.storage_gc) removes unreferenced blobs once
+their mtime is older than a grace period. Storing content that is already
+present refreshes the blob's mtime, so a concurrent upload of the same
+content is never left pointing at a swept blob.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Iterator, NamedTuple, Optional, Tuple
+
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "./data/blobs")
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(1024 * 1024)))  # 1 MiB
+
+class BlobInfo(NamedTuple):
+    sha256: str
+    size_bytes: int
+
+class BlobTooLarge(Exception):
+    """Raised when a streamed blob exceeds the caller's size limit."""
+
+def blob_path(sha256: str) -> str:
+    """Path of the blob with the given address."""
+    return os.path.join(BLOB_STORE_PATH, sha256[:2], sha256[2:4], sha256)
+
+def blob_exists(sha256: str) -> bool:
+    return os.path.exists(blob_path(sha256))
+
+def _refresh(sha256: str) -> bool:
+    """Bump an existing blob's mtime so the sweep leaves it alone; False if there is none."""
+    try:
+        os.utime(blob_path(sha256))
+        return True
+    except FileNotFoundError:
+        return False
+
+def _commit(tmp_path: str, sha256: str) -> None:
+    path = blob_path(sha256)
+    if _refresh(sha256):
+        # Same content already stored
+        os.remove(tmp_path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+
+async def write_stream(
+    read: Callable[[int], Awaitable[bytes]],
+    max_bytes: Optional[int] = None,
+    chunk_size: int = BLOB_CHUNK_SIZE
+) -> BlobInfo:
+    """Store everything `read(chunk_size)` returns until it returns b"".
+
+    Only one chunk is held in memory at a time. Raises BlobTooLarge (and
+    stores nothing) if the stream is longer than `max_bytes`.
+    """
+    tmp_dir = os.path.join(BLOB_STORE_PATH, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise BlobTooLarge(f"Blob is larger than {max_bytes} bytes")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(os.fsync, f.fileno())
+        sha256 = digest.hexdigest()
+        _commit(tmp_path, sha256)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return BlobInfo(sha256, size)
+
+def write_bytes(data: bytes) -> BlobInfo:
+    """Store an in-memory blob."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    if not _refresh(sha256):
+        tmp_dir = os.path.join(BLOB_STORE_PATH, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            _commit(tmp_path, sha256)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return BlobInfo(sha256, len(data))
+
+def read_blob(sha256: str) -> bytes:
+    with open(blob_path(sha256), "rb") as f:
+        return f.read()
+
+def iter_blob(sha256: str, chunk_size: int = BLOB_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a blob's content in chunks."""
+    with open(blob_path(sha256), "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_blobs(older_than: float = 0) -> Iterator[str]:
+    """Yield the address of every stored blob not modified in the last `older_than` seconds."""
+    cutoff = time.time() - older_than
+    for path, mtime in _iter_files(BLOB_STORE_PATH, skip=("tmp",)):
+        if mtime < cutoff:
+            yield os.path.basename(path)
+
+def delete_blob(sha256: str, older_than: float = 0) -> bool:
+    """Remove a blob unless it was stored or refreshed in the last `older_than` seconds.
+
+    Callers must check that nothing references it anymore. Returns whether
+    the blob was removed.
+    """
+    path = blob_path(sha256)
+    try:
+        if older_than and os.path.getmtime(path) >= time.time() - older_than:
+            return False
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def delete_stale_temp_files(older_than: float) -> int:
+    """Remove temporary files left behind by writes that crashed."""
+    cutoff = time.time() - older_than
+    removed = 0
+    for path, mtime in _iter_files(os.path.join(BLOB_STORE_PATH, "tmp")):
+        if mtime < cutoff:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+def _iter_files(root: str, skip: Tuple[str, ...] = ()) -> Iterator[Tuple[str, float]]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        if dirpath == root:
+            dirnames[:] = [d for d in dirnames if d not in skip]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                yield path, os.path.getmtime(path)
+            except FileNotFoundError:
+                pass
@@ -1,26 +1,140 @@
-import json
+"""
+Two-level cache: an in-process LRU in front of Redis.
+
+Reads check the local tier first, then Redis (shared by all app workers),
+then call the loader. Concurrent misses on the same key are coalesced so
+only one of them runs the loader; the rest wait for its result. Values are
+held serialized in both tiers (see app.core.cache_codec; pass `schema` to
+cache ORM results as their API schema), so every reader gets its own copy.
+
+Local entries live for at most CACHE_LOCAL_TTL seconds, which bounds how
+long another worker's invalidation can go unseen. If Redis is unreachable
+the cache keeps working locally and retries Redis after
+CACHE_REDIS_RETRY_AFTER seconds.
+
+Entries can be tagged (for example "prompts:<user_id>" on every page of a
+user's prompt listing). Each tag has a version counter; an entry is stored
+with the versions of its tags and only counts as a hit while they are
+unchanged, so cache_invalidate_tags is one INCR per tag no matter how many
+keys carry it or how large the keyspace is. Tag versions are fetched in
+the same MGET as the value.
+"""
+import asyncio
+import fnmatch
 import os
-import pickle
-from typing import Any, Optional, Dict, List, Union
-import redis
-from functools import wraps
+import threading
 import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import redis.asyncio as redis
+from functools import wraps
 import hashlib
 
+from app.core.cache_codec import CacheFormatError, get_codec
+from app.core.lru import LRUCache
+from app.utils.logging import logger
+
 # Redis configuration
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # Default TTL: 1 hour
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5"))  # Seconds
+CACHE_REDIS_RETRY_AFTER = float(os.getenv("CACHE_REDIS_RETRY_AFTER", "30"))  # Seconds
+
+# Tag version counters expire after this long without an invalidation; keep it
+# longer than any entry's TTL so a reset counter can't revive an old entry
+CACHE_TAG_TTL = int(os.getenv("CACHE_TAG_TTL", str(7 * 24 * 3600)))  # Seconds
+
+# In-process tier
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "10000"))
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "5"))  # Seconds
+
+_local = LRUCache(CACHE_LOCAL_MAX_ENTRIES, ttl=CACHE_LOCAL_TTL)
+
+# This process's tag versions for the local tier (Redis keeps the shared ones)
+_local_versions: Dict[str, int] = {}
+
+# One loader per key at a time; waiters share its serialized result as long
+# as none of the key's tags were invalidated since it started
+_inflight: Dict[str, Tuple[asyncio.Future, Tuple[int, ...]]] = {}
+
+# Redis client, created on first use in the running event loop
+_redis_client: Optional[redis.Redis] = None
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
+_redis_down_until = 0.0
+
+_stats = {
+    "redis_hits": 0, "redis_misses": 0, "redis_errors": 0,
+    "loads": 0, "coalesced": 0, "format_misses": 0
+}
+_stats_lock = threading.Lock()
+
+# Flight result when the loaded value could not be serialized
+_UNCACHEABLE = object()
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_redis() -> Optional[redis.Redis]:
+    """The async Redis client, or None when caching is off or Redis recently failed."""
+    global _redis_client, _redis_loop
+    if not CACHE_ENABLED or time.monotonic() < _redis_down_until:
+        return None
+    loop = asyncio.get_running_loop()
+    if _redis_client is None or _redis_loop is not loop:
+        _redis_client = redis.Redis.from_url(
+            REDIS_URL,
+            decode_responses=False,
+            socket_timeout=CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=CACHE_REDIS_TIMEOUT
+        )
+        _redis_loop = loop
+    return _redis_client
+
+def _redis_failed(action: str, error: Exception) -> None:
+    """Skip Redis for a while after an error instead of paying its timeout on every call."""
+    global _redis_down_until
+    _count("redis_errors")
+    now = time.monotonic()
+    already_down = now < _redis_down_until
+    _redis_down_until = now + CACHE_REDIS_RETRY_AFTER
+    if not already_down:
+        logger.warning(f"Cache {action} failed, using the local cache only for {CACHE_REDIS_RETRY_AFTER:g}s: {error}")
+
+async def _redis_mget(keys: List[str]) -> Optional[List[Optional[bytes]]]:
+    client = get_redis()
+    if client is None or not keys:
+        return None
+    try:
+        return await client.mget(keys)
+    except Exception as e:
+        _redis_failed("read", e)
+        return None
 
-# Redis client initialization
-try:
-    redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=False) if CACHE_ENABLED else None
-    # Test connection
-    if CACHE_ENABLED:
-        redis_client.ping()
-except Exception as e:
-    print(f"Warning: Redis connection failed: {e}")
-    redis_client = None
+async def redis_get_many(keys: List[str]) -> List[Optional[bytes]]:
+    """Raw values for keys from Redis in one MGET (None where missing or unavailable)."""
+    values = await _redis_mget(keys)
+    if values is None:
+        return [None] * len(keys)
+    found = sum(value is not None for value in values)
+    _count("redis_hits", found)
+    _count("redis_misses", len(keys) - found)
+    return values
+
+async def redis_set_many(items: Dict[str, bytes], ttl: int = CACHE_TTL) -> bool:
+    """Write raw values to Redis in one pipelined round trip."""
+    client = get_redis()
+    if client is None or not items:
+        return False
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for key, data in items.items():
+                pipe.setex(key, ttl, data)
+            await pipe.execute()
+        return True
+    except Exception as e:
+        _redis_failed("write", e)
+        return False
 
 def get_cache_key(prefix: str, *args, **kwargs) -> str:
     """
@@ -28,108 +142,366 @@ def get_cache_key(prefix: str, *args, **kwargs) -> str:
     """
     # Create a string representation of args and kwargs
     key_parts = [prefix]
-    
+
     if args:
         key_parts.append("_".join(str(arg) for arg in args))
-    
+
     if kwargs:
         # Sort kwargs by key for consistent hash generation
         sorted_kwargs = sorted(kwargs.items())
         key_parts.append("_".join(f"{k}={v}" for k, v in sorted_kwargs))
-    
+
     # Join and hash the key parts
     key = "_".join(key_parts)
     if len(key) > 100:  # If key is too long, use a hash
         key = f"{prefix}_{hashlib.md5(key.encode()).hexdigest()}"
-    
+
     return key
 
-async def cache_get(key: str) -> Optional[Any]:
+def _tag_key(tag: str) -> str:
+    return f"cache_tag_{tag}"
+
+def _normalize_tags(tags: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(sorted(set(tags)))
+
+def _local_stamp(tags: Sequence[str]) -> Tuple[int, ...]:
+    return tuple(_local_versions.get(tag, 0) for tag in tags)
+
+def _stamp_prefix(versions: Sequence[int]) -> bytes:
+    """Header stored in front of a Redis value: its tags' versions at load time."""
+    return ",".join(str(version) for version in versions).encode() + b"|"
+
+async def _redis_versions(tags: Sequence[str]) -> Optional[Tuple[int, ...]]:
+    if not tags:
+        return () if get_redis() is not None else None
+    values = await _redis_mget([_tag_key(tag) for tag in tags])
+    if values is None:
+        return None
+    return tuple(int(value) if value is not None else 0 for value in values)
+
+async def _get_raw_many(
+    keys: List[str],
+    tags: Tuple[str, ...] = ()
+) -> Tuple[Dict[str, bytes], Optional[Tuple[int, ...]]]:
+    """Fresh raw values for keys, plus the tags' Redis versions when Redis
+    was queried (None if it wasn't or is unavailable)."""
+    stamp = _local_stamp(tags)
+    found = {}
+    for key in keys:
+        entry = _local.get(key)
+        if entry is not None and entry[1] == stamp:
+            found[key] = entry[0]
+    missing = [key for key in keys if key not in found]
+    if not missing:
+        return found, None
+
+    values = await _redis_mget(missing + [_tag_key(tag) for tag in tags])
+    if values is None:
+        return found, None
+    versions = tuple(int(value) if value is not None else 0 for value in values[len(missing):])
+    prefix = _stamp_prefix(versions)
+    hits = 0
+    for key, value in zip(missing, values):
+        # Entries written before one of their tags was invalidated are stale
+        if value is not None and value.startswith(prefix):
+            data = value[len(prefix):]
+            _local.set(key, (data, stamp))
+            found[key] = data
+            hits += 1
+    _count("redis_hits", hits)
+    _count("redis_misses", len(missing) - hits)
+    return found, versions
+
+async def _set_raw_many(
+    items: Dict[str, bytes],
+    ttl: int,
+    tags: Tuple[str, ...] = (),
+    stamp: Optional[Tuple[int, ...]] = None,
+    versions: Optional[Tuple[int, ...]] = None
+) -> bool:
+    """Store raw values stamped with the tag versions they were loaded under."""
+    stamp = _local_stamp(tags) if stamp is None else stamp
+    for key, data in items.items():
+        _local.set(key, (data, stamp), ttl=min(ttl, CACHE_LOCAL_TTL))
+    if versions is None:
+        return False
+    prefix = _stamp_prefix(versions)
+    return await redis_set_many({key: prefix + data for key, data in items.items()}, ttl)
+
+def _decode_found(codec, key: str, data: bytes) -> Any:
+    """Decode a cached payload; None (a miss) if it was written for another schema."""
+    try:
+        return codec.decode(data)
+    except CacheFormatError:
+        _count("format_misses")
+        _local.delete(key)
+        return None
+
+async def cache_get(
+    key: str,
+    tags: Iterable[str] = (),
+    schema: Any = Any
+) -> Optional[Any]:
     """
     Get a value from the cache
     """
-    if not redis_client:
+    if not CACHE_ENABLED:
         return None
-    
+
     try:
-        data = redis_client.get(key)
-        if data:
-            return pickle.loads(data)
-        return None
+        found, _ = await _get_raw_many([key], _normalize_tags(tags))
+        data = found.get(key)
+        return _decode_found(get_codec(schema), key, data) if data is not None else None
     except Exception as e:
-        print(f"Cache get error: {e}")
+        logger.warning(f"Cache get error: {e}")
         return None
 
-async def cache_set(key: str, value: Any, ttl: int = CACHE_TTL) -> bool:
+async def cache_get_many(
+    keys: Iterable[str],
+    tags: Iterable[str] = (),
+    schema: Any = Any
+) -> Dict[str, Any]:
+    """
+    Get several values sharing the same tags at once; Redis is queried once
+    for all local misses
+    """
+    if not CACHE_ENABLED:
+        return {}
+
+    try:
+        found, _ = await _get_raw_many(list(dict.fromkeys(keys)), _normalize_tags(tags))
+        codec = get_codec(schema)
+        values = {key: _decode_found(codec, key, data) for key, data in found.items()}
+        return {key: value for key, value in values.items() if value is not None}
+    except Exception as e:
+        logger.warning(f"Cache get error: {e}")
+        return {}
+
+async def cache_set(
+    key: str,
+    value: Any,
+    ttl: int = CACHE_TTL,
+    tags: Iterable[str] = (),
+    schema: Any = Any
+) -> bool:
     """
     Set a value in the cache
     """
-    if not redis_client:
+    return await cache_set_many({key: value}, ttl, tags, schema)
+
+async def cache_set_many(
+    values: Dict[str, Any],
+    ttl: int = CACHE_TTL,
+    tags: Iterable[str] = (),
+    schema: Any = Any
+) -> bool:
+    """
+    Set several values sharing the same tags in one Redis round trip
+    (plus one to read the tags' versions when there are tags)
+    """
+    if not CACHE_ENABLED:
         return False
-    
+
     try:
-        redis_client.setex(key, ttl, pickle.dumps(value))
+        tags = _normalize_tags(tags)
+        stamp = _local_stamp(tags)
+        versions = await _redis_versions(tags)
+        codec = get_codec(schema)
+        items = {key: codec.encode(codec.project(value)) for key, value in values.items()}
+        return await _set_raw_many(items, ttl, tags, stamp, versions)
+    except Exception as e:
+        logger.warning(f"Cache set error: {e}")
+        return False
+
+async def cache_get_or_set(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int = CACHE_TTL,
+    tags: Iterable[str] = (),
+    schema: Any = Any
+) -> Any:
+    """
+    Get a value from the cache, or load and cache it on a miss.
+
+    Concurrent misses on the same key run `loader` once; the other callers
+    wait and get a copy of its result. None results are not cached. The
+    value is tagged with `tags` (see cache_invalidate_tags) and returned as
+    `schema` (e.g. Tuple[List[schemas.Prompt], int]), including on a miss.
+    """
+    if not CACHE_ENABLED:
+        return await loader()
+
+    codec = get_codec(schema)
+    tags = _normalize_tags(tags)
+    while True:
+        stamp = _local_stamp(tags)
+        try:
+            found, versions = await _get_raw_many([key], tags)
+        except Exception as e:
+            logger.warning(f"Cache get error: {e}")
+            found, versions = {}, None
+        if key in found:
+            cached_value = _decode_found(codec, key, found[key])
+            if cached_value is not None:
+                return cached_value
+
+        flight = _inflight.get(key)
+        # Don't join a load that started before one of the tags was invalidated
+        if flight is None or flight[1] != stamp:
+            break
+        pending = flight[0]
+        try:
+            data = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # The loading request was cancelled; try again
+            continue
+        if data is _UNCACHEABLE:
+            # Load it ourselves rather than share an unserializable value
+            break
+        _count("coalesced")
+        return codec.decode(data) if data is not None else None
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = (future, stamp)
+    try:
+        _count("loads")
+        value = await loader()
+        data = None
+        if value is not None:
+            try:
+                value = codec.project(value)
+                data = codec.encode(value)
+            except Exception as e:
+                logger.warning(f"Cache set error: can't serialize {key} as {schema}: {e}")
+                future.set_result(_UNCACHEABLE)
+                return value
+        # Stamped with the versions read before loading, so if a tag was
+        # invalidated meanwhile the entry is already stale; a cache_delete
+        # meanwhile drops the flight
+        if data is not None and _inflight.get(key, (None,))[0] is future:
+            await _set_raw_many({key: data}, ttl, tags, stamp, versions)
+        future.set_result(data)
+        return value
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        # Waiters re-raise it; don't warn about it going unretrieved when there are none
+        future.exception()
+        raise
+    finally:
+        if _inflight.get(key, (None,))[0] is future:
+            del _inflight[key]
+
+async def cache_invalidate_tags(*tags: str) -> bool:
+    """
+    Invalidate every entry carrying any of the tags, in O(1) per tag
+    """
+    if not CACHE_ENABLED or not tags:
+        return False
+
+    for tag in tags:
+        _local_versions[tag] = _local_versions.get(tag, 0) + 1
+
+    client = get_redis()
+    if client is None:
+        return False
+
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(_tag_key(tag))
+                pipe.expire(_tag_key(tag), CACHE_TAG_TTL)
+            await pipe.execute()
         return True
     except Exception as e:
-        print(f"Cache set error: {e}")
+        _redis_failed("invalidate", e)
         return False
 
 async def cache_delete(key: str) -> bool:
     """
     Delete a value from the cache
     """
-    if not redis_client:
+    _local.delete(key)
+    _inflight.pop(key, None)
+
+    client = get_redis()
+    if client is None:
         return False
-    
+
     try:
-        redis_client.delete(key)
+        await client.delete(key)
         return True
     except Exception as e:
-        print(f"Cache delete error: {e}")
+        _redis_failed("delete", e)
         return False
 
 async def cache_delete_pattern(pattern: str) -> bool:
     """
     Delete all keys matching a pattern
+
+    This scans the whole Redis keyspace; prefer tagging entries and
+    cache_invalidate_tags.
     """
-    if not redis_client:
+    matches = lambda key: fnmatch.fnmatchcase(key, pattern)
+    _local.delete_where(matches)
+    for key in [key for key in _inflight if matches(key)]:
+        del _inflight[key]
+
+    client = get_redis()
+    if client is None:
         return False
-    
+
     try:
-        cursor = 0
-        while True:
-            cursor, keys = redis_client.scan(cursor, match=pattern, count=100)
-            if keys:
-                redis_client.delete(*keys)
-            if cursor == 0:
-                break
+        keys = []
+        async for key in client.scan_iter(match=pattern, count=100):
+            keys.append(key)
+            if len(keys) >= 100:
+                await client.delete(*keys)
+                keys = []
+        if keys:
+            await client.delete(*keys)
         return True
     except Exception as e:
-        print(f"Cache delete pattern error: {e}")
+        _redis_failed("delete pattern", e)
         return False
 
-def cached(prefix: str, ttl: int = CACHE_TTL):
+def cached(prefix: str, ttl: int = CACHE_TTL, schema: Any = Any):
     """
-    Decorator to cache function results
+    Decorator to cache function results (as `schema`)
     """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if not CACHE_ENABLED or not redis_client:
+            if not CACHE_ENABLED:
                 return await func(*args, **kwargs)
-            
+
             # Generate cache key
             key = get_cache_key(prefix, *args, **kwargs)
-            
-            # Try to get from cache
-            cached_value = await cache_get(key)
-            if cached_value is not None:
-                return cached_value
-            
-            # Call the function and cache the result
-            result = await func(*args, **kwargs)
-            await cache_set(key, result, ttl)
-            return result
-        
+            return await cache_get_or_set(key, lambda: func(*args, **kwargs), ttl, schema=schema)
+
         return wrapper
     return decorator
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Local tier counters plus Redis and coalescing counters for this process."""
+    with _stats_lock:
+        stats: Dict[str, Any] = dict(_stats)
+    stats["local"] = _local.stats()
+    stats["inflight"] = len(_inflight)
+    stats["local_tags"] = len(_local_versions)
+    stats["redis_available"] = CACHE_ENABLED and time.monotonic() >= _redis_down_until
+    return stats
+
+def clear_local_cache() -> None:
+    _local.clear()
+
+async def close_cache() -> None:
+    """Close the Redis connection pool."""
+    global _redis_client, _redis_loop
+    client, _redis_client, _redis_loop = _redis_client, None, None
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,62 @@
+"""
+Cache value serialization.
+
+Cached values are stored as the JSON projection of a type built from the
+API schemas in app.schemas, e.g. `Tuple[List[schemas.Prompt], int]`, not
+as pickled ORM objects. pydantic-core validates ORM instances into the
+schema (from_attributes) and writes/reads the JSON natively, so payloads
+hold only the schema's fields and decoding never runs arbitrary code.
+
+Every payload starts with a header naming the format version and a
+fingerprint of the type's JSON schema; payloads written for an older
+schema fail to decode and are treated as misses.
+"""
+import hashlib
+import json
+import threading
+from typing import Any, Dict
+
+from pydantic import TypeAdapter, ValidationError
+
+# Bump to invalidate every cached payload after a change to the envelope
+CACHE_FORMAT_VERSION = 1
+
+class CacheFormatError(ValueError):
+    """A payload written in another format or for another schema version."""
+
+class CacheCodec:
+    def __init__(self, spec: Any):
+        self.spec = spec
+        self._adapter = TypeAdapter(spec)
+        schema = json.dumps(self._adapter.json_schema(), sort_keys=True)
+        fingerprint = hashlib.sha1(schema.encode("utf-8")).hexdigest()[:12]
+        self._header = f"{CACHE_FORMAT_VERSION}:{fingerprint}|".encode("ascii")
+
+    def project(self, value: Any) -> Any:
+        """Validate a value (ORM objects included) into the schema type."""
+        return self._adapter.validate_python(value, from_attributes=True)
+
+    def encode(self, projected: Any) -> bytes:
+        """Serialize a value already returned by `project`."""
+        return self._header + self._adapter.dump_json(projected)
+
+    def decode(self, data: bytes) -> Any:
+        if not data.startswith(self._header):
+            raise CacheFormatError(f"Cached payload is not {self.spec}")
+        try:
+            return self._adapter.validate_json(data[len(self._header):])
+        except ValidationError as e:
+            raise CacheFormatError(str(e)) from e
+
+_codecs: Dict[Any, CacheCodec] = {}
+_codecs_lock = threading.Lock()
+
+def get_codec(spec: Any = Any) -> CacheCodec:
+    """The (shared) codec for a type; plain JSON values when no type is given."""
+    codec = _codecs.get(spec)
+    if codec is None:
+        with _codecs_lock:
+            codec = _codecs.get(spec)
+            if codec is None:
+                codec = _codecs[spec] = CacheCodec(spec)
+    return codec
@@ -0,0 +1,266 @@
+"""
+In-process BM25 inverted indexes keyed by VectorDB id.
+
+Complements vector search for exact identifiers, error codes and names
+that embeddings blur. Each index holds the same chunks as its VectorDB's
+vector index, with the same ids and groups (embedding ids), so the two
+rankings can be fused. Postings are compact typed arrays per term (row
+numbers as uint32, term frequencies as uint16), appended to as chunks are
+added; removed rows are tombstoned and dropped on compaction.
+"""
+import math
+import os
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.vector_store import SearchHit
+
+INITIAL_CAPACITY = int(os.getenv("LEXICAL_INDEX_INITIAL_CAPACITY", "1024"))
+
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Compact once tombstoned rows outnumber live ones (and there are this many)
+COMPACT_MIN_DEAD = 1024
+
+MAX_TERM_FREQUENCY = 65535
+
+# Words, plus compounds such as "ERR_CONN_42", "e5-large-v2" or "v1.2.3"
+# kept whole; compounds are also indexed by their parts
+_TOKEN = re.compile(r"\w+(?:[-_.:/]\w+)*")
+_PART = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased search terms of a text."""
+    terms = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        terms.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            terms.extend(parts)
+    return terms
+
+class LexicalIndex:
+    """BM25 index over chunk texts.
+
+    Like VectorIndex, each row carries a string id (the chunk id) and an
+    optional group (the embedding id) so a whole embedding can be removed
+    or searched on its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._size = 0
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._group_codes: Dict[str, int] = {}
+        self._group_names: List[str] = []
+        self._groups = np.empty(0, dtype=np.int32)
+        self._live = np.zeros(0, dtype=bool)
+        self._lengths = np.zeros(0, dtype=np.uint32)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._live_length = 0
+        # Sync bookkeeping (see vector_db_service.sync_lexical_index)
+        self.versions: Dict[str, object] = {}
+        self.synced_at = 0.0
+        self.sync_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._size + extra
+        capacity = self._live.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, INITIAL_CAPACITY)
+        self._groups = np.resize(self._groups, new_capacity)
+        self._lengths = np.resize(self._lengths, new_capacity)
+        live = np.zeros(new_capacity, dtype=bool)
+        live[:self._size] = self._live[:self._size]
+        self._live = live
+
+    def _group_code(self, group: Optional[str]) -> int:
+        if group is None:
+            return -1
+        code = self._group_codes.get(group)
+        if code is None:
+            code = len(self._group_names)
+            self._group_codes[group] = code
+            self._group_names.append(group)
+        return code
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], group: Optional[str] = None) -> int:
+        """Index (or re-index) texts under the given ids. Returns rows written."""
+        ids = list(ids)
+        if len(ids) != len(texts):
+            raise ValueError(f"Got {len(ids)} ids for {len(texts)} texts")
+        if not ids:
+            return 0
+        with self._lock:
+            self.remove(ids)
+            code = self._group_code(group)
+            self._reserve(len(ids))
+            for chunk_id, text in zip(ids, texts):
+                row = self._size
+                terms = tokenize(text)
+                frequencies: Dict[str, int] = {}
+                for term in terms:
+                    frequencies[term] = frequencies.get(term, 0) + 1
+                for term, frequency in frequencies.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(row)
+                    postings[1].append(min(frequency, MAX_TERM_FREQUENCY))
+                self._groups[row] = code
+                self._lengths[row] = len(terms)
+                self._live[row] = True
+                self._row_of[chunk_id] = row
+                self._ids.append(chunk_id)
+                self._live_length += len(terms)
+                self._size += 1
+            return len(ids)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """Tombstone the rows for the given ids. Returns rows removed."""
+        removed = 0
+        with self._lock:
+            for chunk_id in ids:
+                row = self._row_of.pop(chunk_id, None)
+                if row is not None:
+                    self._live[row] = False
+                    self._live_length -= int(self._lengths[row])
+                    removed += 1
+            dead = self._size - len(self._row_of)
+            if dead >= COMPACT_MIN_DEAD and dead > len(self._row_of):
+                self.compact()
+        return removed
+
+    def remove_group(self, group: str) -> int:
+        """Tombstone every row that belongs to `group`."""
+        with self._lock:
+            code = self._group_codes.get(group)
+            if code is None:
+                return 0
+            rows = np.flatnonzero(self._live[:self._size] & (self._groups[:self._size] == code))
+            return self.remove([self._ids[row] for row in rows])
+
+    def _row_mask(self, groups: Optional[Iterable[str]]) -> np.ndarray:
+        mask = self._live[:self._size]
+        if groups is not None:
+            codes = [self._group_codes[g] for g in groups if g in self._group_codes]
+            mask = mask & np.isin(self._groups[:self._size], codes)
+        return mask
+
+    def _scores(self, terms: Iterable[str], mask: np.ndarray) -> np.ndarray:
+        """BM25 score of every row (0 where no term matches)."""
+        scores = np.zeros(self._size, dtype=np.float32)
+        live = self._live[:self._size]
+        num_docs = len(self._row_of)
+        average_length = max(self._live_length / num_docs, 1.0)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            rows = np.frombuffer(postings[0], dtype=np.uint32)
+            alive = live[rows]
+            doc_frequency = int(np.count_nonzero(alive))
+            if doc_frequency == 0:
+                continue
+            keep = alive & mask[rows]
+            rows = rows[keep]
+            frequencies = np.frombuffer(postings[1], dtype=np.uint16)[keep].astype(np.float32)
+            idf = math.log(1 + (num_docs - doc_frequency + 0.5) / (doc_frequency + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[rows] / average_length)
+            # A row appears once per term's postings, so plain fancy-index add is safe
+            scores[rows] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norm)
+        return scores
+
+    def search(
+        self,
+        queries: Sequence[str],
+        top_k: int = 10,
+        groups: Optional[Iterable[str]] = None
+    ) -> List[List[SearchHit]]:
+        """Top-k BM25 hits for each query text, best first. When `groups` is
+        set only rows from those groups are considered."""
+        with self._lock:
+            if not self._row_of or top_k <= 0:
+                return [[] for _ in queries]
+            mask = self._row_mask(groups)
+            results = []
+            for query in queries:
+                scores = self._scores(set(tokenize(query)), mask)
+                matched = np.flatnonzero(scores > 0)
+                if len(matched) > top_k:
+                    matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+                matched = matched[np.argsort(-scores[matched], kind="stable")]
+                results.append([
+                    SearchHit(
+                        id=self._ids[row],
+                        score=float(scores[row]),
+                        group=self._group_names[self._groups[row]] if self._groups[row] >= 0 else None
+                    )
+                    for row in matched
+                ])
+            return results
+
+    def compact(self) -> None:
+        """Drop tombstoned rows from the row arrays and postings."""
+        with self._lock:
+            if len(self._row_of) == self._size:
+                return
+            live = self._live[:self._size]
+            keep = np.flatnonzero(live)
+            new_row = np.cumsum(live, dtype=np.int64) - 1
+            for term in list(self._postings):
+                rows_array, frequencies_array = self._postings[term]
+                rows = np.frombuffer(rows_array, dtype=np.uint32)
+                alive = live[rows]
+                if not alive.any():
+                    del self._postings[term]
+                    continue
+                frequencies = np.frombuffer(frequencies_array, dtype=np.uint16)[alive]
+                self._postings[term] = (
+                    array("I", new_row[rows[alive]].astype(np.uint32).tobytes()),
+                    array("H", frequencies.tobytes())
+                )
+            self._groups = self._groups[keep]
+            self._lengths = self._lengths[keep]
+            self._live = np.ones(len(keep), dtype=bool)
+            self._ids = [self._ids[row] for row in keep]
+            self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._size = len(keep)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "documents": len(self),
+            "rows": self._size,
+            "terms": len(self._postings),
+            "postings": sum(len(rows) for rows, _ in self._postings.values()),
+            "groups": len(self._group_names)
+        }
+
+# Registry of live indexes, one per VectorDB record
+_indexes: Dict[str, LexicalIndex] = {}
+_registry_lock = threading.Lock()
+
+def get_lexical_index(vector_db_id: str) -> LexicalIndex:
+    """Get (or create) the lexical index for a VectorDB record."""
+    with _registry_lock:
+        index = _indexes.get(vector_db_id)
+        if index is None:
+            index = _indexes[vector_db_id] = LexicalIndex()
+        return index
+
+def drop_lexical_index(vector_db_id: str) -> None:
+    """Forget the lexical index for a deleted VectorDB record."""
+    with _registry_lock:
+        _indexes.pop(vector_db_id, None)
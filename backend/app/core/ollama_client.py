@@ -0,0 +1,112 @@
+"""
+Shared async client for the Ollama API.
+
+One pooled httpx.AsyncClient per worker process keeps connections to Ollama
+alive between requests. It is opened on app startup and closed on shutdown;
+code running outside the app (scripts, background jobs started before
+startup) gets a lazily created client.
+"""
+import json
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.utils.logging import logger
+
+# Configuration for Ollama API
+OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "16"))
+
+# Per-endpoint timeouts (generation and model creation can run for minutes)
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+ENDPOINT_TIMEOUTS = {
+    "tags": httpx.Timeout(5.0),
+    "show": httpx.Timeout(10.0, connect=5.0),
+    "delete": httpx.Timeout(30.0, connect=5.0),
+    "create": httpx.Timeout(600.0, connect=5.0),
+    "generate": httpx.Timeout(180.0, connect=5.0),
+    "embeddings": httpx.Timeout(60.0, connect=5.0),
+    "embed": httpx.Timeout(120.0, connect=5.0),
+}
+
+_client: Optional[httpx.AsyncClient] = None
+
+class OllamaError(Exception):
+    """Error response from the Ollama API."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=OLLAMA_API_URL,
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE
+        )
+    )
+
+async def start_ollama_client() -> None:
+    """Open the shared client (called on app startup)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+
+async def close_ollama_client() -> None:
+    """Close the shared client and its pooled connections (called on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """Get the shared client, creating it if the app has not started it."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+    return _client
+
+def _timeout(endpoint: str) -> httpx.Timeout:
+    return ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+
+def _error_message(body: bytes) -> str:
+    try:
+        return json.loads(body).get("error") or "Error from Ollama API"
+    except Exception:
+        return "Error from Ollama API"
+
+async def request(method: str, endpoint: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Send a request to an Ollama endpoint and return the decoded JSON body."""
+    response = await get_ollama_client().request(
+        method, endpoint, json=payload, timeout=_timeout(endpoint)
+    )
+    if response.status_code >= 400:
+        message = _error_message(response.content)
+        logger.warning(f"Ollama {method} /{endpoint} failed with {response.status_code}: {message}")
+        raise OllamaError(response.status_code, message)
+    return response.json() if response.content else {}
+
+async def post(endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await request("POST", endpoint, payload)
+
+async def open_stream(endpoint: str, payload: Dict[str, Any]) -> httpx.Response:
+    """Start a streamed POST and return the response once headers arrive.
+
+    Raises OllamaError on an error status. The caller must close the
+    response (`await response.aclose()`) to return the connection to the pool.
+    """
+    client = get_ollama_client()
+    response = await client.send(
+        client.build_request("POST", endpoint, json=payload, timeout=_timeout(endpoint)),
+        stream=True
+    )
+    if response.status_code >= 400:
+        body = await response.aread()
+        await response.aclose()
+        raise OllamaError(response.status_code, _error_message(body))
+    return response
@@ -0,0 +1,91 @@
+"""
+Process pool for CPU-bound work (text extraction, chunking, IVF training).
+
+Threads don't help pure-Python CPU work because of the GIL, and running it on
+the event loop stalls every request in the worker. `run_in_process` ships a
+call to a pool of worker processes instead, so large ingestion batches use
+all cores while the API stays responsive.
+
+Functions sent to the pool must be top-level functions in modules that are
+cheap and safe to import in a fresh interpreter (no database or app setup):
+workers are started with the "spawn" method and import them by name.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from app.utils.logging import logger
+
+# Number of worker processes; 0 runs the work in a thread instead
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", str(os.cpu_count() or 1)))
+PROCESS_POOL_START_METHOD = os.getenv("PROCESS_POOL_START_METHOD", "spawn")
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the shared pool, starting it on first use (None if disabled)."""
+    global _pool
+    if PROCESS_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_SIZE,
+                mp_context=multiprocessing.get_context(PROCESS_POOL_START_METHOD)
+            )
+            logger.info(f"Started process pool with {PROCESS_POOL_SIZE} workers")
+        return _pool
+
+def shutdown_process_pool() -> None:
+    """Stop the pool's worker processes (called on app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+async def run_in_process(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run `func(*args, **kwargs)` in the process pool and await its result.
+
+    Arguments and the return value are pickled, so pass plain data (bytes,
+    str, lists), not ORM objects or sessions.
+    """
+    call = functools.partial(func, *args, **kwargs)
+    pool = get_process_pool()
+    if pool is None:
+        return await asyncio.to_thread(call)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool for later calls
+        logger.error("Process pool worker died, restarting the pool")
+        _discard_pool(pool)
+        raise
+
+def call_in_process(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Blocking variant of `run_in_process` for code on a plain (non-async) thread."""
+    call = functools.partial(func, *args, **kwargs)
+    pool = get_process_pool()
+    if pool is None:
+        return call()
+    try:
+        return pool.submit(call).result()
+    except BrokenProcessPool:
+        logger.error("Process pool worker died, restarting the pool")
+        _discard_pool(pool)
+        raise
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,409 @@
+"""
+Approximate nearest-neighbour search for large vector databases.
+
+IVFIndex is an inverted-file index with a k-means coarse quantizer: every
+row is assigned to its nearest centroid and a query only scores the rows in
+its `nprobe` closest lists. It wraps an exact VectorIndex (in-memory or
+segmented) that keeps owning the vectors, so it works with either storage.
+
+Training and list rebuilds run on a background thread, never on the write
+path: until the lists are ready, searches fall back to the exact index. The
+quantizer is retrained (with `nlist` recomputed) once the collection has
+grown IVF_RETRAIN_GROWTH times past the size it was trained at. For
+segmented indexes the centroids are saved next to the segments, so other
+processes pick them up instead of training their own.
+"""
+import functools
+import io
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.process_pool import call_in_process
+from app.core.vector_store import VectorIndex, SearchHit, _merge_top_k
+from app.utils.logging import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX development machines
+    fcntl = None
+
+IVF_MIN_TRAIN_ROWS = int(os.getenv("IVF_MIN_TRAIN_ROWS", "10000"))
+IVF_DEFAULT_NPROBE = int(os.getenv("IVF_DEFAULT_NPROBE", "16"))
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", "4"))
+IVF_TRAIN_SAMPLE_PER_LIST = 32
+IVF_TRAIN_ITERATIONS = 10
+ASSIGN_BLOCK_ROWS = 65536
+ASSIGN_TAIL_ROWS = 4096  # Rows _install assigns while holding the locks
+
+QUANTIZER_FILE = "ivf-quantizer.npz"
+TRAIN_LOCK_FILE = "ivf-train.lock"
+
+def train_kmeans(
+    sample: np.ndarray,
+    num_lists: int,
+    iterations: int = IVF_TRAIN_ITERATIONS,
+    spherical: bool = True,
+    seed: int = 0
+) -> np.ndarray:
+    """Train `num_lists` centroids on `sample` with (spherical) k-means."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=num_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        # Re-seed empty lists from random sample rows
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+    return np.ascontiguousarray(centroids, dtype=np.float32)
+
+class _InvertedLists:
+    """Base-index row numbers per coarse list, valid for one row numbering (epoch)."""
+
+    def __init__(self, nlist: int, epoch: int):
+        self.epoch = epoch
+        self.assigned = 0  # Rows [0, assigned) of the base index are in a list
+        self._postings = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self.sizes = np.zeros(nlist, dtype=np.int64)
+
+    def rows(self, list_no: int) -> np.ndarray:
+        return self._postings[list_no][:self.sizes[list_no]]
+
+    def add(self, rows: np.ndarray, assignment: np.ndarray) -> None:
+        order = np.argsort(assignment, kind="stable")
+        lists, counts = np.unique(assignment[order], return_counts=True)
+        offset = 0
+        for list_no, count in zip(lists, counts):
+            self._append(list_no, rows[order[offset:offset + count]])
+            offset += count
+        self.assigned = int(rows[-1]) + 1 if len(rows) else self.assigned
+
+    def _append(self, list_no: int, rows: np.ndarray) -> None:
+        size = self.sizes[list_no]
+        postings = self._postings[list_no]
+        if size + len(rows) > len(postings):
+            grown = np.empty(max(size + len(rows), 2 * len(postings), 16), dtype=np.int64)
+            grown[:size] = postings[:size]
+            self._postings[list_no] = postings = grown
+        postings[size:size + len(rows)] = rows
+        self.sizes[list_no] = size + len(rows)
+
+class IVFIndex:
+    """Inverted-file ANN index layered over an exact VectorIndex.
+
+    Once the collection holds `min_train_rows` vectors a background thread
+    trains the quantizer; until its lists are built, searches fall back to
+    the exact index. After that, new rows are assigned to their list as they
+    are added (or, for rows written by other processes, on the next search),
+    and rows renumbered by compaction are reassigned in the background.
+    `nprobe` trades recall for latency and can be set per query.
+    """
+
+    def __init__(
+        self,
+        base: VectorIndex,
+        nlist: Optional[int] = None,
+        nprobe: int = IVF_DEFAULT_NPROBE,
+        min_train_rows: int = IVF_MIN_TRAIN_ROWS
+    ):
+        self.base = base
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self._fixed_nlist = nlist
+        self._lock = threading.RLock()
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Optional[_InvertedLists] = None
+        self._trained_rows = 0
+        self._quantizer_key: Optional[Tuple[int, int]] = None
+        self._worker: Optional[threading.Thread] = None
+        self._maintain()
+
+    # Delegated VectorIndex API
+
+    @property
+    def dimensions(self) -> Optional[int]:
+        return self.base.dimensions
+
+    @property
+    def metric(self) -> str:
+        return self.base.metric
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = self.base.remove(ids)
+        self._maintain()
+        return removed
+
+    def remove_group(self, group: str) -> int:
+        removed = self.base.remove_group(group)
+        self._maintain()
+        return removed
+
+    def add(self, ids: Sequence[str], vectors, group: Optional[str] = None) -> int:
+        with self._lock:
+            added = self.base.add(ids, vectors, group)
+            self._assign_new_rows()
+        self._maintain()
+        return added
+
+    def compact(self) -> None:
+        with self._lock:
+            self.base.compact()
+        # Row numbers changed; the lists are rebuilt against the same centroids
+        self._maintain()
+
+    # Training and list maintenance
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the lists cover the base index's current row numbering."""
+        return self._lists is not None and self._lists.epoch == self.base._epoch
+
+    @property
+    def needs_training(self) -> bool:
+        if not self.trained:
+            return len(self.base) >= self.min_train_rows
+        return len(self.base) >= IVF_RETRAIN_GROWTH * max(self._trained_rows, 1)
+
+    def _base_path(self, name: str) -> Optional[str]:
+        path = getattr(self.base, "path", None)
+        return os.path.join(path, name) if path else None
+
+    def _maintain(self) -> None:
+        """Start background work the index needs: training, or (re)building its lists."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            quantizer = self._changed_quantizer()
+            if quantizer is not None:
+                target = functools.partial(self._install, *quantizer)
+            elif self.needs_training:
+                target = self.train
+            elif self.trained and not self.ready:
+                target = functools.partial(self._install, self._centroids, self._trained_rows)
+            else:
+                return
+            self._worker = threading.Thread(target=self._run_in_background, args=(target,), daemon=True)
+            self._worker.start()
+
+    def _run_in_background(self, target) -> None:
+        try:
+            target()
+        except Exception as e:
+            logger.exception(f"IVF index maintenance failed: {e}")
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> bool:
+        """Block until background training or list building is done. Returns whether it is."""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        return worker is None or not worker.is_alive()
+
+    def _changed_quantizer(self) -> Optional[Tuple[np.ndarray, int]]:
+        """Centroids saved by another process (or an earlier run) that are not loaded yet."""
+        path = self._base_path(QUANTIZER_FILE)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns)
+        if key == self._quantizer_key:
+            return None
+        self._quantizer_key = key
+        with np.load(path) as data:
+            return data["centroids"], int(data["trained_rows"])
+
+    def _save_quantizer(self, centroids: np.ndarray, trained_rows: int) -> None:
+        path = self._base_path(QUANTIZER_FILE)
+        if path is None:
+            return
+        buffer = io.BytesIO()
+        np.savez(buffer, centroids=centroids, trained_rows=np.int64(trained_rows))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        with self._lock:
+            self._quantizer_key = (stat.st_ino, stat.st_mtime_ns)
+
+    def train(self, seed: int = 0) -> None:
+        """(Re)train the coarse quantizer on the live vectors and rebuild the lists.
+
+        Runs on the calling thread; `add` starts it in the background when
+        the collection first reaches `min_train_rows` or has grown
+        IVF_RETRAIN_GROWTH times since the last training. Only one process
+        trains a segmented index at a time; the others load its result.
+        """
+        lock_path = self._base_path(TRAIN_LOCK_FILE)
+        lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644) if lock_path and fcntl else None
+        try:
+            if lock_fd is not None:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                # Another process may have trained while we waited for the lock
+                with self._lock:
+                    quantizer = self._changed_quantizer()
+                if quantizer is not None:
+                    self._install(*quantizer)
+                    if not self.needs_training:
+                        return
+
+            with self._lock, self.base._lock:
+                live_rows = np.flatnonzero(self.base._live[:self.base._size])
+                if len(live_rows) == 0:
+                    return
+                nlist = self._fixed_nlist or int(np.clip(np.sqrt(len(live_rows)), 16, 16384))
+                nlist = min(nlist, len(live_rows))
+                sample_size = min(len(live_rows), nlist * IVF_TRAIN_SAMPLE_PER_LIST)
+                rng = np.random.default_rng(seed)
+                sample = self.base._rows(np.sort(rng.choice(live_rows, sample_size, replace=False)))
+
+            centroids = self._train_centroids(sample, nlist, seed)
+            self._install(centroids, len(live_rows))
+            self._save_quantizer(centroids, len(live_rows))
+            logger.info(f"Trained IVF quantizer with {nlist} lists on {len(live_rows)} vectors")
+        finally:
+            if lock_fd is not None:
+                os.close(lock_fd)
+
+    def _train_centroids(self, sample: np.ndarray, nlist: int, seed: int) -> np.ndarray:
+        # k-means is the CPU-heavy part; it runs in the process pool
+        return call_in_process(train_kmeans, sample, nlist, spherical=self.metric == "cosine", seed=seed)
+
+    def _install(self, centroids: np.ndarray, trained_rows: int) -> None:
+        """Assign every row to `centroids`, then swap them in with the new lists.
+
+        Rows are assigned a block at a time, holding the locks only to copy
+        each block, so searches keep using the previous lists meanwhile.
+        """
+        lists: Optional[_InvertedLists] = None
+        while True:
+            with self._lock, self.base._lock:
+                if lists is None or lists.epoch != self.base._epoch:
+                    # (Re)start when compaction renumbers the rows under us
+                    lists = _InvertedLists(len(centroids), self.base._epoch)
+                if self.base._size - lists.assigned <= ASSIGN_TAIL_ROWS:
+                    # Few rows left: finish under the lock and swap
+                    self._assign(lists, centroids, self.base._size)
+                    self._centroids = centroids
+                    self._lists = lists
+                    self._trained_rows = trained_rows
+                    self.nlist = len(centroids)
+                    return
+                rows = np.arange(lists.assigned, min(lists.assigned + ASSIGN_BLOCK_ROWS, self.base._size))
+                vectors = self.base._rows(rows)
+            lists.add(rows, np.argmax(vectors @ centroids.T, axis=1))
+
+    def _assign(self, lists: _InvertedLists, centroids: np.ndarray, size: int) -> None:
+        for start in range(lists.assigned, size, ASSIGN_BLOCK_ROWS):
+            rows = np.arange(start, min(start + ASSIGN_BLOCK_ROWS, size))
+            lists.add(rows, np.argmax(self.base._rows(rows) @ centroids.T, axis=1))
+
+    def _assign_new_rows(self) -> None:
+        """Assign rows the base index gained since the last call to their lists."""
+        if self.ready and self._lists.assigned < self.base._size:
+            self._assign(self._lists, self._centroids, self.base._size)
+
+    # Search
+
+    def search(
+        self,
+        queries,
+        top_k: int = 10,
+        groups: Optional[Iterable[str]] = None,
+        nprobe: Optional[int] = None,
+        **params
+    ) -> List[List[SearchHit]]:
+        """Approximate batched top-k search probing `nprobe` lists per query.
+
+        Queries are grouped by the lists they probe, so each list's vectors
+        are gathered once and scored against all of its queries in one
+        matrix product.
+        """
+        self._maintain()
+        with self._lock, self.base._lock:
+            # Segmented indexes pick up rows written by other processes here
+            refresh = getattr(self.base, "_refresh_locked", None)
+            if refresh is not None:
+                with self.base._file_lock(exclusive=False):
+                    refresh()
+            if not self.ready:
+                # Exact search until the lists are (re)built
+                self._maintain()
+                return self.base.search(queries, top_k=top_k, groups=groups)
+            self._assign_new_rows()
+            if not len(self.base) or top_k <= 0:
+                num_queries = np.atleast_2d(np.asarray(queries, dtype=np.float32)).shape[0]
+                return [[] for _ in range(num_queries)]
+
+            query_matrix = self.base._prepare(queries)
+            num_queries = len(query_matrix)
+            nprobe = min(nprobe or self.nprobe, len(self._centroids))
+            probes = np.argpartition(-(query_matrix @ self._centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+            mask = self.base._row_mask(groups)
+
+            if num_queries == 1:
+                # One query: score all of its probed rows in one product
+                batches = [(np.concatenate([self._lists.rows(p) for p in probes[0]]), np.zeros(1, dtype=np.int64))]
+            else:
+                # Invert the probes: the queries that probe each list
+                probed_lists = probes.ravel()
+                probing_queries = np.repeat(np.arange(num_queries), nprobe)
+                order = np.argsort(probed_lists, kind="stable")
+                lists, starts = np.unique(probed_lists[order], return_index=True)
+                ends = np.append(starts[1:], len(order))
+                batches = (
+                    (self._lists.rows(list_no), probing_queries[order[start:end]])
+                    for list_no, start, end in zip(lists, starts, ends)
+                )
+
+            best_scores = np.full((num_queries, top_k), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((num_queries, top_k), dtype=np.int64)
+            for rows, query_nos in batches:
+                rows = rows[mask[rows]]
+                if not len(rows):
+                    continue
+                scores = query_matrix[query_nos] @ self.base._rows(rows).T
+                scores, score_rows = _merge_top_k(scores, np.broadcast_to(rows, scores.shape), top_k)
+                best_scores[query_nos], best_rows[query_nos] = _merge_top_k(
+                    np.concatenate([best_scores[query_nos], scores], axis=1),
+                    np.concatenate([best_rows[query_nos], score_rows], axis=1),
+                    top_k
+                )
+
+            return self.base._to_hits(best_scores, best_rows)
+
+    def stats(self) -> Dict[str, object]:
+        stats = self.base.stats()
+        stats.update({
+            "index_type": "ivf",
+            "trained": self.trained,
+            "ready": self.ready,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "trained_rows": self._trained_rows
+        })
+        if self.ready:
+            stats["largest_list"] = int(self._lists.sizes.max())
+        return stats
@@ -0,0 +1,385 @@
+"""
+On-disk vector segments backing every VectorDB record.
+
+A "local:<path>" connection string names the directory; records without
+one are stored under VECTOR_DATA_PATH/<vector_db_id>.
+
+Layout of a local vector database directory:
+
+    manifest.json           {"format": 1, "dimensions": d, "metric": "cosine", "generation": g}
+    seg-<g>-000000.f32      append-only float32 rows, fixed stride of d * 4 bytes
+    seg-<g>-000000.ids      one "<chunk_id>\\t<group>" line per row of the .f32 file
+    tombstones-<g>.rows     one global row number per removed row
+    LOCK                    flock target serializing writers across processes
+
+Segments are opened read-only through numpy.memmap, so every worker process
+searches the same page-cached copy of the vectors and a restart only re-reads
+the small id side tables.
+
+Compaction copies the live rows into the segments of generation g + 1 and
+then swaps the manifest, all under the exclusive lock. Other processes see
+the new generation on their next refresh and reload from it; the files of
+the old generation are deleted (mappings that are still open keep working).
+"""
+import contextlib
+import glob
+import json
+import os
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.vector_store import SEARCH_BLOCK_ROWS, VectorIndex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX development machines
+    fcntl = None
+
+LOCAL_PREFIX = "local:"
+VECTOR_DATA_PATH = os.getenv("VECTOR_DATA_PATH", "./data/vector_dbs")
+SEGMENT_FORMAT = 1
+SEGMENT_MAX_ROWS = int(os.getenv("VECTOR_SEGMENT_MAX_ROWS", "262144"))
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "LOCK"
+
+def local_path(connection_string: Optional[str]) -> Optional[str]:
+    """Return the directory of a "local:<path>" connection string, else None."""
+    if connection_string and connection_string.startswith(LOCAL_PREFIX):
+        return connection_string[len(LOCAL_PREFIX):]
+    return None
+
+def default_path(vector_db_id: str) -> str:
+    """Directory of a vector database whose connection string is not "local:"."""
+    return os.path.join(VECTOR_DATA_PATH, vector_db_id)
+
+def storage_path(vector_db) -> str:
+    """Directory holding the segments of a VectorDB record."""
+    return local_path(vector_db.connection_string) or default_path(vector_db.id)
+
+class _Segment:
+    """One .f32/.ids file pair; only the last segment of an index grows."""
+
+    __slots__ = ("number", "start", "rows", "ids_offset", "matrix")
+
+    def __init__(self, number: int, start: int):
+        self.number = number
+        self.start = start
+        self.rows = 0
+        self.ids_offset = 0
+        self.matrix: Optional[np.ndarray] = None
+
+class SegmentedVectorIndex(VectorIndex):
+    """Exact vector index whose rows are stored in memory-mapped segment files.
+
+    Ids, groups and tombstones are kept in memory (they are small); vectors
+    stay on disk. Writes from any process are appended under an exclusive
+    flock and picked up by other processes on their next search.
+    """
+
+    def __init__(self, path: str, metric: str = "cosine"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest = self._read_manifest()
+        if manifest:
+            metric = manifest.get("metric", metric)
+        super().__init__(manifest.get("dimensions") if manifest else None, metric)
+        self._generation = manifest.get("generation", 0) if manifest else 0
+        self._manifest_key: Optional[Tuple[int, int]] = None
+        self._segments: List[_Segment] = []
+        self._tombstone_offset = 0
+        self._lock_fd: Optional[int] = None
+        self._lock_depth = 0
+        with self._lock, self._file_lock(exclusive=False):
+            self._refresh_locked()
+
+    # Files and locking
+
+    def _segment_path(self, number: int, suffix: str, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.path, f"seg-{generation:06d}-{number:06d}.{suffix}")
+
+    def _tombstone_path(self, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.path, f"tombstones-{generation:06d}.rows")
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        if manifest.get("format") != SEGMENT_FORMAT:
+            raise ValueError(f"Unsupported vector segment format in {self.path}: {manifest.get('format')}")
+        return manifest
+
+    def _write_manifest(self, generation: Optional[int] = None) -> None:
+        tmp_path = os.path.join(self.path, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "format": SEGMENT_FORMAT,
+                "dimensions": self.dimensions,
+                "metric": self.metric,
+                "generation": self._generation if generation is None else generation
+            }, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_FILE))
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Re-entrant inter-process lock; callers must hold self._lock."""
+        if fcntl is None or self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        if self._lock_fd is None:
+            self._lock_fd = os.open(os.path.join(self.path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # Loading rows written by this or other processes
+
+    def _check_manifest(self) -> bool:
+        """Follow a manifest swapped by compaction. Returns False before the first write."""
+        try:
+            stat = os.stat(os.path.join(self.path, MANIFEST_FILE))
+        except FileNotFoundError:
+            return False
+        key = (stat.st_ino, stat.st_mtime_ns)
+        if key == self._manifest_key:
+            return True
+        manifest = self._read_manifest()
+        if manifest is None:
+            return False
+        self._manifest_key = key
+        if self.dimensions is None:
+            self.dimensions = manifest["dimensions"]
+        generation = manifest.get("generation", 0)
+        if generation != self._generation:
+            self._reset_rows()
+            self._generation = generation
+        return True
+
+    def _reset_rows(self) -> None:
+        """Forget every loaded row so the current generation is read from scratch."""
+        self._size = 0
+        self._ids = []
+        self._row_of = {}
+        self._group_codes = {}
+        self._group_names = []
+        self._groups = np.empty(0, dtype=np.int32)
+        self._live = np.zeros(0, dtype=bool)
+        self._segments = []
+        self._tombstone_offset = 0
+        self._epoch += 1
+
+    def _refresh_locked(self) -> None:
+        """Pick up rows and tombstones appended since the last refresh."""
+        if not self._check_manifest():
+            return
+
+        stride = self.dimensions * 4
+        prefix = os.path.join(self.path, f"seg-{self._generation:06d}-")
+        numbers = sorted(int(p[len(prefix):-len(".f32")]) for p in glob.glob(prefix + "*.f32"))
+        for number in numbers:
+            if self._segments and number <= self._segments[-1].number:
+                segment = next(s for s in self._segments if s.number == number)
+            else:
+                segment = _Segment(number, self._size)
+                self._segments.append(segment)
+            self._load_segment_tail(segment, stride)
+
+        tombstone_path = self._tombstone_path()
+        if os.path.exists(tombstone_path):
+            with open(tombstone_path, "rb") as f:
+                f.seek(self._tombstone_offset)
+                data = f.read()
+            complete = data[:data.rfind(b"\n") + 1]
+            self._tombstone_offset += len(complete)
+            for line in complete.splitlines():
+                row = int(line)
+                if row < self._size and self._live[row]:
+                    self._live[row] = False
+                    if self._row_of.get(self._ids[row]) == row:
+                        del self._row_of[self._ids[row]]
+
+    def _load_segment_tail(self, segment: _Segment, stride: int) -> None:
+        vec_rows = os.path.getsize(self._segment_path(segment.number, "f32")) // stride
+        if vec_rows <= segment.rows:
+            return
+
+        # Only rows with both a vector and an id line are visible
+        with open(self._segment_path(segment.number, "ids"), "rb") as f:
+            f.seek(segment.ids_offset)
+            data = f.read()
+        lines = data.split(b"\n")[:-1][:vec_rows - segment.rows]
+        if not lines:
+            return
+
+        new_rows = len(lines)
+        start = self._size
+        self._reserve(new_rows)
+        for offset, line in enumerate(lines):
+            chunk_id, _, group = line.decode("utf-8").partition("\t")
+            row = start + offset
+            previous = self._row_of.get(chunk_id)
+            if previous is not None:
+                self._live[previous] = False
+            self._row_of[chunk_id] = row
+            self._ids.append(chunk_id)
+            self._groups[row] = self._group_code(group or None)
+            self._live[row] = True
+        self._size += new_rows
+        segment.rows += new_rows
+        segment.ids_offset += sum(len(line) + 1 for line in lines)
+        segment.matrix = np.memmap(
+            self._segment_path(segment.number, "f32"),
+            dtype=np.float32,
+            mode="r",
+            shape=(segment.rows, self.dimensions)
+        )
+
+    # VectorIndex storage hooks
+
+    def _reserve_vectors(self, capacity: int) -> None:
+        # Vectors live in the segment files, not in an in-memory matrix
+        pass
+
+    def _write_rows(self, start: int, vectors: np.ndarray, ids: Sequence[str], group_code: int) -> None:
+        if not os.path.exists(os.path.join(self.path, MANIFEST_FILE)):
+            self._write_manifest()
+        group = self._group_names[group_code] if group_code >= 0 else ""
+        stride = self.dimensions * 4
+        written = 0
+        while written < len(ids):
+            segment = self._writable_segment()
+            count = min(len(ids) - written, SEGMENT_MAX_ROWS - segment.rows)
+            vec_path = self._segment_path(segment.number, "f32")
+            ids_path = self._segment_path(segment.number, "ids")
+
+            # Trim any partial write left behind by a crashed writer
+            with open(vec_path, "ab") as f:
+                f.truncate(segment.rows * stride)
+                f.write(np.ascontiguousarray(vectors[written:written + count]).tobytes())
+            id_lines = "".join(f"{chunk_id}\t{group}\n" for chunk_id in ids[written:written + count])
+            id_bytes = id_lines.encode("utf-8")
+            with open(ids_path, "ab") as f:
+                f.truncate(segment.ids_offset)
+                f.write(id_bytes)
+
+            segment.rows += count
+            segment.ids_offset += len(id_bytes)
+            segment.matrix = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(segment.rows, self.dimensions))
+            written += count
+
+    def _writable_segment(self) -> _Segment:
+        if not self._segments or self._segments[-1].rows >= SEGMENT_MAX_ROWS:
+            if self._segments:
+                last = self._segments[-1]
+                segment = _Segment(last.number + 1, last.start + last.rows)
+            else:
+                segment = _Segment(0, 0)
+            number = segment.number
+            open(self._segment_path(number, "f32"), "ab").close()
+            open(self._segment_path(number, "ids"), "ab").close()
+            self._segments.append(segment)
+        return self._segments[-1]
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        for segment in self._segments:
+            if segment.rows:
+                yield segment.start, segment.matrix
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = np.array([segment.start for segment in self._segments], dtype=np.int64)
+        which = np.searchsorted(starts, rows, side="right") - 1
+        result = np.empty((len(rows), self.dimensions), dtype=np.float32)
+        for position in np.unique(which):
+            selected = which == position
+            segment = self._segments[position]
+            result[selected] = segment.matrix[rows[selected] - segment.start]
+        return result
+
+    # Public API
+
+    def add(self, ids: Sequence[str], vectors, group: Optional[str] = None) -> int:
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            return super().add(ids, vectors, group)
+
+    def remove(self, ids) -> int:
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            ids = list(ids)
+            rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+            if rows:
+                with open(self._tombstone_path(), "ab") as f:
+                    f.write("".join(f"{row}\n" for row in rows).encode("ascii"))
+                    self._tombstone_offset = f.tell()
+            return super().remove(ids)
+
+    def remove_group(self, group: str) -> int:
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            return super().remove_group(group)
+
+    def search(self, queries, top_k: int = 10, groups=None, **params):
+        with self._lock:
+            with self._file_lock(exclusive=False):
+                self._refresh_locked()
+            return super().search(queries, top_k=top_k, groups=groups, **params)
+
+    def compact(self) -> None:
+        """Rewrite the live rows into a new generation of segments."""
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            if len(self._row_of) == self._size:
+                return
+            generation = self._generation + 1
+            self._write_generation(generation)
+            self._write_manifest(generation)
+            self._refresh_locked()
+            self._delete_old_generations()
+
+    def _write_generation(self, generation: int) -> None:
+        """Copy the live rows, in order, into the segment files of `generation`."""
+        live_rows = np.flatnonzero(self._live[:self._size])
+        for number, first in enumerate(range(0, max(len(live_rows), 1), SEGMENT_MAX_ROWS)):
+            segment_rows = live_rows[first:first + SEGMENT_MAX_ROWS]
+            with open(self._segment_path(number, "f32", generation), "wb") as vec_file, \
+                    open(self._segment_path(number, "ids", generation), "wb") as ids_file:
+                for start in range(0, len(segment_rows), SEARCH_BLOCK_ROWS):
+                    rows = segment_rows[start:start + SEARCH_BLOCK_ROWS]
+                    vec_file.write(self._rows(rows).tobytes())
+                    ids_file.write("".join(
+                        f"{self._ids[row]}\t{self._group_name(row)}\n" for row in rows
+                    ).encode("utf-8"))
+
+    def _group_name(self, row: int) -> str:
+        code = int(self._groups[row])
+        return self._group_names[code] if code >= 0 else ""
+
+    def _delete_old_generations(self) -> None:
+        current = (f"seg-{self._generation:06d}-", f"tombstones-{self._generation:06d}.")
+        for pattern in ("seg-*", "tombstones-*"):
+            for path in glob.glob(os.path.join(self.path, pattern)):
+                if not os.path.basename(path).startswith(current):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        # Still mapped on a platform that forbids it; the next compaction retries
+                        pass
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({"path": self.path, "segments": len(self._segments), "generation": self._generation})
+        return stats
@@ -0,0 +1,317 @@
+"""
+In-process vector indexes keyed by VectorDB id.
+
+Vectors live in one contiguous float32 matrix per index (rows L2-normalized
+for cosine search) and are searched in batches with one matrix product per
+block of rows.
+"""
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+INITIAL_CAPACITY = int(os.getenv("VECTOR_INDEX_INITIAL_CAPACITY", "1024"))
+SEARCH_BLOCK_ROWS = int(os.getenv("VECTOR_SEARCH_BLOCK_ROWS", "65536"))
+
+# Compact once tombstoned rows outnumber live ones (and there are this many)
+COMPACT_MIN_DEAD = int(os.getenv("VECTOR_COMPACT_MIN_DEAD", "1024"))
+
+METRICS = ("cosine", "dot")
+INDEX_TYPES = ("flat", "ivf")
+
+class SearchHit(NamedTuple):
+    id: str
+    score: float
+    group: Optional[str]
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return a C-contiguous float32 copy of `vectors` with unit-length rows."""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2, copy=True, order="C")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def _merge_top_k(
+    scores: np.ndarray,
+    rows: np.ndarray,
+    top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the `top_k` best (unordered) columns of each query row."""
+    if scores.shape[1] <= top_k:
+        return scores, rows
+    keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+
+class VectorIndex:
+    """Exact (brute-force) vector index held in memory.
+
+    Each row carries a string id (the chunk id) and an optional group (the
+    embedding id it belongs to) so a whole embedding can be removed or
+    searched on its own. Removed rows are tombstoned and dropped on compaction,
+    which runs once dead rows outnumber live ones and renumbers the rows
+    (bumping `_epoch`, so layers keyed by row number know to rebuild).
+    """
+
+    def __init__(self, dimensions: Optional[int] = None, metric: str = "cosine"):
+        if metric not in METRICS:
+            raise ValueError(f"Unsupported metric '{metric}', expected one of {METRICS}")
+        self.dimensions = dimensions
+        self.metric = metric
+        self._lock = threading.RLock()
+        self._size = 0
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._group_codes: Dict[str, int] = {}
+        self._group_names: List[str] = []
+        self._matrix = np.empty((0, dimensions or 0), dtype=np.float32)
+        self._groups = np.empty(0, dtype=np.int32)
+        self._live = np.zeros(0, dtype=bool)
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # Storage hooks (overridden by on-disk indexes)
+
+    def _reserve(self, extra: int) -> None:
+        """Grow the row arrays so `extra` more rows fit without reallocating."""
+        needed = self._size + extra
+        capacity = self._live.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, INITIAL_CAPACITY)
+        self._reserve_vectors(new_capacity)
+        self._groups = np.resize(self._groups, new_capacity)
+        live = np.zeros(new_capacity, dtype=bool)
+        live[:self._size] = self._live[:self._size]
+        self._live = live
+
+    def _reserve_vectors(self, capacity: int) -> None:
+        matrix = np.empty((capacity, self.dimensions), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+    def _write_rows(self, start: int, vectors: np.ndarray, ids: Sequence[str], group_code: int) -> None:
+        self._matrix[start:start + len(vectors)] = vectors
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (first_row, matrix) blocks covering rows [0, size)."""
+        yield 0, self._matrix[:self._size]
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        """Gather the vectors stored at the given row numbers."""
+        return self._matrix[rows]
+
+    # Public API
+
+    def _prepare(self, vectors) -> np.ndarray:
+        if self.metric == "cosine":
+            matrix = normalize_rows(vectors)
+        else:
+            matrix = np.array(vectors, dtype=np.float32, ndmin=2, copy=True, order="C")
+        if self.dimensions is not None and matrix.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Vector dimension mismatch: index has {self.dimensions}, got {matrix.shape[1]}"
+            )
+        return matrix
+
+    def _group_code(self, group: Optional[str]) -> int:
+        if group is None:
+            return -1
+        code = self._group_codes.get(group)
+        if code is None:
+            code = len(self._group_names)
+            self._group_codes[group] = code
+            self._group_names.append(group)
+        return code
+
+    def add(self, ids: Sequence[str], vectors, group: Optional[str] = None) -> int:
+        """Add (or replace) vectors under the given ids. Returns rows written."""
+        ids = list(ids)
+        if not ids:
+            return 0
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = int(np.asarray(vectors[0]).shape[-1])
+                self._matrix = np.empty((0, self.dimensions), dtype=np.float32)
+            matrix = self._prepare(vectors)
+            if len(matrix) != len(ids):
+                raise ValueError(f"Got {len(ids)} ids for {len(matrix)} vectors")
+
+            # Replacing an id tombstones its previous row
+            self.remove(ids)
+
+            code = self._group_code(group)
+            start = self._size
+            self._reserve(len(ids))
+            self._write_rows(start, matrix, ids, code)
+            self._groups[start:start + len(ids)] = code
+            self._live[start:start + len(ids)] = True
+            for offset, chunk_id in enumerate(ids):
+                self._row_of[chunk_id] = start + offset
+            self._ids.extend(ids)
+            self._size += len(ids)
+            return len(ids)
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """Tombstone the rows for the given ids. Returns rows removed."""
+        removed = 0
+        with self._lock:
+            for chunk_id in ids:
+                row = self._row_of.pop(chunk_id, None)
+                if row is not None:
+                    self._live[row] = False
+                    removed += 1
+            dead = self._size - len(self._row_of)
+            if dead >= COMPACT_MIN_DEAD and dead > len(self._row_of):
+                self.compact()
+        return removed
+
+    def remove_group(self, group: str) -> int:
+        """Tombstone every row that belongs to `group`."""
+        with self._lock:
+            code = self._group_codes.get(group)
+            if code is None:
+                return 0
+            rows = np.flatnonzero(self._live[:self._size] & (self._groups[:self._size] == code))
+            return self.remove([self._ids[row] for row in rows])
+
+    def _row_mask(self, groups: Optional[Iterable[str]]) -> np.ndarray:
+        mask = self._live[:self._size]
+        if groups is not None:
+            codes = [self._group_codes[g] for g in groups if g in self._group_codes]
+            mask = mask & np.isin(self._groups[:self._size], codes)
+        return mask
+
+    def search(
+        self,
+        queries,
+        top_k: int = 10,
+        groups: Optional[Iterable[str]] = None,
+        **params
+    ) -> List[List[SearchHit]]:
+        """Batched top-k search.
+
+        `queries` is one vector or a (num_queries, dimensions) matrix; the
+        result holds one best-first hit list per query. When `groups` is set
+        only rows from those groups are considered. `params` carries tuning
+        knobs for approximate indexes and is ignored by exact search.
+        """
+        with self._lock:
+            if not self._row_of or top_k <= 0:
+                num_queries = np.atleast_2d(np.asarray(queries, dtype=np.float32)).shape[0]
+                return [[] for _ in range(num_queries)]
+            query_matrix = self._prepare(queries)
+            num_queries = len(query_matrix)
+
+            mask = self._row_mask(groups)
+            best_scores = np.empty((num_queries, 0), dtype=np.float32)
+            best_rows = np.empty((num_queries, 0), dtype=np.int64)
+
+            for first_row, block in self._blocks():
+                for start in range(0, len(block), SEARCH_BLOCK_ROWS):
+                    sub = block[start:start + SEARCH_BLOCK_ROWS]
+                    base = first_row + start
+                    sub_mask = mask[base:base + len(sub)]
+                    if not sub_mask.any():
+                        continue
+                    scores = query_matrix @ sub.T
+                    if not sub_mask.all():
+                        scores[:, ~sub_mask] = -np.inf
+                    rows = np.broadcast_to(np.arange(base, base + len(sub)), scores.shape)
+                    scores, rows = _merge_top_k(scores, rows, top_k)
+                    best_scores, best_rows = _merge_top_k(
+                        np.concatenate([best_scores, scores], axis=1),
+                        np.concatenate([best_rows, rows], axis=1),
+                        top_k
+                    )
+
+            return self._to_hits(best_scores, best_rows)
+
+    def _to_hits(self, scores: np.ndarray, rows: np.ndarray) -> List[List[SearchHit]]:
+        order = np.argsort(-scores, axis=1, kind="stable")
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        results = []
+        for query_scores, query_rows in zip(scores, rows):
+            hits = []
+            for score, row in zip(query_scores, query_rows):
+                if not np.isfinite(score):
+                    break
+                code = int(self._groups[row])
+                hits.append(SearchHit(
+                    id=self._ids[row],
+                    score=float(score),
+                    group=self._group_names[code] if code >= 0 else None
+                ))
+            results.append(hits)
+        return results
+
+    def compact(self) -> None:
+        """Drop tombstoned rows so the matrix stays dense."""
+        with self._lock:
+            if len(self._row_of) == self._size:
+                return
+            keep = np.flatnonzero(self._live[:self._size])
+            self._matrix = np.ascontiguousarray(self._matrix[keep])
+            self._groups = self._groups[keep]
+            self._live = np.ones(len(keep), dtype=bool)
+            self._ids = [self._ids[row] for row in keep]
+            self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._size = len(keep)
+            self._epoch += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "vectors": len(self),
+            "rows": self._size,
+            "dimensions": self.dimensions,
+            "metric": self.metric,
+            "groups": len(self._group_names)
+        }
+
+# Registry of live indexes, one per VectorDB record
+_indexes: Dict[str, VectorIndex] = {}
+_registry_lock = threading.Lock()
+
+def get_vector_index(vector_db) -> VectorIndex:
+    """Get (or create) the index that backs a VectorDB record.
+
+    Vectors live in memory-mapped segment files, under <path> for
+    "local:<path>" connection strings and under VECTOR_DATA_PATH/<id>
+    otherwise, so every worker sees them and they survive restarts.
+    Records with index_type "ivf" get an approximate IVF layer on top.
+    """
+    with _registry_lock:
+        index = _indexes.get(vector_db.id)
+        if index is None:
+            from app.core.vector_segments import SegmentedVectorIndex, storage_path
+            index = SegmentedVectorIndex(storage_path(vector_db))
+
+            index_type = getattr(vector_db, "index_type", None) or "flat"
+            params = getattr(vector_db, "index_params", None) or {}
+            if index_type == "ivf":
+                from app.core.vector_ann import IVFIndex
+                index = IVFIndex(
+                    index,
+                    nlist=params.get("nlist"),
+                    **{k: params[k] for k in ("nprobe", "min_train_rows") if k in params}
+                )
+            elif index_type not in INDEX_TYPES:
+                raise ValueError(f"Unsupported index type '{index_type}'")
+            _indexes[vector_db.id] = index
+        return index
+
+def drop_vector_index(vector_db_id: str) -> None:
+    """Forget the index for a deleted VectorDB record and remove its default storage.
+
+    Directories named by a "local:" connection string belong to the user and
+    are left in place.
+    """
+    from app.core.vector_segments import default_path
+    with _registry_lock:
+        _indexes.pop(vector_db_id, None)
+        shutil.rmtree(default_path(vector_db_id), ignore_errors=True)
@@ -0,0 +1,123 @@
+"""
+Bulk row inserts.
+
+Writing thousands of rows as ORM objects spends most of its time in the
+unit of work, so bulk writes (chunk rows, embedding cache entries) go
+through `bulk_insert` instead:
+
+    bulk_insert(db, Chunk, rows, on_batch=lambda done, total: ...)
+
+Rows are plain dicts keyed by column name and are written in batches of
+BULK_INSERT_BATCH_SIZE, with PostgreSQL `COPY ... FROM STDIN` (psycopg2)
+where possible and a Core executemany INSERT otherwise. Everything runs in
+the session's current transaction; the caller commits.
+"""
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import Table, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+BULK_INSERT_BATCH_SIZE = int(os.getenv("BULK_INSERT_BATCH_SIZE", "5000"))
+BULK_USE_COPY = os.getenv("BULK_USE_COPY", "true").lower() == "true"
+
+ProgressCallback = Callable[[int, int], None]
+
+def _table(target: Any) -> Table:
+    """The Table of a mapped class (or the Table itself)."""
+    return getattr(target, "__table__", target)
+
+def _batches(rows: Sequence[Dict[str, Any]], size: int) -> Iterable[Sequence[Dict[str, Any]]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def _copy_supported(db: Session, table: Table, keys: List[str]) -> bool:
+    """COPY needs psycopg2 and skips client-side column defaults, so every
+    column with one must be given in the rows."""
+    connection = db.connection()
+    if not BULK_USE_COPY or connection.dialect.name != "postgresql":
+        return False
+    if connection.dialect.driver != "psycopg2":
+        return False
+    return all(
+        column.name in keys or column.default is None
+        for column in table.columns
+    )
+
+def _copy_escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+def _copy_value(value: Any) -> str:
+    """A value in COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # bytea hex format; the backslash itself is escaped for COPY
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return _copy_escape(json.dumps(value))
+    return _copy_escape(str(value))
+
+def _copy_rows(db: Session, table: Table, keys: List[str], rows: Sequence[Dict[str, Any]]) -> None:
+    connection = db.connection()
+    preparer = connection.dialect.identifier_preparer
+    statement = "COPY {} ({}) FROM STDIN".format(
+        preparer.format_table(table),
+        ", ".join(preparer.quote(key) for key in keys)
+    )
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(row.get(key)) for key in keys))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    except connection.dialect.loaded_dbapi.Error as e:
+        # Surface driver errors as SQLAlchemy's (e.g. IntegrityError), like execute() does
+        raise DBAPIError.instance(statement, None, e, connection.dialect.loaded_dbapi.Error)
+    finally:
+        cursor.close()
+
+def bulk_insert(
+    db: Session,
+    target: Any,
+    rows: Sequence[Dict[str, Any]],
+    batch_size: int = BULK_INSERT_BATCH_SIZE,
+    on_batch: Optional[ProgressCallback] = None
+) -> int:
+    """Insert `rows` into a model's table in batches (the caller commits).
+
+    `on_batch(done, total)` is called after each batch. Returns the number
+    of rows inserted.
+    """
+    if not rows:
+        return 0
+    table = _table(target)
+    keys = list(rows[0].keys())
+    use_copy = _copy_supported(db, table, keys)
+
+    done = 0
+    for batch in _batches(rows, batch_size):
+        if use_copy:
+            _copy_rows(db, table, keys, batch)
+        else:
+            db.execute(insert(table), batch)
+        done += len(batch)
+        if on_batch is not None:
+            on_batch(done, len(rows))
+    return done
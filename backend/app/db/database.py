@@ -4,6 +4,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 import re
+import multiprocessing
 import pathlib
 
 # Get database URL from environment or use SQLite default
@@ -27,7 +28,8 @@ if DATABASE_URL.startswith("sqlite"):
         if db_path.startswith('./'):
             db_path = db_path[2:]  # Remove leading ./ if present
         # Check if the database file exists and remove it if RESET_DB=true
-        if os.getenv("RESET_DB", "false").lower() == "true":
+        # (not in process pool workers, which re-import the main module)
+        if os.getenv("RESET_DB", "false").lower() == "true" and multiprocessing.parent_process() is None:
             try:
                 if os.path.exists(db_path):
                     os.remove(db_path)
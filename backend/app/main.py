@@ -22,6 +22,11 @@ from app.core.security import (
 )
 from app.api.dependencies.auth import get_current_user, get_current_active_user
 from app.api.v1 import api_router
+from app.core.ollama_client import start_ollama_client, close_ollama_client
+from app.core.background import start_job_workers, stop_job_workers
+from app.core.process_pool import shutdown_process_pool
+from app.core.cache import close_cache
+from app.services.storage_gc import start_storage_gc, stop_storage_gc
 
 # Create app
 app = FastAPI(
@@ -39,9 +44,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ollama API URL
-OLLAMA_API_URL = "http://localhost:11434/api"
-
 # Authentication routes
 @app.post("/token", response_model=Token)
 async def login_for_access_token(
@@ -144,6 +146,9 @@ app.include_router(api_router)
 # Set up basic admin user and default tools on startup
 @app.on_event("startup")
 async def startup():
+    # Open the pooled Ollama client shared by all services
+    await start_ollama_client()
+    
     # Create database tables if they don't exist
     Base.metadata.create_all(bind=engine)
     
@@ -193,6 +198,29 @@ async def startup():
         print(f"Error during startup: {e}")
     finally:
         db.close()
+    
+    # Start the background job workers once the tables exist
+    await start_job_workers()
+    
+    # Sweep blobs and cached extractions that no document uses anymore
+    start_storage_gc()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Stop job workers, returning running jobs to the queue
+    await stop_job_workers()
+    
+    # Stop the storage sweep
+    await stop_storage_gc()
+    
+    # Close pooled Ollama connections
+    await close_ollama_client()
+    
+    # Stop the CPU worker processes
+    shutdown_process_pool()
+    
+    # Close the cache's Redis connections
+    await close_cache()
 
 if __name__ == "__main__":
     import uvicorn
@@ -5,4 +5,8 @@ from app.models.tool import Tool
 from app.models.document import Document
 from app.models.vector_db import VectorDB
 from app.models.embedding import Embedding
+from app.models.chunk import Chunk
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.job import Job
+from app.models.extracted_text import ExtractedText
 from app.models.rag_system import RAGSystem
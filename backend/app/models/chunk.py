@@ -0,0 +1,26 @@
+# app/models/chunk.py
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+class Chunk(Base):
+    __tablename__ = "chunks"
+    
+    # Same id as the chunk's vector in the VectorDB index, so search hits map
+    # straight to rows by primary key
+    id = Column(String, primary_key=True)
+    embedding_id = Column(String, ForeignKey("embeddings.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    start = Column(Integer, nullable=False)  # Character offsets into the document's extracted text
+    end = Column(Integer, nullable=False)
+    token_count = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    text_hash = Column(String(64), nullable=False)  # sha256 of text
+    
+    # Relationships
+    embedding = relationship("Embedding", back_populates="chunk_rows")
+    
+    __table_args__ = (
+        Index("ix_chunks_embedding_id_position", "embedding_id", "position", unique=True),
+    )
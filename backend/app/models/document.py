@@ -1,5 +1,5 @@
 # app/models/document.py
-from sqlalchemy import Column, String, Text, ForeignKey
+from sqlalchemy import Column, String, Text, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import relationship
 from uuid import uuid4
 
@@ -11,8 +11,12 @@ class Document(Base, BaseModel):
     
     id = Column(String, primary_key=True, default=lambda: str(uuid4()))
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)  # Base64-encoded content
+    content = Column(Text, nullable=True)  # Base64-encoded content, only for storage="inline"
     file_type = Column(String, nullable=False)
+    storage = Column(String, nullable=False, default="inline")  # "inline" or "blob"
+    content_sha256 = Column(String(64), nullable=True)  # Blob store address
+    size_bytes = Column(BigInteger, nullable=True)
+    mime_type = Column(String, nullable=True)
     
     # Foreign keys
     creator_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -20,3 +24,7 @@ class Document(Base, BaseModel):
     # Relationships
     creator = relationship("User", back_populates="documents")
     embeddings = relationship("Embedding", back_populates="document", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_documents_content_sha256", "content_sha256"),
+    )
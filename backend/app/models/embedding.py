@@ -16,7 +16,7 @@ class Embedding(Base, BaseModel):
     model = Column(String, nullable=False)
     dimensions = Column(Integer, nullable=False)
     creator_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    chunks = Column(Text, nullable=True)  # JSON string of chunks
+    num_chunks = Column(Integer, nullable=False, default=0)  # Chunk rows live in the chunks table
     status = Column(String, nullable=False, default="pending", index=True)  # pending, processing, completed, failed
     error = Column(Text, nullable=True)  # Error message if status is failed
     chunk_size = Column(Integer, nullable=True)
@@ -27,6 +27,7 @@ class Embedding(Base, BaseModel):
     document = relationship("Document", back_populates="embeddings")
     vector_db = relationship("VectorDB", back_populates="embeddings")
     creator = relationship("User", back_populates="embeddings")
+    chunk_rows = relationship("Chunk", back_populates="embedding", passive_deletes=True, lazy="noload")
     
     # Additional indices
     __table_args__ = (
@@ -0,0 +1,21 @@
+# app/models/embedding_cache.py
+from sqlalchemy import Column, String, Integer, LargeBinary, DateTime, func, Index
+
+from app.db.database import Base
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    
+    # Content address: embedding model + sha256 of the chunk text
+    model = Column(String, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    dtype = Column(String, nullable=False)  # "float16" or "float32"
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # Raw little-endian array bytes
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    last_used_at = Column(DateTime, default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_embedding_cache_last_used_at", "last_used_at"),
+    )
@@ -0,0 +1,18 @@
+# app/models/extracted_text.py
+from sqlalchemy import Column, String, Integer, JSON, DateTime, func
+
+from app.db.database import Base
+
+class ExtractedText(Base):
+    __tablename__ = "extracted_texts"
+    
+    # Keyed by what determines the output: content, how it is parsed, and the extractor code
+    content_sha256 = Column(String(64), primary_key=True)
+    file_type = Column(String, primary_key=True)
+    extractor_version = Column(String, primary_key=True)
+    # The text is a file (see extraction_cache.extracted_text_path) of the
+    # pages joined with extraction.PAGE_SEPARATOR
+    page_offsets = Column(JSON, nullable=False)  # Start offset of each page in the file
+    num_pages = Column(Integer, nullable=False)
+    num_chars = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
@@ -0,0 +1,30 @@
+# app/models/job.py
+from sqlalchemy import Column, String, Integer, Text, DateTime, JSON, func, Index
+from uuid import uuid4
+
+from app.db.database import Base
+
+class Job(Base):
+    __tablename__ = "background_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid4()))
+    kind = Column(String, nullable=False)  # Name of the registered job handler
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    payload = Column(JSON, nullable=False, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    progress = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    worker_id = Column(String, nullable=True)  # host:pid of the worker running the job
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Claim order: pending jobs by priority, then age
+        Index("ix_background_jobs_claim", "status", "priority", "created_at"),
+        Index("ix_background_jobs_heartbeat_at", "heartbeat_at"),
+    )
@@ -1,5 +1,5 @@
 # app/models/vector_db.py
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from uuid import uuid4
 
@@ -13,6 +13,8 @@ class VectorDB(Base, BaseModel):
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)  # e.g., "chroma", "pinecone", etc.
     connection_string = Column(String, nullable=True)
+    index_type = Column(String, nullable=False, default="flat")  # "flat" (exact) or "ivf" (approximate)
+    index_params = Column(JSON, nullable=True)  # e.g. {"nlist": 1024, "nprobe": 16}
     
     # Foreign keys
     creator_id = Column(String, ForeignKey("users.id"), nullable=False)
@@ -14,7 +14,11 @@ class DocumentUpdate(BaseModel):
     
 class DocumentInDB(DocumentBase):
     id: str
-    content: str  # Base64-encoded content
+    content: Optional[str] = None  # Base64-encoded content, None when stored as a blob
+    storage: str = "inline"
+    content_sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    mime_type: Optional[str] = None
     creator_id: str
     created_at: datetime
 
@@ -25,6 +29,20 @@ class DocumentInDB(DocumentBase):
 class Document(DocumentInDB):
     pass
 
+class DocumentSummary(DocumentBase):
+    """Document metadata without the content, for listings."""
+    id: str
+    storage: str = "inline"
+    content_sha256: Optional[str] = None
+    size_bytes: Optional[int] = None
+    mime_type: Optional[str] = None
+    creator_id: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
+
 class DocumentList(BaseModel):
-    items: List[Document]
+    items: List[DocumentSummary]
     total: int
@@ -6,11 +6,22 @@ class EmbeddingBase(BaseModel):
     document_id: str
     vector_db_id: str
     model: str
-    chunk_size: int = 1000
-    chunk_overlap: int = 200
+    chunk_size: int = 256  # Tokens per chunk, within the 512-token context of small embedding models
+    chunk_overlap: int = 32  # Tokens shared by consecutive chunks
 
 class EmbeddingCreate(EmbeddingBase):
-    pass
+    # Update the existing embedding of this document, vector DB and model,
+    # only embedding chunks that changed
+    incremental: bool = False
+
+class EmbeddingBulkCreate(BaseModel):
+    document_ids: List[str] = []
+    rag_system_id: Optional[str] = None  # Also embed every document of this RAG system
+    vector_db_id: str
+    model: Optional[str] = None  # Defaults to the RAG system's embedding model
+    chunk_size: int = 256  # Tokens per chunk, within the 512-token context of small embedding models
+    chunk_overlap: int = 32  # Tokens shared by consecutive chunks
+    incremental: bool = False
 
 class EmbeddingUpdate(BaseModel):
     model: Optional[str] = None
@@ -23,7 +34,7 @@ class EmbeddingInDB(EmbeddingBase):
     creator_id: str
     status: str
     error: Optional[str] = None
-    chunks: Optional[str] = None
+    num_chunks: int = 0
     created_at: datetime
     updated_at: datetime
     completed_at: Optional[datetime] = None
@@ -43,3 +54,25 @@ class EmbeddingTaskResponse(BaseModel):
     task_id: str
     embedding_id: str
     status: str
+
+class EmbeddingBulkTaskResponse(BaseModel):
+    task_id: str
+    embedding_ids: List[str]
+    status: str
+
+class Chunk(BaseModel):
+    id: str
+    embedding_id: str
+    position: int
+    start: int
+    end: int
+    token_count: int
+    text: str
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
+
+class ChunkList(BaseModel):
+    items: List[Chunk]
+    total: int
@@ -1,5 +1,5 @@
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class RAGSystemBase(BaseModel):
@@ -36,3 +36,30 @@ class RAGSystemList(BaseModel):
 
 class RAGSystemQuery(BaseModel):
     text: str
+    top_k: Optional[int] = Field(None, ge=1, le=100)  # Chunks to retrieve (RAG_TOP_K by default)
+    model: Optional[str] = None  # LLM to answer with (RAG_LLM_MODEL by default)
+    max_context_tokens: Optional[int] = Field(None, ge=1)  # Token budget for retrieved context
+    retrieval: Optional[str] = None  # "hybrid", "vector" or "lexical" (RAG_RETRIEVAL_MODE by default)
+
+class RAGSystemBatchQuery(BaseModel):
+    queries: List[str] = Field(..., min_length=1)
+    top_k: Optional[int] = Field(None, ge=1, le=100)  # Chunks per query (RAG_TOP_K by default)
+    retrieval: Optional[str] = None  # "hybrid", "vector" or "lexical" (RAG_RETRIEVAL_MODE by default)
+
+class RetrievedChunk(BaseModel):
+    id: str
+    document_id: Optional[str] = None
+    embedding_id: Optional[str] = None
+    position: int
+    text: str
+    score: float
+
+class QueryRetrieval(BaseModel):
+    query: str
+    chunks: List[RetrievedChunk]
+
+class RAGSystemBatchRetrieval(BaseModel):
+    results: List[QueryRetrieval]
+    embedding_model: str
+    retrieval: str
+    timings_ms: Dict[str, float]
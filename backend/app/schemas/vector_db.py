@@ -1,11 +1,13 @@
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class VectorDBBase(BaseModel):
     name: str
     type: str
     connection_string: Optional[str] = None
+    index_type: str = "flat"  # "flat" (exact) or "ivf" (approximate)
+    index_params: Optional[Dict[str, Any]] = None
 
 class VectorDBCreate(VectorDBBase):
     pass
@@ -14,6 +16,8 @@ class VectorDBUpdate(BaseModel):
     name: Optional[str] = None
     type: Optional[str] = None
     connection_string: Optional[str] = None
+    index_type: Optional[str] = None
+    index_params: Optional[Dict[str, Any]] = None
 
 class VectorDBInDB(VectorDBBase):
     id: str
@@ -31,3 +35,20 @@ class VectorDB(VectorDBInDB):
 class VectorDBList(BaseModel):
     items: List[VectorDB]
     total: int
+
+class VectorSearchRequest(BaseModel):
+    vectors: List[List[float]]
+    top_k: int = Field(10, ge=1, le=1000)
+    embedding_ids: Optional[List[str]] = None
+    nprobe: Optional[int] = Field(None, ge=1)  # IVF lists probed per query
+    include_text: bool = False  # Attach each hit's chunk text and position
+
+class VectorSearchHit(BaseModel):
+    id: str
+    score: float
+    embedding_id: Optional[str] = None
+    position: Optional[int] = None
+    text: Optional[str] = None
+
+class VectorSearchResponse(BaseModel):
+    results: List[List[VectorSearchHit]]
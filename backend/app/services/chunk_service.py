@@ -0,0 +1,59 @@
+from sqlalchemy.orm import Session
+from typing import List, Tuple, Optional, Dict, Any, Iterable, Set
+
+from app.db.bulk import bulk_insert, ProgressCallback
+from app.models.chunk import Chunk
+
+# Ids per IN (...) batch
+CHUNK_BATCH_SIZE = 1000
+
+def _in_batches(values: List[Any], size: int = CHUNK_BATCH_SIZE) -> Iterable[List[Any]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def replace_chunks(
+    db: Session,
+    embedding_id: str,
+    rows: List[Dict[str, Any]],
+    on_batch: Optional[ProgressCallback] = None
+) -> int:
+    """Replace an embedding's chunk rows (the caller commits)."""
+    delete_chunks(db, [embedding_id])
+    return bulk_insert(db, Chunk, rows, on_batch=on_batch)
+
+def delete_chunks(db: Session, embedding_ids: List[str]) -> None:
+    """Delete the chunk rows of embeddings (the caller commits)."""
+    for batch in _in_batches(embedding_ids):
+        db.query(Chunk).filter(Chunk.embedding_id.in_(batch)).delete(synchronize_session=False)
+
+def get_chunk_ids(db: Session, embedding_id: str) -> Set[str]:
+    """Ids of an embedding's current chunks (their vector ids)."""
+    return {
+        chunk_id for (chunk_id,) in db.query(Chunk.id).filter(Chunk.embedding_id == embedding_id)
+    }
+
+def get_chunks(
+    db: Session,
+    embedding_id: str,
+    skip: int = 0,
+    limit: int = 100
+) -> Tuple[List[Chunk], int]:
+    """Get an embedding's chunks in document order with pagination."""
+    query = db.query(Chunk).filter(Chunk.embedding_id == embedding_id)
+    total = query.with_entities(Chunk.id).count()
+    chunks = query.order_by(Chunk.position).offset(skip).limit(limit).all()
+    return chunks, total
+
+def get_chunk(db: Session, embedding_id: str, position: int) -> Optional[Chunk]:
+    return db.query(Chunk).filter(
+        Chunk.embedding_id == embedding_id,
+        Chunk.position == position
+    ).first()
+
+def get_chunks_by_ids(db: Session, chunk_ids: List[str]) -> Dict[str, Chunk]:
+    """Fetch chunks by id (the vector ids of search hits)."""
+    found = {}
+    for batch in _in_batches(list(set(chunk_ids))):
+        for chunk in db.query(Chunk).filter(Chunk.id.in_(batch)):
+            found[chunk.id] = chunk
+    return found
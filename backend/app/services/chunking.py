@@ -0,0 +1,189 @@
+"""
+Token-aware text chunking.
+
+Chunks are sized in tokens and end on paragraph or sentence boundaries where
+possible. Their positions are (start, end) character offset arrays into the
+document's text, the pages joined with a separator:
+
+    spans, texts = chunk_pages(pages, chunk_size=256, chunk_overlap=32)
+    spans.starts[0], spans.ends[0], texts[0]
+
+Pages are consumed as a stream; only the unfinished tail of the text (about
+one chunk plus the latest page) is buffered.
+
+Pure functions with no app or database imports, so they can run in the
+process pool (see app.core.process_pool).
+"""
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Approximates subword tokenizers: long words split every 8 letters,
+# numbers every 3 digits, each punctuation mark is its own token
+TOKEN_PATTERN = re.compile(r"[^\W\d_]{1,8}|\d{1,3}|_+|[^\w\s]")
+SENTENCE_END = re.compile(r"[.!?。][\"'”’)\]]*\s+")
+PARAGRAPH_END = re.compile(r"\n[ \t]*\n\s*")
+
+# A boundary is only used if it keeps at least this fraction of chunk_size
+MIN_FILL = 0.5
+
+class ChunkSpans(NamedTuple):
+    starts: np.ndarray  # int64 character offsets, inclusive
+    ends: np.ndarray  # int64 character offsets, exclusive
+    token_counts: np.ndarray  # int32
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+def _empty_spans() -> ChunkSpans:
+    return ChunkSpans(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int32))
+
+def tokenize(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(start, end) character offsets of every token in `text`."""
+    bounds = np.fromiter(
+        (position for match in TOKEN_PATTERN.finditer(text) for position in match.span()),
+        dtype=np.int64
+    )
+    return bounds[0::2], bounds[1::2]
+
+def count_tokens(text: str) -> int:
+    return sum(1 for _ in TOKEN_PATTERN.finditer(text))
+
+def _boundary_tokens(pattern: re.Pattern, text: str, token_starts: np.ndarray) -> np.ndarray:
+    """Index of the first token after each boundary match."""
+    positions = np.fromiter((match.end() for match in pattern.finditer(text)), dtype=np.int64)
+    return np.unique(np.searchsorted(token_starts, positions))
+
+def _last_in(boundaries: np.ndarray, low: int, high: int) -> Optional[int]:
+    """Largest boundary b with low < b <= high."""
+    index = np.searchsorted(boundaries, high, side="right") - 1
+    if index >= 0 and boundaries[index] > low:
+        return int(boundaries[index])
+    return None
+
+def _first_in(boundaries: np.ndarray, low: int, high: int) -> Optional[int]:
+    """Smallest boundary b with low <= b < high."""
+    index = np.searchsorted(boundaries, low, side="left")
+    if index < len(boundaries) and boundaries[index] < high:
+        return int(boundaries[index])
+    return None
+
+def _plan_chunks(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    final: bool = True
+) -> Tuple[ChunkSpans, int]:
+    """Chunk `text`; returns the spans and the character offset where the
+    next (unfinished) chunk starts. With final=False, chunks that might
+    still grow with more text are left for the next call.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    overlap = min(max(chunk_overlap, 0), chunk_size - 1)
+
+    token_starts, token_ends = tokenize(text)
+    num_tokens = len(token_starts)
+    if num_tokens == 0:
+        return _empty_spans(), len(text) if final else 0
+
+    paragraphs = _boundary_tokens(PARAGRAPH_END, text, token_starts)
+    sentences = _boundary_tokens(SENTENCE_END, text, token_starts)
+    min_tokens = max(int(chunk_size * MIN_FILL), 1)
+
+    chunk_starts, chunk_ends, counts = [], [], []
+    start = 0
+    while start < num_tokens:
+        limit = start + chunk_size
+        if limit >= num_tokens:
+            if not final:
+                break
+            end = num_tokens
+        else:
+            # Prefer a paragraph break, then a sentence break, then a hard cut
+            end = (
+                _last_in(paragraphs, start + min_tokens - 1, limit)
+                or _last_in(sentences, start + min_tokens - 1, limit)
+                or limit
+            )
+        chunk_starts.append(token_starts[start])
+        chunk_ends.append(token_ends[end - 1])
+        counts.append(end - start)
+        if end >= num_tokens:
+            start = num_tokens
+            break
+        # Overlap by up to chunk_overlap tokens, starting on a sentence if one is in range
+        next_start = max(end - overlap, start + 1)
+        start = _first_in(sentences, next_start, end) or next_start
+
+    next_offset = int(token_starts[start]) if start < num_tokens else len(text)
+    spans = ChunkSpans(
+        np.asarray(chunk_starts, dtype=np.int64),
+        np.asarray(chunk_ends, dtype=np.int64),
+        np.asarray(counts, dtype=np.int32)
+    )
+    return spans, next_offset
+
+def iter_chunk_spans(
+    pages: Iterable[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    separator: str = "\n\n"
+) -> Iterator[Tuple[ChunkSpans, List[str]]]:
+    """Chunk a stream of pages as if they were joined with `separator`.
+
+    Yields span arrays (offsets into the joined text) and the chunks' texts
+    as soon as enough text has arrived; only the unfinished tail of the text
+    is kept in memory. Chunks are at most `chunk_size` tokens and overlap by
+    about `chunk_overlap` tokens.
+    """
+    buffer = ""
+    base = 0  # Offset of buffer[0] in the joined text
+    for number, page in enumerate(pages):
+        buffer += (separator if number else "") + page
+        spans, next_offset = _plan_chunks(buffer, chunk_size, chunk_overlap, final=False)
+        if len(spans):
+            yield _shift(spans, base), _texts(buffer, spans)
+        buffer = buffer[next_offset:]
+        base += next_offset
+
+    spans, _ = _plan_chunks(buffer, chunk_size, chunk_overlap, final=True)
+    if len(spans):
+        yield _shift(spans, base), _texts(buffer, spans)
+
+def _shift(spans: ChunkSpans, base: int) -> ChunkSpans:
+    return ChunkSpans(spans.starts + base, spans.ends + base, spans.token_counts)
+
+def _texts(text: str, spans: ChunkSpans) -> List[str]:
+    return [text[start:end] for start, end in zip(spans.starts.tolist(), spans.ends.tolist())]
+
+def chunk_pages(
+    pages: Iterable[str],
+    chunk_size: int,
+    chunk_overlap: int,
+    separator: str = "\n\n"
+) -> Tuple[ChunkSpans, List[str]]:
+    """All chunks of a stream of pages (see `iter_chunk_spans`)."""
+    parts = []
+    texts: List[str] = []
+    for spans, chunk_texts in iter_chunk_spans(pages, chunk_size, chunk_overlap, separator):
+        parts.append(spans)
+        texts.extend(chunk_texts)
+    return concat_spans(parts), texts
+
+def chunk_text_file(
+    path: str,
+    page_offsets: Sequence[int],
+    chunk_size: int,
+    chunk_overlap: int
+) -> Tuple[ChunkSpans, List[str]]:
+    """Chunk an extracted text file page by page (for the process pool)."""
+    from app.services.extraction import PAGE_SEPARATOR, read_pages
+    return chunk_pages(read_pages(path, page_offsets), chunk_size, chunk_overlap, PAGE_SEPARATOR)
+
+def concat_spans(parts: Iterable[ChunkSpans]) -> ChunkSpans:
+    parts = list(parts)
+    if not parts:
+        return _empty_spans()
+    return ChunkSpans(*(np.concatenate(column) for column in zip(*parts)))
@@ -1,12 +1,24 @@
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
-from typing import List, Tuple, Optional, Dict, Any
+from sqlalchemy.orm import Session, defer
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 from uuid import uuid4
 import base64
+import binascii
+import hashlib
+import mimetypes
+import os
 from datetime import datetime
 
 from app.models.document import Document
+from app.models.embedding import Embedding
 from app.schemas.document import DocumentCreate, DocumentUpdate
+from app.core import blob_store
+from app.core.vector_store import get_vector_index
+from app.services.chunk_service import delete_chunks
+from app.services.extraction_cache import extract_pages_cached
+
+# Largest accepted upload, 0 for no limit
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "512")) * 1024 * 1024 or None
 
 async def get_documents(
     db: Session, 
@@ -15,38 +27,63 @@ async def get_documents(
     limit: int = 100,
     file_type: Optional[str] = None
 ) -> Tuple[List[Document], int]:
-    """Get documents with filtering and pagination."""
+    """Get documents with filtering and pagination (metadata only, content is never loaded)."""
     query = db.query(Document).filter(Document.creator_id == user_id)
     
     # Apply filters
     if file_type:
         query = query.filter(Document.file_type == file_type)
     
-    # Get total count
-    total = query.count()
+    # Get total count (ids only, so the count subquery doesn't carry content)
+    total = query.with_entities(Document.id).count()
     
     # Apply pagination
-    documents = query.order_by(Document.created_at.desc()).offset(skip).limit(limit).all()
+    documents = query.options(defer(Document.content, raiseload=True)).order_by(
+        Document.created_at.desc()
+    ).offset(skip).limit(limit).all()
     
     return documents, total
 
-def get_document_by_id(db: Session, document_id: str, user_id: str) -> Optional[Document]:
-    """Get a document by ID with user check."""
-    document = db.query(Document).filter(Document.id == document_id).first()
-    
-    # Check if document exists and belongs to user
-    if document is None or document.creator_id != user_id:
-        return None
+def get_document_by_id(
+    db: Session,
+    document_id: str,
+    user_id: str,
+    with_content: bool = False
+) -> Optional[Document]:
+    """Get a document by ID with user check.
+    
+    The inline content column is deferred unless `with_content` is set, so
+    ownership checks and metadata reads don't pull the document body.
+    """
+    query = db.query(Document)
+    if not with_content:
+        query = query.options(defer(Document.content))
     
-    return document
+    # Only return the document if it belongs to the user
+    return query.filter(Document.id == document_id, Document.creator_id == user_id).first()
+
+def get_document_content(document: Document) -> Iterator[bytes]:
+    """Yield a document's raw (decoded) content in chunks."""
+    if document.storage == "blob":
+        yield from blob_store.iter_blob(document.content_sha256)
+    elif document.content:
+        yield base64.b64decode(document.content)
 
 def create_document(db: Session, document_in: DocumentCreate, user_id: str) -> Document:
     """Create a new document directly."""
+    try:
+        content_bytes = base64.b64decode(document_in.content)
+    except binascii.Error:
+        raise HTTPException(status_code=422, detail="Content is not valid base64")
+    
     # Create document
     db_document = Document(
         id=str(uuid4()),
         title=document_in.title,
         content=document_in.content,  # Base64-encoded content
+        storage="inline",
+        content_sha256=hashlib.sha256(content_bytes).hexdigest(),
+        size_bytes=len(content_bytes),
         file_type=document_in.file_type,
         creator_id=user_id
     )
@@ -58,9 +95,16 @@ def create_document(db: Session, document_in: DocumentCreate, user_id: str) -> D
     return db_document
 
 async def upload_document(db: Session, file: UploadFile, title: str, user_id: str) -> Document:
-    """Upload and create a new document from a file."""
-    # Read file content
-    file_content = await file.read()
+    """Upload and create a new document from a file.
+    
+    The file is streamed into the blob store in fixed-size chunks, so memory
+    use does not grow with the file size; the row only records metadata and
+    the blob's sha256.
+    """
+    try:
+        blob = await blob_store.write_stream(file.read, max_bytes=UPLOAD_MAX_BYTES)
+    except blob_store.BlobTooLarge:
+        raise HTTPException(status_code=413, detail=f"File is larger than {UPLOAD_MAX_BYTES} bytes")
     
     # Determine file type from extension
     file_extension = file.filename.split('.')[-1].lower()
@@ -69,7 +113,11 @@ async def upload_document(db: Session, file: UploadFile, title: str, user_id: st
     db_document = Document(
         id=str(uuid4()),
         title=title or file.filename,
-        content=base64.b64encode(file_content).decode('utf-8'),  # Base64-encoded content
+        content=None,
+        storage="blob",
+        content_sha256=blob.sha256,
+        size_bytes=blob.size_bytes,
+        mime_type=file.content_type or mimetypes.guess_type(file.filename)[0],
         file_type=file_extension,
         creator_id=user_id
     )
@@ -95,34 +143,30 @@ def update_document(db: Session, document: Document, document_in: DocumentUpdate
     return document
 
 def delete_document(db: Session, document_id: str) -> None:
-    """Delete a document."""
-    document = db.query(Document).filter(Document.id == document_id).first()
+    """Delete a document.
+    
+    Its blob and cached extractions may be shared with other documents, so
+    they are left to the storage sweep (app.services.storage_gc), which
+    removes them once nothing references them.
+    """
+    document = db.query(Document).options(defer(Document.content)).filter(Document.id == document_id).first()
     if document is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
+    # Drop the vectors and chunk rows of the document's embeddings
+    embeddings = db.query(Embedding).filter(Embedding.document_id == document_id).all()
+    for embedding in embeddings:
+        get_vector_index(embedding.vector_db).remove_group(embedding.id)
+    delete_chunks(db, [embedding.id for embedding in embeddings])
+    
     db.delete(document)
     db.commit()
 
-async def extract_text(document: Document) -> str:
-    """Extract text from a document.
+async def extract_pages(db: Session, document: Document) -> Iterator[str]:
+    """Extract a document's text page by page (or section by section).
     
-    In a real application, this would use appropriate libraries based on file_type.
-    For now, we'll return a mock extraction for most types, or actual text for .txt.
+    Pages are streamed from the cached extraction of the same content,
+    which is made first if there is none.
+    Raises UnsupportedFileType or ExtractionError if the content can't be read.
     """
-    # Decode the base64 content
-    content_bytes = base64.b64decode(document.content)
-    
-    # Extract text based on file type
-    if document.file_type == 'pdf':
-        # In a real app, you would use PyPDF2 or similar
-        text = f"Extracted text from PDF: {document.title}"
-    elif document.file_type == 'docx':
-        # In a real app, you would use python-docx or similar
-        text = f"Extracted text from Word document: {document.title}"
-    elif document.file_type == 'txt':
-        # For text files, decode the content directly
-        text = content_bytes.decode('utf-8')
-    else:
-        text = f"Extracted text from {document.file_type.upper()} file: {document.title}"
-    
-    return text
+    return await extract_pages_cached(db, document)
@@ -0,0 +1,37 @@
+import asyncio
+import os
+from typing import List
+
+from app.services import model_service
+
+# Batching configuration
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+
+def make_batches(texts: List[str], batch_size: int) -> List[List[str]]:
+    """Split texts into consecutive micro-batches."""
+    return [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+async def embed_texts(
+    model: str,
+    texts: List[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_in_flight: int = EMBED_MAX_IN_FLIGHT
+) -> List[List[float]]:
+    """Embed texts with batched Ollama calls, keeping a bounded number in flight.
+    
+    Vectors are returned in the same order as `texts`.
+    """
+    if not texts:
+        return []
+    
+    semaphore = asyncio.Semaphore(max_in_flight)
+    
+    async def _embed_batch(batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            return await model_service.embed(model, batch)
+    
+    results = await asyncio.gather(*(
+        _embed_batch(batch) for batch in make_batches(texts, batch_size)
+    ))
+    return [vector for batch in results for vector in batch]
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Iterable
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.bulk import bulk_insert
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.services.embedding_batcher import embed_texts
+from app.utils.logging import logger
+
+# Cache configuration
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_MB", "1024")) * 1024 * 1024
+EMBED_CACHE_DTYPE = os.getenv("EMBED_CACHE_DTYPE", "float16")  # float16 halves storage
+LOOKUP_BATCH_SIZE = 500
+
+# Per-process counters
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+def _count(**increments: int) -> None:
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+def text_hash(text: str) -> str:
+    """Content address of a chunk of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _encode(vector) -> bytes:
+    return np.asarray(vector, dtype=np.dtype(EMBED_CACHE_DTYPE).newbyteorder("<")).tobytes()
+
+def _decode(entry: EmbeddingCacheEntry) -> np.ndarray:
+    return np.frombuffer(entry.vector, dtype=np.dtype(entry.dtype).newbyteorder("<")).astype(np.float32)
+
+def _in_batches(values: List[str]) -> Iterable[List[str]]:
+    for i in range(0, len(values), LOOKUP_BATCH_SIZE):
+        yield values[i:i + LOOKUP_BATCH_SIZE]
+
+def get_cached_vectors(db: Session, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+    """Look up cached vectors by text hash and mark the hits as recently used."""
+    found = {}
+    for batch in _in_batches(hashes):
+        entries = db.query(EmbeddingCacheEntry).filter(
+            EmbeddingCacheEntry.model == model,
+            EmbeddingCacheEntry.text_hash.in_(batch)
+        ).all()
+        for entry in entries:
+            found[entry.text_hash] = _decode(entry)
+
+    if found:
+        now = datetime.utcnow()
+        for batch in _in_batches(list(found)):
+            db.query(EmbeddingCacheEntry).filter(
+                EmbeddingCacheEntry.model == model,
+                EmbeddingCacheEntry.text_hash.in_(batch)
+            ).update({EmbeddingCacheEntry.last_used_at: now}, synchronize_session=False)
+        db.commit()
+
+    return found
+
+def store_vectors(db: Session, model: str, vectors: Dict[str, List[float]]) -> None:
+    """Store vectors by text hash, then evict least recently used entries over budget."""
+    if not vectors:
+        return
+
+    # Another job may have cached some of these in the meantime
+    existing = set()
+    for batch in _in_batches(list(vectors)):
+        existing.update(
+            row.text_hash for row in db.query(EmbeddingCacheEntry.text_hash).filter(
+                EmbeddingCacheEntry.model == model,
+                EmbeddingCacheEntry.text_hash.in_(batch)
+            )
+        )
+
+    now = datetime.utcnow()
+    new_entries = []
+    for hash_, vector in vectors.items():
+        if hash_ in existing:
+            continue
+        data = _encode(vector)
+        new_entries.append({
+            "model": model,
+            "text_hash": hash_,
+            "dtype": EMBED_CACHE_DTYPE,
+            "dimensions": len(vector),
+            "vector": data,
+            "size_bytes": len(data),
+            "created_at": now,
+            "last_used_at": now
+        })
+
+    try:
+        bulk_insert(db, EmbeddingCacheEntry, new_entries)
+        db.commit()
+    except IntegrityError:
+        # A concurrent job cached the same chunks first; the cache is best-effort
+        db.rollback()
+        logger.warning(f"Skipped {len(new_entries)} embedding cache writes after a concurrent insert")
+        return
+    _count(writes=len(new_entries))
+
+    evict_embedding_cache(db)
+
+def evict_embedding_cache(db: Session, max_bytes: int = EMBED_CACHE_MAX_BYTES) -> int:
+    """Delete least recently used entries until the cache fits in `max_bytes`."""
+    total = db.query(func.coalesce(func.sum(EmbeddingCacheEntry.size_bytes), 0)).scalar()
+    excess = total - max_bytes
+    if excess <= 0:
+        return 0
+
+    victims = []
+    oldest = db.query(
+        EmbeddingCacheEntry.model,
+        EmbeddingCacheEntry.text_hash,
+        EmbeddingCacheEntry.size_bytes
+    ).order_by(EmbeddingCacheEntry.last_used_at.asc()).yield_per(1000)
+    for model, hash_, size in oldest:
+        victims.append((model, hash_))
+        excess -= size
+        if excess <= 0:
+            break
+
+    for model in {model for model, _ in victims}:
+        hashes = [hash_ for victim_model, hash_ in victims if victim_model == model]
+        for batch in _in_batches(hashes):
+            db.query(EmbeddingCacheEntry).filter(
+                EmbeddingCacheEntry.model == model,
+                EmbeddingCacheEntry.text_hash.in_(batch)
+            ).delete(synchronize_session=False)
+    db.commit()
+
+    _count(evictions=len(victims))
+    logger.info(f"Evicted {len(victims)} entries from the embedding cache")
+    return len(victims)
+
+async def embed_texts_cached(db: Session, model: str, texts: List[str]) -> List[np.ndarray]:
+    """Embed texts, only calling Ollama for texts not already in the cache."""
+    if not EMBED_CACHE_ENABLED:
+        return [np.asarray(v, dtype=np.float32) for v in await embed_texts(model, texts)]
+
+    hashes = [text_hash(text) for text in texts]
+    cached = get_cached_vectors(db, model, list(set(hashes)))
+
+    hits = sum(1 for hash_ in hashes if hash_ in cached)
+    _count(hits=hits, misses=len(texts) - hits)
+
+    # Embed each missing text once, even if it repeats within the document
+    missing = {}
+    for hash_, text in zip(hashes, texts):
+        if hash_ not in cached and hash_ not in missing:
+            missing[hash_] = text
+
+    if missing:
+        new_vectors = await embed_texts(model, list(missing.values()))
+        fresh = dict(zip(missing.keys(), new_vectors))
+        store_vectors(db, model, fresh)
+        cached.update({hash_: np.asarray(v, dtype=np.float32) for hash_, v in fresh.items()})
+
+    return [cached[hash_] for hash_ in hashes]
+
+def get_embedding_cache_stats(db: Session) -> Dict[str, int]:
+    """Hit/miss counters for this process plus the cache's current size."""
+    entries, total_bytes = db.query(
+        func.count(EmbeddingCacheEntry.text_hash),
+        func.coalesce(func.sum(EmbeddingCacheEntry.size_bytes), 0)
+    ).one()
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats.update({
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "size_bytes": total_bytes,
+        "max_bytes": EMBED_CACHE_MAX_BYTES,
+        "dtype": EMBED_CACHE_DTYPE
+    })
+    return stats
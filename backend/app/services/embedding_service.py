@@ -1,17 +1,37 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Set, NamedTuple, Callable, Awaitable
 from uuid import uuid4
-import random
-import json
+import asyncio
+import os
+import time
 from datetime import datetime
 
 from app.models.embedding import Embedding
 from app.models.document import Document
 from app.models.vector_db import VectorDB
-from app.schemas.embedding import EmbeddingCreate
-from app.core.cache import cached, cache_delete_pattern, cache_set, cache_get
-from app.core.background import run_in_background, get_task_info, TaskStatus
+from app.models.rag_system import RAGSystem
+from app.schemas.embedding import EmbeddingCreate, EmbeddingBulkCreate, Embedding as EmbeddingSchema
+from app.core.cache import cache_get_or_set, cache_invalidate_tags
+from app.core.background import enqueue_job, job_handler, get_task_info, report_progress, JobQueueFull
+from app.db.database import SessionLocal
+from app.db.bulk import bulk_insert, ProgressCallback
+from app.core.vector_store import get_vector_index
+from app.core.lexical_index import get_lexical_index
+from app.services.embedding_cache import embed_texts_cached, text_hash
+from app.services.chunk_service import replace_chunks, delete_chunks, get_chunk_ids
+from app.services.chunking import chunk_text_file
+from app.services.extraction_cache import ExtractedSource, extract_source_cached
+from app.core.process_pool import run_in_process
+from app.utils.logging import logger
+
+# Bulk ingestion
+BULK_MAX_DOCUMENTS = int(os.getenv("BULK_MAX_DOCUMENTS", "10000"))  # Documents per bulk request
+BULK_STAGE_QUEUE_SIZE = int(os.getenv("BULK_STAGE_QUEUE_SIZE", "8"))  # Documents buffered between stages
+BULK_EXTRACT_WORKERS = int(os.getenv("BULK_EXTRACT_WORKERS", "2"))
+BULK_EMBED_WORKERS = int(os.getenv("BULK_EMBED_WORKERS", "2"))
+BULK_PROGRESS_INTERVAL = 1.0  # Seconds between progress updates
+ID_BATCH_SIZE = 1000
 
 async def get_embeddings(
     db: Session, 
@@ -20,14 +40,24 @@ async def get_embeddings(
     limit: int = 100,
     document_id: Optional[str] = None,
     vector_db_id: Optional[str] = None
-) -> Tuple[List[Embedding], int]:
+) -> Tuple[List[EmbeddingSchema], int]:
     """Get embeddings with filtering and pagination."""
     cache_key = f"embeddings_{user_id}_{skip}_{limit}_{document_id}_{vector_db_id}"
-    cached_result = await cache_get(cache_key)
-    
-    if cached_result:
-        return cached_result
-    
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_embeddings(db, user_id, skip, limit, document_id, vector_db_id),
+        tags=[f"embeddings:{user_id}"],
+        schema=Tuple[List[EmbeddingSchema], int]
+    )
+
+async def _load_embeddings(
+    db: Session,
+    user_id: str,
+    skip: int,
+    limit: int,
+    document_id: Optional[str],
+    vector_db_id: Optional[str]
+) -> Tuple[List[Embedding], int]:
     query = db.query(Embedding).filter(Embedding.creator_id == user_id)
     
     # Apply filters
@@ -43,26 +73,25 @@ async def get_embeddings(
     # Apply pagination with optimized query
     embeddings = query.order_by(Embedding.created_at.desc()).offset(skip).limit(limit).all()
     
-    result = (embeddings, total)
-    await cache_set(cache_key, result)
-    
-    return result
+    return (embeddings, total)
 
-async def get_embedding_by_id(db: Session, embedding_id: str, user_id: str) -> Optional[Embedding]:
+async def get_embedding_by_id(db: Session, embedding_id: str, user_id: str) -> Optional[EmbeddingSchema]:
     """Get an embedding by ID with user check."""
     cache_key = f"embedding_{embedding_id}_{user_id}"
-    cached_embedding = await cache_get(cache_key)
-    
-    if cached_embedding:
-        return cached_embedding
-    
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_embedding(db, embedding_id, user_id),
+        tags=[f"embedding:{embedding_id}"],
+        schema=EmbeddingSchema
+    )
+
+async def _load_embedding(db: Session, embedding_id: str, user_id: str) -> Optional[Embedding]:
     embedding = db.query(Embedding).filter(Embedding.id == embedding_id).first()
     
     # Check if embedding exists and belongs to user
     if embedding is None or embedding.creator_id != user_id:
         return None
     
-    await cache_set(cache_key, embedding)
     return embedding
 
 async def create_embedding(db: Session, embedding_in: EmbeddingCreate, user_id: str) -> Dict[str, Any]:
@@ -71,7 +100,7 @@ async def create_embedding(db: Session, embedding_in: EmbeddingCreate, user_id:
     Returns task_id that can be used to check on progress.
     """
     # Verify document exists and belongs to user
-    document = db.query(Document).filter(
+    document = db.query(Document.id).filter(
         Document.id == embedding_in.document_id,
         Document.creator_id == user_id
     ).first()
@@ -88,33 +117,79 @@ async def create_embedding(db: Session, embedding_in: EmbeddingCreate, user_id:
     if vector_db is None:
         raise HTTPException(status_code=404, detail="Vector database not found")
     
-    # Create a placeholder embedding record
-    embedding_id = str(uuid4())
-    db_embedding = Embedding(
-        id=embedding_id,
-        document_id=embedding_in.document_id,
-        vector_db_id=embedding_in.vector_db_id,
-        model=embedding_in.model,
-        dimensions=determine_model_dimensions(embedding_in.model),
-        creator_id=user_id,
-        status="pending",
-        chunk_size=embedding_in.chunk_size,
-        chunk_overlap=embedding_in.chunk_overlap
-    )
+    # An incremental request updates the latest embedding of the same
+    # document, vector DB and model in place, if there is one
+    db_embedding = None
+    if embedding_in.incremental:
+        db_embedding = db.query(Embedding).filter(
+            Embedding.document_id == embedding_in.document_id,
+            Embedding.vector_db_id == embedding_in.vector_db_id,
+            Embedding.model == embedding_in.model,
+            Embedding.creator_id == user_id
+        ).order_by(Embedding.created_at.desc()).first()
     
-    db.add(db_embedding)
+    reuse = db_embedding is not None
+    # Only a completed run's chunks can be diffed against; after a failed run
+    # the index may not match the chunk rows, so the embedding is rebuilt
+    incremental = reuse and db_embedding.status == "completed"
+    if reuse:
+        if db_embedding.status in ("pending", "processing"):
+            raise HTTPException(status_code=409, detail="The embedding is already being processed")
+        previous = {
+            "status": db_embedding.status,
+            "chunk_size": db_embedding.chunk_size,
+            "chunk_overlap": db_embedding.chunk_overlap
+        }
+        db_embedding.status = "pending"
+        db_embedding.error = None
+        db_embedding.chunk_size = embedding_in.chunk_size
+        db_embedding.chunk_overlap = embedding_in.chunk_overlap
+    else:
+        # Create a placeholder embedding record
+        db_embedding = Embedding(
+            id=str(uuid4()),
+            document_id=embedding_in.document_id,
+            vector_db_id=embedding_in.vector_db_id,
+            model=embedding_in.model,
+            dimensions=determine_model_dimensions(embedding_in.model),
+            creator_id=user_id,
+            status="pending",
+            chunk_size=embedding_in.chunk_size,
+            chunk_overlap=embedding_in.chunk_overlap
+        )
+        db.add(db_embedding)
+    
+    embedding_id = db_embedding.id
     db.commit()
     
-    # Start background task
-    task_id = await run_in_background(
-        _process_embedding,
-        db_session_factory=db.bind.pool._creator,
-        embedding_id=embedding_id,
-        document_id=embedding_in.document_id,
-        chunk_size=embedding_in.chunk_size,
-        chunk_overlap=embedding_in.chunk_overlap,
-        model=embedding_in.model
-    )
+    # Queue the embedding job; refuse new work while the queue is backed up
+    try:
+        task_id = enqueue_job(
+            "embeddings.process",
+            {
+                "embedding_id": embedding_id,
+                "document_id": embedding_in.document_id,
+                "chunk_size": embedding_in.chunk_size,
+                "chunk_overlap": embedding_in.chunk_overlap,
+                "model": embedding_in.model,
+                "incremental": incremental
+            }
+        )
+    except JobQueueFull:
+        if reuse:
+            for name, value in previous.items():
+                setattr(db_embedding, name, value)
+        else:
+            db.delete(db_embedding)
+        db.commit()
+        raise HTTPException(
+            status_code=503,
+            detail="Too many embedding jobs are queued, try again later",
+            headers={"Retry-After": "30"}
+        )
+    
+    if reuse:
+        await cache_invalidate_tags(f"embedding:{embedding_id}", f"embeddings:{user_id}")
     
     # Return task ID and embedding ID
     return {
@@ -123,6 +198,168 @@ async def create_embedding(db: Session, embedding_in: EmbeddingCreate, user_id:
         "status": "processing"
     }
 
+def _owned_document_ids(db: Session, document_ids: List[str], user_id: str) -> Set[str]:
+    owned = set()
+    for i in range(0, len(document_ids), ID_BATCH_SIZE):
+        owned.update(
+            document_id for (document_id,) in db.query(Document.id).filter(
+                Document.id.in_(document_ids[i:i + ID_BATCH_SIZE]),
+                Document.creator_id == user_id
+            )
+        )
+    return owned
+
+def _latest_embeddings(
+    db: Session,
+    document_ids: List[str],
+    vector_db_id: str,
+    model: str,
+    user_id: str
+) -> Dict[str, Embedding]:
+    """The latest embedding of each document for a vector DB and model."""
+    latest = {}
+    for i in range(0, len(document_ids), ID_BATCH_SIZE):
+        embeddings = db.query(Embedding).filter(
+            Embedding.document_id.in_(document_ids[i:i + ID_BATCH_SIZE]),
+            Embedding.vector_db_id == vector_db_id,
+            Embedding.model == model,
+            Embedding.creator_id == user_id
+        ).order_by(Embedding.created_at.asc())
+        for embedding in embeddings:
+            latest[embedding.document_id] = embedding
+    return latest
+
+async def create_embeddings_bulk(db: Session, bulk_in: EmbeddingBulkCreate, user_id: str) -> Dict[str, Any]:
+    """
+    Start embedding many documents (listed, and/or those of a RAG system)
+    as one background job. Returns its task_id and the embedding IDs.
+    """
+    document_ids = list(bulk_in.document_ids)
+    model = bulk_in.model
+    if bulk_in.rag_system_id:
+        rag_system = db.query(RAGSystem).filter(
+            RAGSystem.id == bulk_in.rag_system_id,
+            RAGSystem.creator_id == user_id
+        ).first()
+        if rag_system is None:
+            raise HTTPException(status_code=404, detail="RAG system not found")
+        document_ids.extend(rag_system.documents or [])
+        model = model or rag_system.embedding_model
+    
+    if not model:
+        raise HTTPException(status_code=422, detail="An embedding model is required")
+    
+    # Keep the first occurrence of each document
+    document_ids = list(dict.fromkeys(document_ids))
+    if not document_ids:
+        raise HTTPException(status_code=422, detail="No documents to embed")
+    if len(document_ids) > BULK_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {BULK_MAX_DOCUMENTS} documents can be embedded per request"
+        )
+    
+    # Verify all documents exist and belong to user
+    owned = _owned_document_ids(db, document_ids, user_id)
+    missing = [document_id for document_id in document_ids if document_id not in owned]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"{len(missing)} documents not found: {', '.join(missing[:10])}"
+        )
+    
+    # Verify vector database exists and belongs to user
+    vector_db = db.query(VectorDB.id).filter(
+        VectorDB.id == bulk_in.vector_db_id,
+        VectorDB.creator_id == user_id
+    ).first()
+    if vector_db is None:
+        raise HTTPException(status_code=404, detail="Vector database not found")
+    
+    # Incremental requests update the documents' existing embeddings in place
+    existing = {}
+    if bulk_in.incremental:
+        existing = _latest_embeddings(db, document_ids, bulk_in.vector_db_id, model, user_id)
+        busy = [e.id for e in existing.values() if e.status in ("pending", "processing")]
+        if busy:
+            raise HTTPException(
+                status_code=409,
+                detail=f"{len(busy)} embeddings are already being processed"
+            )
+    
+    items = []
+    new_rows = []
+    previous = {}
+    dimensions = determine_model_dimensions(model)
+    for document_id in document_ids:
+        embedding = existing.get(document_id)
+        if embedding is not None:
+            previous[embedding.id] = (embedding.status, embedding.chunk_size, embedding.chunk_overlap)
+            items.append({
+                "embedding_id": embedding.id,
+                "document_id": document_id,
+                # A failed run's vectors may not match its chunk rows, so it is rebuilt
+                "incremental": embedding.status == "completed"
+            })
+            embedding.status = "pending"
+            embedding.error = None
+            embedding.chunk_size = bulk_in.chunk_size
+            embedding.chunk_overlap = bulk_in.chunk_overlap
+        else:
+            embedding_id = str(uuid4())
+            new_rows.append({
+                "id": embedding_id,
+                "document_id": document_id,
+                "vector_db_id": bulk_in.vector_db_id,
+                "model": model,
+                "dimensions": dimensions,
+                "creator_id": user_id,
+                "num_chunks": 0,
+                "status": "pending",
+                "chunk_size": bulk_in.chunk_size,
+                "chunk_overlap": bulk_in.chunk_overlap
+            })
+            items.append({"embedding_id": embedding_id, "document_id": document_id, "incremental": False})
+    
+    bulk_insert(db, Embedding, new_rows)
+    db.commit()
+    
+    # One job runs all documents through the pipeline
+    try:
+        task_id = enqueue_job(
+            "embeddings.bulk",
+            {
+                "items": items,
+                "chunk_size": bulk_in.chunk_size,
+                "chunk_overlap": bulk_in.chunk_overlap,
+                "model": model
+            }
+        )
+    except JobQueueFull:
+        for embedding in existing.values():
+            embedding.status, embedding.chunk_size, embedding.chunk_overlap = previous[embedding.id]
+        new_ids = [row["id"] for row in new_rows]
+        for i in range(0, len(new_ids), ID_BATCH_SIZE):
+            db.query(Embedding).filter(
+                Embedding.id.in_(new_ids[i:i + ID_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+        db.commit()
+        raise HTTPException(
+            status_code=503,
+            detail="Too many embedding jobs are queued, try again later",
+            headers={"Retry-After": "30"}
+        )
+    
+    await cache_invalidate_tags(
+        f"embeddings:{user_id}", *(f"embedding:{embedding_id}" for embedding_id in previous)
+    )
+    
+    return {
+        "task_id": task_id,
+        "embedding_ids": [item["embedding_id"] for item in items],
+        "status": "processing"
+    }
+
 async def check_embedding_status(task_id: str) -> Dict[str, Any]:
     """Check the status of an embedding task."""
     task_info = get_task_info(task_id)
@@ -132,73 +369,323 @@ async def get_embedding_task_status(task_id: str) -> Dict[str, Any]:
     """Get the status of an embedding task by its task ID."""
     return await check_embedding_status(task_id)
 
+class ChunkPlan(NamedTuple):
+    """A document's chunks and how they differ from the embedding's stored ones."""
+    chunk_ids: List[str]
+    rows: List[Dict[str, Any]]  # Chunk rows for replace_chunks
+    new_positions: List[int]  # Chunks that need a vector
+    removed_ids: Optional[Set[str]]  # None replaces all of the embedding's vectors
+
+def _start_embedding(db: Session, embedding_id: str) -> Embedding:
+    embedding = db.query(Embedding).filter(Embedding.id == embedding_id).first()
+    if not embedding:
+        raise Exception(f"Embedding {embedding_id} not found")
+    embedding.status = "processing"
+    db.commit()
+    return embedding
+
+async def _load_source(db: Session, document_id: str) -> ExtractedSource:
+    """A document's extracted text file (cached per content hash across vector DBs)."""
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise Exception(f"Document {document_id} not found")
+    return await extract_source_cached(db, document)
+
+async def _diff_chunks(
+    db: Session,
+    embedding_id: str,
+    source: ExtractedSource,
+    chunk_size: int,
+    chunk_overlap: int,
+    incremental: bool
+) -> ChunkPlan:
+    """Chunk a document's text and diff the chunks against the stored ones."""
+    # Chunk by token count on sentence boundaries in the process pool, which
+    # reads the text page by page; spans are offsets into the joined pages
+    spans, texts = await run_in_process(
+        chunk_text_file, source.path, source.page_offsets, chunk_size, chunk_overlap
+    )
+    starts, ends = spans.starts.tolist(), spans.ends.tolist()
+    hashes = [text_hash(chunk) for chunk in texts]
+    
+    # Vector ids derive from the chunk text, so an unchanged chunk keeps
+    # its id (and vector) when the document is edited
+    occurrences: Dict[str, int] = {}
+    chunk_ids = []
+    for hash_ in hashes:
+        occurrence = occurrences.get(hash_, 0)
+        occurrences[hash_] = occurrence + 1
+        chunk_ids.append(chunk_vector_id(embedding_id, hash_, occurrence))
+    
+    # Diff against the chunks stored by the previous run
+    previous_ids = get_chunk_ids(db, embedding_id) if incremental else set()
+    new_positions = [
+        position for position, chunk_id in enumerate(chunk_ids) if chunk_id not in previous_ids
+    ]
+    rows = [
+        {
+            "id": chunk_ids[position],
+            "embedding_id": embedding_id,
+            "position": position,
+            "start": start,
+            "end": end,
+            "token_count": token_count,
+            "text": chunk,
+            "text_hash": hash_
+        }
+        for position, (start, end, token_count, chunk, hash_) in enumerate(
+            zip(starts, ends, spans.token_counts.tolist(), texts, hashes)
+        )
+    ]
+    removed_ids = previous_ids.difference(chunk_ids) if incremental else None
+    return ChunkPlan(chunk_ids, rows, new_positions, removed_ids)
+
+async def _embed_new_chunks(db: Session, model: str, plan: ChunkPlan) -> List[Any]:
+    """Embed the new chunks not already in the embedding cache, in batches."""
+    return await embed_texts_cached(db, model, [plan.rows[position]["text"] for position in plan.new_positions])
+
+async def _store_embedding(
+    db: Session,
+    embedding: Embedding,
+    plan: ChunkPlan,
+    vectors: List[Any],
+    on_batch: Optional[ProgressCallback] = None
+) -> None:
+    """Write the vectors to the VectorDB's index and the chunk rows, and
+    mark the embedding completed."""
+    previous_version = embedding.completed_at
+    
+    # Normalizing and writing the vectors is numpy work that releases the
+    # GIL, so a thread keeps it off the event loop without pickling them
+    index = get_vector_index(embedding.vector_db)
+    await asyncio.to_thread(
+        _update_vectors, index, embedding.id,
+        [plan.chunk_ids[position] for position in plan.new_positions], vectors,
+        plan.removed_ids
+    )
+    if vectors:
+        embedding.dimensions = len(vectors[0])
+    
+    # Store the chunks as rows keyed by their vector ids, in bulk batches
+    replace_chunks(db, embedding.id, plan.rows, on_batch=on_batch)
+    embedding.num_chunks = len(plan.chunk_ids)
+    embedding.status = "completed"
+    embedding.error = None
+    embedding.completed_at = datetime.utcnow()
+    
+    db.commit()
+    
+    # Keep the lexical index in step with the chunks, if it is loaded here
+    await asyncio.to_thread(
+        _update_lexical, get_lexical_index(embedding.vector_db_id), embedding.id,
+        plan, previous_version, embedding.completed_at
+    )
+    
+    # Invalidate cache
+    await cache_invalidate_tags(f"embedding:{embedding.id}", f"embeddings:{embedding.creator_id}")
+
+def _mark_failed(db: Session, embedding_id: str, error: Exception) -> None:
+    db.rollback()
+    db.query(Embedding).filter(Embedding.id == embedding_id).update(
+        {Embedding.status: "failed", Embedding.error: str(error)},
+        synchronize_session=False
+    )
+    db.commit()
+
+@job_handler("embeddings.process")
 async def _process_embedding(
-    db_session_factory,
     embedding_id: str,
     document_id: str,
     chunk_size: int,
     chunk_overlap: int,
-    model: str
+    model: str,
+    incremental: bool = False
 ) -> Dict[str, Any]:
     """
     Process document embedding in the background.
-    This function runs in a separate task.
+    Runs as a queued job, possibly in another worker process, and may be
+    retried, so it only relies on its JSON arguments.
+    
+    With incremental=True, chunks whose text is unchanged since the last
+    run keep their vectors; only new chunks are embedded and the vectors of
+    chunks that no longer exist are removed.
     """
-    # Create a new database session for this background task
-    from sqlalchemy.orm import sessionmaker
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_session_factory())
+    # Create a new database session for this background job
     db = SessionLocal()
+    embedding = None
     
     try:
-        # Get the embedding record
-        embedding = db.query(Embedding).filter(Embedding.id == embedding_id).first()
-        if not embedding:
-            raise Exception(f"Embedding {embedding_id} not found")
-        
-        # Update status
-        embedding.status = "processing"
-        db.commit()
-        
-        # Get the document
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
-            raise Exception(f"Document {document_id} not found")
-        
-        # Extract text from document
-        from app.services.document_service import extract_text
-        text = await extract_text(document)
-        
-        # Create chunks
-        chunks = create_chunks(text, chunk_size, chunk_overlap)
-        
-        # In a real application, we would create actual embeddings here
-        # For now, we'll just save the chunks
-        embedding.chunks = json.dumps(chunks)
-        embedding.status = "completed"
-        embedding.completed_at = datetime.utcnow()
-        
-        db.commit()
-        
-        # Invalidate cache
-        await cache_delete_pattern(f"embedding_{embedding_id}*")
-        await cache_delete_pattern(f"embeddings_{embedding.creator_id}*")
+        embedding = _start_embedding(db, embedding_id)
+        source = await _load_source(db, document_id)
+        plan = await _diff_chunks(db, embedding_id, source, chunk_size, chunk_overlap, incremental)
+        vectors = await _embed_new_chunks(db, model, plan)
+        await _store_embedding(
+            db, embedding, plan, vectors,
+            on_batch=lambda done, total: report_progress(stage="storing_chunks", done=done, total=total)
+        )
         
         return {
             "embedding_id": embedding_id,
             "status": "completed",
-            "num_chunks": len(chunks)
+            "num_chunks": len(plan.chunk_ids),
+            "embedded_chunks": len(plan.new_positions),
+            "removed_chunks": len(plan.removed_ids or ())
         }
     except Exception as e:
         # Update status to failed
         if embedding:
-            embedding.status = "failed"
-            embedding.error = str(e)
-            db.commit()
+            _mark_failed(db, embedding_id, e)
         
         raise
     finally:
         db.close()
 
+async def _run_stage(
+    work: Callable[[Session, Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]],
+    inbox: asyncio.Queue,
+    outbox: Optional[asyncio.Queue],
+    workers: int,
+    downstream_workers: int,
+    on_done: Callable[[Dict[str, Any]], None],
+    on_error: Callable[[Session, Dict[str, Any], Exception], None]
+) -> None:
+    """Run `workers` coroutines that take items from `inbox`, apply `work`
+    and pass the results on to `outbox`.
+    
+    A None item ends a worker; once all have ended, one None per downstream
+    worker is sent on. Each worker has its own database session.
+    """
+    async def worker() -> None:
+        db = SessionLocal()
+        try:
+            while True:
+                item = await inbox.get()
+                if item is None:
+                    break
+                try:
+                    result = await work(db, item)
+                except Exception as e:
+                    on_error(db, item, e)
+                    continue
+                on_done(item)
+                if outbox is not None:
+                    # Waits while the next stage is behind (backpressure)
+                    await outbox.put(result)
+        finally:
+            db.close()
+    
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        for _ in range(downstream_workers):
+            await outbox.put(None)
+
+@job_handler("embeddings.bulk")
+async def _process_embeddings_bulk(
+    items: List[Dict[str, Any]],
+    chunk_size: int,
+    chunk_overlap: int,
+    model: str
+) -> Dict[str, Any]:
+    """
+    Embed many documents as one job through a pipeline of stages:
+    extract -> chunk -> embed -> index.
+    
+    Stages run concurrently with bounded queues between them, so a slow
+    stage holds back the ones before it instead of buffering documents.
+    A failing document is marked failed without stopping the others.
+    Embeddings completed by an earlier attempt are skipped on retry.
+    """
+    db = SessionLocal()
+    try:
+        done_ids = set()
+        ids = [item["embedding_id"] for item in items]
+        for i in range(0, len(ids), ID_BATCH_SIZE):
+            batch = ids[i:i + ID_BATCH_SIZE]
+            done_ids.update(
+                embedding_id for (embedding_id,) in db.query(Embedding.id).filter(
+                    Embedding.id.in_(batch),
+                    Embedding.status == "completed"
+                )
+            )
+            db.query(Embedding).filter(
+                Embedding.id.in_(batch),
+                Embedding.status != "completed"
+            ).update({Embedding.status: "processing"}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    
+    counts = {"total": len(items), "extracted": 0, "chunked": 0, "embedded": 0, "indexed": len(done_ids), "failed": 0}
+    errors: Dict[str, str] = {}
+    last_report = 0.0
+    
+    def report(force: bool = False) -> None:
+        nonlocal last_report
+        now = time.monotonic()
+        if force or now - last_report >= BULK_PROGRESS_INTERVAL:
+            last_report = now
+            report_progress(**counts)
+    
+    def counter(name: str) -> Callable[[Dict[str, Any]], None]:
+        def on_done(item: Dict[str, Any]) -> None:
+            counts[name] += 1
+            report()
+        return on_done
+    
+    def on_error(db: Session, item: Dict[str, Any], error: Exception) -> None:
+        logger.warning(f"Bulk embedding of document {item['document_id']} failed: {error}")
+        counts["failed"] += 1
+        errors[item["embedding_id"]] = str(error)
+        _mark_failed(db, item["embedding_id"], error)
+        report()
+    
+    async def extract(db: Session, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {**item, "source": await _load_source(db, item["document_id"])}
+    
+    async def chunk(db: Session, item: Dict[str, Any]) -> Dict[str, Any]:
+        plan = await _diff_chunks(
+            db, item["embedding_id"], item["source"], chunk_size, chunk_overlap, item["incremental"]
+        )
+        return {**item, "source": None, "plan": plan}
+    
+    async def embed(db: Session, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {**item, "vectors": await _embed_new_chunks(db, model, item["plan"])}
+    
+    async def index(db: Session, item: Dict[str, Any]) -> None:
+        embedding = db.query(Embedding).filter(Embedding.id == item["embedding_id"]).first()
+        if not embedding:
+            raise Exception(f"Embedding {item['embedding_id']} not found")
+        await _store_embedding(db, embedding, item["plan"], item["vectors"])
+    
+    to_extract: asyncio.Queue = asyncio.Queue()
+    to_chunk: asyncio.Queue = asyncio.Queue(maxsize=BULK_STAGE_QUEUE_SIZE)
+    to_embed: asyncio.Queue = asyncio.Queue(maxsize=BULK_STAGE_QUEUE_SIZE)
+    to_index: asyncio.Queue = asyncio.Queue(maxsize=BULK_STAGE_QUEUE_SIZE)
+    for item in items:
+        if item["embedding_id"] not in done_ids:
+            to_extract.put_nowait(item)
+    for _ in range(BULK_EXTRACT_WORKERS):
+        to_extract.put_nowait(None)
+    
+    report(force=True)
+    # Chunking is cheap next to extraction and embedding, and writes to an
+    # index are serialized by its lock, so those stages have one worker
+    await asyncio.gather(
+        _run_stage(extract, to_extract, to_chunk, BULK_EXTRACT_WORKERS, 1, counter("extracted"), on_error),
+        _run_stage(chunk, to_chunk, to_embed, 1, BULK_EMBED_WORKERS, counter("chunked"), on_error),
+        _run_stage(embed, to_embed, to_index, BULK_EMBED_WORKERS, 1, counter("embedded"), on_error),
+        _run_stage(index, to_index, None, 1, 0, counter("indexed"), on_error)
+    )
+    report(force=True)
+    
+    return {
+        "status": "completed",
+        "total": counts["total"],
+        "completed": counts["indexed"],
+        "failed": counts["failed"],
+        "errors": errors
+    }
+
 async def delete_embedding(db: Session, embedding_id: str) -> None:
     """Delete an embedding."""
     embedding = db.query(Embedding).filter(Embedding.id == embedding_id).first()
@@ -207,55 +694,64 @@ async def delete_embedding(db: Session, embedding_id: str) -> None:
     
     user_id = embedding.creator_id
     
+    # Drop the embedding's vectors from its index, and its chunk rows
+    get_vector_index(embedding.vector_db).remove_group(embedding_id)
+    lexical_index = get_lexical_index(embedding.vector_db_id)
+    lexical_index.remove_group(embedding_id)
+    lexical_index.versions.pop(embedding_id, None)
+    delete_chunks(db, [embedding_id])
+    
     db.delete(embedding)
     db.commit()
     
     # Invalidate cache
-    await cache_delete_pattern(f"embedding_{embedding_id}*")
-    await cache_delete_pattern(f"embeddings_{user_id}*")
+    await cache_invalidate_tags(f"embedding:{embedding_id}", f"embeddings:{user_id}")
+
+def _update_vectors(
+    index,
+    embedding_id: str,
+    ids: List[str],
+    vectors,
+    removed_ids: Optional[Set[str]] = None
+) -> None:
+    """Write an embedding's new vectors to its index and drop the removed
+    ones; removed_ids=None replaces all of the embedding's vectors."""
+    if removed_ids is None:
+        index.remove_group(embedding_id)
+    elif removed_ids:
+        index.remove(removed_ids)
+    if ids:
+        index.add(ids, vectors, group=embedding_id)
 
-def create_chunks(text: str, chunk_size: int, chunk_overlap: int) -> List[Dict[str, Any]]:
-    """Create text chunks from a document.
+def _update_lexical(index, embedding_id: str, plan: ChunkPlan, previous_version, version) -> None:
+    """Apply a chunk plan to a lexical index.
     
-    In a real application, this would implement a proper chunking algorithm.
-    For now, we'll create mock chunks.
+    Indexes that were never searched in this process are left alone; they
+    are built from the chunks table on first use. The plan is only applied
+    as a diff if the index holds the run it was diffed against.
     """
-    # Simple chunking algorithm
-    chunks = []
-    
-    # If text is shorter than chunk size, just return one chunk
-    if len(text) <= chunk_size:
-        chunks.append({
-            "text": text,
-            "metadata": {
-                "start": 0,
-                "end": len(text),
-                "position": 0
-            }
-        })
-        return chunks
-    
-    # Split into overlapping chunks
-    for i in range(0, len(text), chunk_size - chunk_overlap):
-        end = min(i + chunk_size, len(text))
-        if i >= len(text):
-            break
-            
-        chunk_text = text[i:end]
-        chunks.append({
-            "text": chunk_text,
-            "metadata": {
-                "start": i,
-                "end": end,
-                "position": len(chunks)
-            }
-        })
-        
-        # If we've reached the end, stop
-        if end == len(text):
-            break
+    if not index.synced_at:
+        return
+    with index.sync_lock:
+        if plan.removed_ids is None or index.versions.get(embedding_id) != previous_version:
+            index.remove_group(embedding_id)
+            positions = range(len(plan.rows))
+        else:
+            index.remove(plan.removed_ids)
+            positions = plan.new_positions
+        index.add(
+            [plan.chunk_ids[position] for position in positions],
+            [plan.rows[position]["text"] for position in positions],
+            group=embedding_id
+        )
+        index.versions[embedding_id] = version
+
+def chunk_vector_id(embedding_id: str, text_hash: str, occurrence: int = 0) -> str:
+    """Id under which a chunk's vector is stored in the vector index.
     
-    return chunks
+    `occurrence` numbers repeats of the same text within the document.
+    """
+    return f"{embedding_id}:{text_hash[:16]}:{occurrence}"
 
 def determine_model_dimensions(model_name: str) -> int:
     """Determine embedding dimensions based on model name."""
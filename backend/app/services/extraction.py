@@ -0,0 +1,294 @@
+"""
+Text extraction from uploaded document content.
+
+Extractors are registered per `Document.file_type` and yield a document's
+text one page or section at a time from a binary file object, so large
+files are never fully decoded in memory:
+
+    for page in iter_pages(f, "pdf"):
+        ...
+
+Extracted pages are written to (and read back from) a UTF-8 text file one
+page at a time, so the chunker can consume them as a stream too.
+
+Pure functions with no app or database imports, so they can run in the
+process pool (see app.core.process_pool).
+"""
+import base64
+import codecs
+import io
+import os
+import re
+import zipfile
+from html.parser import HTMLParser
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from xml.etree.ElementTree import iterparse
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF support is optional
+    PdfReader = None
+
+# Sections of flowing text (txt, html, docx) are cut at about this many characters
+SECTION_CHARS = 16384
+READ_BLOCK_BYTES = 65536
+
+PAGE_SEPARATOR = "\n\n"
+
+# Bump when an extractor's output changes, so cached extractions are redone
+EXTRACTOR_VERSION = "1"
+
+Extractor = Callable[[BinaryIO], Iterator[str]]
+
+_extractors: Dict[str, Extractor] = {}
+
+class ExtractionError(Exception):
+    """The document's content could not be read as its file type."""
+
+class UnsupportedFileType(ExtractionError):
+    """No extractor is registered for the file type."""
+
+def register_extractor(*file_types: str) -> Callable[[Extractor], Extractor]:
+    """Register a generator function as the extractor for `file_types`."""
+    def decorator(func: Extractor) -> Extractor:
+        for file_type in file_types:
+            _extractors[file_type.lower()] = func
+        return func
+    return decorator
+
+def supported_file_types() -> List[str]:
+    return sorted(_extractors)
+
+def iter_pages(source: BinaryIO, file_type: str) -> Iterator[str]:
+    """Yield the text of `source` page by page (or section by section)."""
+    extractor = _extractors.get((file_type or "").lower())
+    if extractor is None:
+        raise UnsupportedFileType(f"Text extraction is not supported for '{file_type}' files")
+    yield from extractor(source)
+
+def extract_pages_from_file(path: str, file_type: str) -> Iterator[str]:
+    """Yield the pages of a document stored in a file (e.g. the blob store)."""
+    with open(path, "rb") as f:
+        yield from iter_pages(f, file_type)
+
+def extract_pages_from_content(content: str, file_type: str) -> Iterator[str]:
+    """Yield the pages of a document's base64-encoded inline content."""
+    yield from iter_pages(io.BytesIO(base64.b64decode(content)), file_type)
+
+def write_pages(pages: Iterable[str], path: str) -> Tuple[List[int], int]:
+    """Write pages joined with PAGE_SEPARATOR to a text file as they arrive.
+
+    Returns the (character) offset where each page starts and the total
+    number of characters. The file only appears under `path` once it is
+    complete.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    offsets = []
+    position = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            for number, page in enumerate(pages):
+                if number:
+                    f.write(PAGE_SEPARATOR)
+                    position += len(PAGE_SEPARATOR)
+                offsets.append(position)
+                f.write(page)
+                position += len(page)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return offsets, position
+
+def read_pages(path: str, page_offsets: Sequence[int]) -> Iterator[str]:
+    """Yield the pages of a file written by `write_pages`, one at a time."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for number, start in enumerate(page_offsets):
+            if number + 1 < len(page_offsets):
+                page = f.read(page_offsets[number + 1] - start - len(PAGE_SEPARATOR))
+                f.read(len(PAGE_SEPARATOR))
+            else:
+                page = f.read()
+            yield page
+
+def extract_file_to_text(path: str, file_type: str, text_path: str) -> Tuple[List[int], int]:
+    """Extract a stored file's pages into a text file (see `write_pages`)."""
+    return write_pages(extract_pages_from_file(path, file_type), text_path)
+
+def extract_content_to_text(content: str, file_type: str, text_path: str) -> Tuple[List[int], int]:
+    """Extract inline content's pages into a text file (see `write_pages`)."""
+    return write_pages(extract_pages_from_content(content, file_type), text_path)
+
+def _sections(pieces: Iterator[str], size: int = SECTION_CHARS) -> Iterator[str]:
+    """Group text pieces into sections of about `size` characters."""
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+def _decoded_blocks(source: BinaryIO) -> Iterator[str]:
+    """Decode a UTF-8 byte stream block by block (BOM and bad bytes tolerated)."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    while True:
+        block = source.read(READ_BLOCK_BYTES)
+        if not block:
+            break
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+def _lines(source: BinaryIO) -> Iterator[str]:
+    """Yield lines (with their newline) of a UTF-8 byte stream."""
+    pending = ""
+    for block in _decoded_blocks(source):
+        lines = (pending + block).splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    if pending:
+        yield pending
+
+@register_extractor("txt", "text", "csv", "json", "log")
+def extract_plain_text(source: BinaryIO) -> Iterator[str]:
+    """Sections of whole lines."""
+    return _sections(_lines(source))
+
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s")
+
+@register_extractor("md", "markdown")
+def extract_markdown(source: BinaryIO) -> Iterator[str]:
+    """One section per heading (split further if a section is very long)."""
+    buffer = []
+    length = 0
+    in_code = False
+    for line in _lines(source):
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        starts_section = not in_code and _MARKDOWN_HEADING.match(line)
+        if buffer and (starts_section or length >= SECTION_CHARS):
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+        buffer.append(line)
+        length += len(line)
+    if buffer:
+        yield "".join(buffer)
+
+class _HTMLTextParser(HTMLParser):
+    """Collects visible text, with line breaks around block elements."""
+
+    BLOCK_TAGS = {
+        "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+        "figcaption", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr",
+        "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul"
+    }
+    SKIP_TAGS = {"script", "style", "noscript", "template", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.pieces.append(data)
+
+    def take(self) -> List[str]:
+        pieces, self.pieces = self.pieces, []
+        return pieces
+
+_BLANK_LINES = re.compile(r"[ \t]*\n\s*\n\s*")
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+
+def _tidy_html_text(text: str) -> str:
+    return _BLANK_LINES.sub("\n\n", _SPACES.sub(" ", text))
+
+@register_extractor("html", "htm", "xhtml")
+def extract_html(source: BinaryIO) -> Iterator[str]:
+    """Visible text of an HTML document, fed to the parser block by block."""
+    parser = _HTMLTextParser()
+
+    def pieces() -> Iterator[str]:
+        for block in _decoded_blocks(source):
+            parser.feed(block)
+            yield from parser.take()
+        parser.close()
+        yield from parser.take()
+
+    for section in _sections(pieces()):
+        yield _tidy_html_text(section)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+@register_extractor("docx")
+def extract_docx(source: BinaryIO) -> Iterator[str]:
+    """Paragraph text of a Word document, streamed from word/document.xml.
+
+    Sections end at explicit page breaks or after SECTION_CHARS characters.
+    """
+    try:
+        archive = zipfile.ZipFile(source)
+        document_xml = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ExtractionError(f"Not a valid DOCX file: {e}")
+
+    with archive, document_xml:
+        buffer = []
+        length = 0
+        for event, element in iterparse(document_xml, events=("end",)):
+            tag = element.tag
+            if tag == _W + "t":
+                buffer.append(element.text or "")
+                length += len(element.text or "")
+            elif tag == _W + "tab":
+                buffer.append("\t")
+            elif tag == _W + "br":
+                if element.get(_W + "type") == "page":
+                    if buffer:
+                        yield "".join(buffer)
+                    buffer = []
+                    length = 0
+                else:
+                    buffer.append("\n")
+            elif tag == _W + "p":
+                buffer.append("\n")
+                if length >= SECTION_CHARS:
+                    yield "".join(buffer)
+                    buffer = []
+                    length = 0
+                # Paragraph fully consumed, free its subtree
+                element.clear()
+        if buffer:
+            yield "".join(buffer)
+
+@register_extractor("pdf")
+def extract_pdf(source: BinaryIO) -> Iterator[str]:
+    """One entry per PDF page (needs the optional pypdf package)."""
+    if PdfReader is None:
+        raise ExtractionError("PDF extraction requires the pypdf package")
+    try:
+        reader = PdfReader(source)
+    except Exception as e:
+        raise ExtractionError(f"Not a valid PDF file: {e}")
+    # Pages are parsed lazily, only one page's content is decoded at a time
+    for page in reader.pages:
+        yield page.extract_text() or ""
@@ -0,0 +1,129 @@
+"""
+Extracted-text cache.
+
+Extraction is the most expensive CPU step of ingestion, so its output is
+kept, keyed by the document's content sha256, its file type and
+EXTRACTOR_VERSION. Documents with the same content share one entry, and any
+change to the content or the extractors gives a new key, so entries never
+need updating in place.
+
+The text itself is a UTF-8 file under EXTRACTED_TEXT_PATH, written page by
+page by the extractor in the process pool; the `extracted_texts` row holds
+its page offsets. Readers stream it back a page at a time, so a document's
+text is never held in memory whole.
+"""
+import base64
+import hashlib
+import os
+import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import blob_store
+from app.core.process_pool import run_in_process
+from app.models.document import Document
+from app.models.extracted_text import ExtractedText
+from app.services.extraction import (
+    extract_content_to_text, extract_file_to_text, read_pages, EXTRACTOR_VERSION
+)
+from app.utils.logging import logger
+
+EXTRACTED_TEXT_PATH = os.getenv("EXTRACTED_TEXT_PATH", "./data/extracted")
+
+class ExtractedSource(NamedTuple):
+    """Where a document's extracted text is stored."""
+    path: str
+    page_offsets: List[int]
+
+    def pages(self) -> Iterator[str]:
+        return read_pages(self.path, self.page_offsets)
+
+def _content_sha256(db: Session, document: Document) -> str:
+    """The document's content hash, computed and saved for older inline rows."""
+    if document.content_sha256 is None:
+        document.content_sha256 = hashlib.sha256(base64.b64decode(document.content)).hexdigest()
+        db.commit()
+    return document.content_sha256
+
+def extracted_text_path(content_sha256: str, file_type: str, extractor_version: str = EXTRACTOR_VERSION) -> str:
+    safe_type = re.sub(r"\W", "_", file_type or "")
+    return os.path.join(
+        EXTRACTED_TEXT_PATH, content_sha256[:2],
+        f"{content_sha256}.{safe_type}.v{extractor_version}.txt"
+    )
+
+def get_cached_source(db: Session, content_sha256: str, file_type: str) -> Optional[ExtractedSource]:
+    entry = db.query(ExtractedText).filter(
+        ExtractedText.content_sha256 == content_sha256,
+        ExtractedText.file_type == file_type,
+        ExtractedText.extractor_version == EXTRACTOR_VERSION
+    ).first()
+    if entry is None:
+        return None
+    path = extracted_text_path(content_sha256, file_type)
+    if not os.path.exists(path):
+        # The file was removed behind the row's back; extract again
+        db.delete(entry)
+        db.commit()
+        return None
+    return ExtractedSource(path, entry.page_offsets)
+
+def store_source(
+    db: Session,
+    content_sha256: str,
+    file_type: str,
+    page_offsets: List[int],
+    num_chars: int
+) -> None:
+    db.add(ExtractedText(
+        content_sha256=content_sha256,
+        file_type=file_type,
+        extractor_version=EXTRACTOR_VERSION,
+        page_offsets=page_offsets,
+        num_pages=len(page_offsets),
+        num_chars=num_chars
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent job extracted the same content first
+        db.rollback()
+
+def delete_extracted_text(db: Session, content_sha256: str) -> None:
+    """Drop every cached extraction of a content hash (all file types and versions)."""
+    entries = db.query(ExtractedText).filter(ExtractedText.content_sha256 == content_sha256).all()
+    for entry in entries:
+        try:
+            os.remove(extracted_text_path(content_sha256, entry.file_type, entry.extractor_version))
+        except FileNotFoundError:
+            pass
+        db.delete(entry)
+    db.commit()
+
+async def _extract(document: Document, path: str) -> Tuple[List[int], int]:
+    """Run the extractor for a document in the process pool, writing its text to `path`."""
+    if document.storage == "blob":
+        # The worker reads the file itself, so the content is never pickled
+        return await run_in_process(
+            extract_file_to_text, blob_store.blob_path(document.content_sha256), document.file_type, path
+        )
+    return await run_in_process(extract_content_to_text, document.content, document.file_type, path)
+
+async def extract_source_cached(db: Session, document: Document) -> ExtractedSource:
+    """A document's extracted text file, from the cache or extracted and cached."""
+    content_sha256 = _content_sha256(db, document)
+    source = get_cached_source(db, content_sha256, document.file_type)
+    if source is not None:
+        return source
+
+    path = extracted_text_path(content_sha256, document.file_type)
+    page_offsets, num_chars = await _extract(document, path)
+    store_source(db, content_sha256, document.file_type, page_offsets, num_chars)
+    logger.info(f"Extracted {len(page_offsets)} pages from document {document.id}")
+    return ExtractedSource(path, page_offsets)
+
+async def extract_pages_cached(db: Session, document: Document) -> Iterator[str]:
+    """A document's pages, streamed from the cache (extracting them first on a miss)."""
+    return (await extract_source_cached(db, document)).pages()
@@ -1,55 +1,46 @@
-import requests
 from typing import Dict, List, Any
-import os
 
-# Configuration for Ollama API
-OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api")
+from app.core import ollama_client
 
-def list_models() -> List[Dict]:
+async def list_models() -> List[Dict]:
     """Get a list of available models from Ollama."""
-    response = requests.get(f"{OLLAMA_API_URL}/tags")
-    response.raise_for_status()
-    return response.json().get("models", [])
+    data = await ollama_client.request("GET", "tags")
+    return data.get("models", [])
 
-def create_model(name: str, modelfile: str) -> Dict:
+async def create_model(name: str, modelfile: str) -> Dict:
     """Create a new model using Ollama API."""
-    response = requests.post(
-        f"{OLLAMA_API_URL}/create", 
-        json={
+    await ollama_client.post(
+        "create",
+        {
             "name": name,
-            "modelfile": modelfile
+            "modelfile": modelfile,
+            "stream": False
         }
     )
-    response.raise_for_status()
     return {"success": True, "message": f"Model {name} created successfully"}
 
-def get_modelfile(name: str) -> Dict:
+async def get_modelfile(name: str) -> Dict:
     """Get the Modelfile for a model."""
-    response = requests.post(
-        f"{OLLAMA_API_URL}/show", 
-        json={"name": name}
-    )
-    response.raise_for_status()
-    data = response.json()
+    data = await ollama_client.post("show", {"name": name})
     return {"modelfile": data.get("modelfile", "")}
 
-def delete_model(name: str) -> Dict:
+async def delete_model(name: str) -> Dict:
     """Delete a model."""
-    response = requests.delete(
-        f"{OLLAMA_API_URL}/delete", 
-        json={"name": name}
-    )
-    response.raise_for_status()
+    await ollama_client.request("DELETE", "delete", {"name": name})
     return {"success": True, "message": f"Model {name} deleted successfully"}
 
-def generate(request: Dict) -> Dict:
+async def generate(request: Dict) -> Dict:
     """Generate text using Ollama API."""
-    response = requests.post(f"{OLLAMA_API_URL}/generate", json=request)
-    response.raise_for_status()
-    return response.json()
+    return await ollama_client.post("generate", {**request, "stream": False})
 
-def get_embeddings(request: Dict) -> Dict:
+async def get_embeddings(request: Dict) -> Dict:
     """Get embeddings using Ollama API."""
-    response = requests.post(f"{OLLAMA_API_URL}/embeddings", json=request)
-    response.raise_for_status()
-    return response.json()
+    return await ollama_client.post("embeddings", request)
+
+async def embed(model: str, inputs: List[str]) -> List[List[float]]:
+    """Embed a batch of texts in one call to Ollama's /embed endpoint."""
+    data = await ollama_client.post("embed", {"model": model, "input": inputs})
+    embeddings = data.get("embeddings", [])
+    if len(embeddings) != len(inputs):
+        raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(inputs)} inputs")
+    return embeddings
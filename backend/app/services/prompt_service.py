@@ -7,8 +7,8 @@ from datetime import datetime
 import json
 
 from app.models.prompt import Prompt
-from app.schemas.prompt import PromptCreate, PromptUpdate
-from app.core.cache import cached, cache_delete_pattern, cache_set, cache_get
+from app.schemas.prompt import PromptCreate, PromptUpdate, Prompt as PromptSchema
+from app.core.cache import cache_get_or_set, cache_invalidate_tags
 
 async def get_prompts(
     db: Session, 
@@ -17,14 +17,24 @@ async def get_prompts(
     limit: int = 100,
     category: Optional[str] = None,
     tag: Optional[str] = None
-) -> Tuple[List[Prompt], int]:
+) -> Tuple[List[PromptSchema], int]:
     """Get prompts with filtering and pagination."""
     cache_key = f"prompts_{user_id}_{skip}_{limit}_{category}_{tag}"
-    cached_result = await cache_get(cache_key)
-    
-    if cached_result:
-        return cached_result
-    
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_prompts(db, user_id, skip, limit, category, tag),
+        tags=[f"prompts:{user_id}"],
+        schema=Tuple[List[PromptSchema], int]
+    )
+
+async def _load_prompts(
+    db: Session,
+    user_id: str,
+    skip: int,
+    limit: int,
+    category: Optional[str],
+    tag: Optional[str]
+) -> Tuple[List[Prompt], int]:
     query = db.query(Prompt).filter(Prompt.creator_id == user_id)
     
     # Apply filters
@@ -42,26 +52,25 @@ async def get_prompts(
     # Apply pagination with optimized query
     prompts = query.order_by(Prompt.updated_at.desc()).offset(skip).limit(limit).all()
     
-    result = (prompts, total)
-    await cache_set(cache_key, result)
-    
-    return result
+    return (prompts, total)
 
-async def get_prompt_by_id(db: Session, prompt_id: str, user_id: str) -> Optional[Prompt]:
+async def get_prompt_by_id(db: Session, prompt_id: str, user_id: str) -> Optional[PromptSchema]:
     """Get a prompt by ID with user check."""
     cache_key = f"prompt_{prompt_id}_{user_id}"
-    cached_prompt = await cache_get(cache_key)
-    
-    if cached_prompt:
-        return cached_prompt
-    
+    return await cache_get_or_set(
+        cache_key,
+        lambda: _load_prompt(db, prompt_id, user_id),
+        tags=[f"prompt:{prompt_id}"],
+        schema=PromptSchema
+    )
+
+async def _load_prompt(db: Session, prompt_id: str, user_id: str) -> Optional[Prompt]:
     prompt = db.query(Prompt).filter(Prompt.id == prompt_id).first()
     
     # Check if prompt exists and belongs to user
     if prompt is None or prompt.creator_id != user_id:
         return None
     
-    await cache_set(cache_key, prompt)
     return prompt
 
 async def create_prompt(db: Session, prompt_in: PromptCreate, user_id: str) -> Prompt:
@@ -89,12 +98,17 @@ async def create_prompt(db: Session, prompt_in: PromptCreate, user_id: str) -> P
     db.refresh(db_prompt)
     
     # Invalidate cache for this user's prompts
-    await cache_delete_pattern(f"prompts_{user_id}*")
+    await cache_invalidate_tags(f"prompts:{user_id}")
     
     return db_prompt
 
-async def update_prompt(db: Session, prompt: Prompt, prompt_in: PromptUpdate) -> Prompt:
+async def update_prompt(db: Session, prompt: PromptSchema, prompt_in: PromptUpdate) -> Prompt:
     """Update a prompt."""
+    # `prompt` may be a cached copy; update the stored row
+    prompt = db.query(Prompt).filter(Prompt.id == prompt.id).first()
+    if prompt is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
     update_data = prompt_in.dict(exclude_unset=True)
     
     # Convert tags to JSON if provided
@@ -113,8 +127,7 @@ async def update_prompt(db: Session, prompt: Prompt, prompt_in: PromptUpdate) ->
     db.refresh(prompt)
     
     # Invalidate cache
-    await cache_delete_pattern(f"prompts_{prompt.creator_id}*")
-    await cache_delete_pattern(f"prompt_{prompt.id}*")
+    await cache_invalidate_tags(f"prompts:{prompt.creator_id}", f"prompt:{prompt.id}")
     
     return prompt
 
@@ -130,5 +143,4 @@ async def delete_prompt(db: Session, prompt_id: str) -> None:
     db.commit()
     
     # Invalidate cache
-    await cache_delete_pattern(f"prompts_{user_id}*")
-    await cache_delete_pattern(f"prompt_{prompt_id}*")
+    await cache_invalidate_tags(f"prompts:{user_id}", f"prompt:{prompt_id}")
@@ -0,0 +1,109 @@
+"""
+Query-embedding cache.
+
+RAG traffic repeats the same questions, so query vectors are cached by
+(embedding model, normalized query text): first in an in-process LRU with
+TTL, then (with QUERY_CACHE_REDIS=true) in Redis, where all app workers
+share them. Only queries missing from both are sent to Ollama, in one call.
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core import cache
+from app.core.lru import LRUCache
+from app.services import model_service
+
+# Cache configuration
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "3600"))  # Seconds
+QUERY_CACHE_REDIS = os.getenv("QUERY_CACHE_REDIS", "false").lower() == "true"
+
+_cache = LRUCache(QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL)
+
+# Per-process Redis counters
+_redis_stats = {"hits": 0, "misses": 0}
+_redis_stats_lock = threading.Lock()
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Fold case, Unicode forms and whitespace so near-identical queries share a key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+def query_cache_key(model: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+    return f"query_embedding_{model}_{digest}"
+
+async def _redis_get_many(keys: List[str]) -> Dict[str, np.ndarray]:
+    if not QUERY_CACHE_REDIS or not keys:
+        return {}
+    values = await cache.redis_get_many(keys)
+    found = {
+        key: np.frombuffer(value, dtype="<f4")
+        for key, value in zip(keys, values) if value is not None
+    }
+    with _redis_stats_lock:
+        _redis_stats["hits"] += len(found)
+        _redis_stats["misses"] += len(keys) - len(found)
+    return found
+
+async def _redis_set_many(vectors: Dict[str, np.ndarray]) -> None:
+    if not QUERY_CACHE_REDIS or not vectors:
+        return
+    await cache.redis_set_many(
+        {key: np.asarray(vector, dtype="<f4").tobytes() for key, vector in vectors.items()},
+        QUERY_CACHE_TTL
+    )
+
+async def embed_queries_cached(model: str, queries: List[str]) -> List[List[float]]:
+    """Embed query texts, only calling Ollama for queries not in the cache."""
+    if not QUERY_CACHE_ENABLED:
+        return await model_service.embed(model, queries)
+
+    keys = [query_cache_key(model, query) for query in queries]
+    found: Dict[str, np.ndarray] = {}
+    for key in set(keys):
+        vector = _cache.get(key)
+        if vector is not None:
+            found[key] = vector
+
+    shared = await _redis_get_many([key for key in set(keys) if key not in found])
+    for key, vector in shared.items():
+        _cache.set(key, vector)
+    found.update(shared)
+
+    # Embed each missing query once, even if it repeats within the batch
+    missing = {}
+    for key, query in zip(keys, queries):
+        if key not in found and key not in missing:
+            missing[key] = query
+
+    if missing:
+        vectors = await model_service.embed(model, list(missing.values()))
+        fresh = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+        for key, vector in fresh.items():
+            _cache.set(key, vector)
+        await _redis_set_many(fresh)
+        found.update(fresh)
+
+    return [found[key].tolist() for key in keys]
+
+def clear_query_cache() -> None:
+    _cache.clear()
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    """In-process LRU counters, plus Redis counters when Redis backs the cache."""
+    stats = {"enabled": QUERY_CACHE_ENABLED, **_cache.stats()}
+    stats["redis_enabled"] = QUERY_CACHE_REDIS and cache.get_cache_stats()["redis_available"]
+    with _redis_stats_lock:
+        stats["redis_hits"] = _redis_stats["hits"]
+        stats["redis_misses"] = _redis_stats["misses"]
+    return stats
@@ -1,13 +1,44 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Iterator
 from uuid import uuid4
+from contextlib import contextmanager
+import asyncio
+import os
+import time
 
 from app.models.rag_system import RAGSystem
 from app.models.document import Document
 from app.models.embedding import Embedding
 from app.models.vector_db import VectorDB
 from app.schemas.rag_system import RAGSystemCreate, RAGSystemUpdate
+from app.core.ollama_client import OllamaError
+from app.services import model_service
+from app.services.chunk_service import get_chunks_by_ids
+from app.services.chunking import count_tokens
+from app.services.query_embedding_cache import embed_queries_cached
+from app.services.vector_db_service import search_vector_db, search_lexical
+
+# RAG configuration
+RAG_LLM_MODEL = os.getenv("RAG_LLM_MODEL", "llama3")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "2048"))  # Budget for retrieved context
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_FUSION_CANDIDATES = int(os.getenv("RAG_FUSION_CANDIDATES", "4"))  # Per retriever, as a multiple of top_k
+
+RAG_MAX_BATCH_QUERIES = int(os.getenv("RAG_MAX_BATCH_QUERIES", "256"))
+
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+
+RAG_PROMPT_TEMPLATE = """Answer the question using only the context below. If the context does not contain the answer, say so.
+
+Context:
+{context}
+
+Question: {query}
+
+Answer:"""
 
 def get_rag_systems(
     db: Session, 
@@ -36,17 +67,23 @@ def get_rag_system_by_id(db: Session, rag_system_id: str, user_id: str) -> Optio
     
     return rag_system
 
+def _check_documents_owned(db: Session, document_ids: List[str], user_id: str) -> None:
+    """Raise 404 for the first document that doesn't exist or isn't the user's."""
+    # Only ids are selected, document content is never loaded
+    owned = {
+        doc_id for (doc_id,) in db.query(Document.id).filter(
+            Document.id.in_(document_ids),
+            Document.creator_id == user_id
+        )
+    }
+    for doc_id in document_ids:
+        if doc_id not in owned:
+            raise HTTPException(status_code=404, detail=f"Document with ID {doc_id} not found")
+
 def create_rag_system(db: Session, rag_system_in: RAGSystemCreate, user_id: str) -> RAGSystem:
     """Create a new RAG system."""
     # Verify all documents exist and belong to user
-    for doc_id in rag_system_in.documents:
-        document = db.query(Document).filter(
-            Document.id == doc_id,
-            Document.creator_id == user_id
-        ).first()
-        
-        if document is None:
-            raise HTTPException(status_code=404, detail=f"Document with ID {doc_id} not found")
+    _check_documents_owned(db, rag_system_in.documents, user_id)
     
     # Create RAG system
     db_rag_system = RAGSystem(
@@ -70,14 +107,7 @@ def update_rag_system(db: Session, rag_system: RAGSystem, rag_system_in: RAGSyst
     
     # If documents are being updated, verify they exist and belong to user
     if "documents" in update_data:
-        for doc_id in update_data["documents"]:
-            document = db.query(Document).filter(
-                Document.id == doc_id,
-                Document.creator_id == rag_system.creator_id
-            ).first()
-            
-            if document is None:
-                raise HTTPException(status_code=404, detail=f"Document with ID {doc_id} not found")
+        _check_documents_owned(db, update_data["documents"], rag_system.creator_id)
     
     # Update RAG system attributes
     for key, value in update_data.items():
@@ -98,29 +128,282 @@ def delete_rag_system(db: Session, rag_system_id: str) -> None:
     db.delete(rag_system)
     db.commit()
 
-async def test_rag_system(db: Session, rag_system: RAGSystem, query_text: str) -> Dict[str, Any]:
-    """Test a RAG system with a query.
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """Record the wall time of a stage in milliseconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+def get_rag_embeddings(db: Session, rag_system: RAGSystem) -> List[Tuple[str, str, str]]:
+    """(embedding_id, document_id, vector_db_id) of the completed embeddings
+    of the system's documents made with its embedding model."""
+    if not rag_system.documents:
+        return []
+    return db.query(Embedding.id, Embedding.document_id, Embedding.vector_db_id).filter(
+        Embedding.document_id.in_(rag_system.documents),
+        Embedding.model == rag_system.embedding_model,
+        Embedding.status == "completed",
+        Embedding.creator_id == rag_system.creator_id
+    ).all()
+
+async def embed_queries(model: str, queries: List[str]) -> List[List[float]]:
+    """Embed query texts, from the query cache or in one call to Ollama."""
+    try:
+        return await embed_queries_cached(model, queries)
+    except OllamaError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+def _group_by_vector_db(embeddings: List[Tuple[str, str, str]]) -> Dict[str, List[str]]:
+    groups: Dict[str, List[str]] = {}
+    for embedding_id, _, vector_db_id in embeddings:
+        groups.setdefault(vector_db_id, []).append(embedding_id)
+    return groups
+
+def _merge_hits(
+    embeddings: List[Tuple[str, str, str]],
+    per_db: List[List[List[Dict[str, Any]]]],
+    num_queries: int,
+    top_k: int
+) -> List[List[Dict[str, Any]]]:
+    """Merge per-vector-DB hit lists into one best-first list per query."""
+    document_of = {embedding_id: document_id for embedding_id, document_id, _ in embeddings}
+    results = []
+    for query_hits in zip(*per_db) if per_db else [[] for _ in range(num_queries)]:
+        hits = sorted((hit for hits in query_hits for hit in hits), key=lambda hit: -hit["score"])[:top_k]
+        for hit in hits:
+            hit["document_id"] = document_of.get(hit["embedding_id"])
+        results.append(hits)
+    return results
+
+async def vector_search(
+    db: Session,
+    embeddings: List[Tuple[str, str, str]],
+    vectors: List[List[float]],
+    top_k: int
+) -> List[List[Dict[str, Any]]]:
+    """Top-k chunks for each query vector across the vector DBs holding the embeddings."""
+    groups = _group_by_vector_db(embeddings)
+    vector_dbs = db.query(VectorDB).filter(VectorDB.id.in_(list(groups))).all()
     
-    In a real application, this would:
-    1. Get embeddings for documents
-    2. Create an embedding for the query
-    3. Find relevant chunks using vector similarity
-    4. Construct a prompt with context
-    5. Generate a response using an LLM
+    # Searches are numpy work that releases the GIL, so the vector DBs are
+    # searched in parallel threads
+    per_db = await asyncio.gather(*(
+        asyncio.to_thread(search_vector_db, vector_db, vectors, top_k, groups[vector_db.id])
+        for vector_db in vector_dbs
+    ))
+    return _merge_hits(embeddings, per_db, len(vectors), top_k)
+
+async def lexical_search(
+    db: Session,
+    embeddings: List[Tuple[str, str, str]],
+    queries: List[str],
+    top_k: int
+) -> List[List[Dict[str, Any]]]:
+    """Top-k BM25 chunks for each query text across the embeddings' vector DBs."""
+    groups = _group_by_vector_db(embeddings)
     
-    For now, we'll return a mock response.
+    # One thread for all vector DBs: syncing an index may query the database
+    # through the (not thread-safe) session
+    def search_all() -> List[List[List[Dict[str, Any]]]]:
+        return [
+            search_lexical(db, vector_db_id, queries, top_k, embedding_ids)
+            for vector_db_id, embedding_ids in groups.items()
+        ]
+    
+    per_db = await asyncio.to_thread(search_all)
+    return _merge_hits(embeddings, per_db, len(queries), top_k)
+
+def fuse_rankings(rankings: List[List[Dict[str, Any]]], top_k: int, k: int = RAG_RRF_K) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion of best-first hit lists for one query.
+    
+    A hit scores sum(1 / (k + rank)) over the lists it appears in, so
+    rankings on incomparable scales (cosine, BM25) can be combined.
     """
-    # Get documents associated with the RAG system
-    document_ids = rag_system.documents
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = {**hit, "score": 0.0}
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda hit: -hit["score"])[:top_k]
+
+def attach_chunks(db: Session, results: List[List[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """Add chunk text and position to hits, dropping hits whose chunk is gone."""
+    chunks = get_chunks_by_ids(db, [hit["id"] for hits in results for hit in hits])
+    attached = []
+    for hits in results:
+        kept = []
+        for hit in hits:
+            chunk = chunks.get(hit["id"])
+            if chunk is not None:
+                kept.append({**hit, "position": chunk.position, "text": chunk.text})
+        attached.append(kept)
+    return attached
+
+def build_prompt(
+    query_text: str,
+    hits: List[Dict[str, Any]],
+    max_context_tokens: int
+) -> Tuple[str, List[Dict[str, Any]], int]:
+    """Fill the prompt with the best hits that fit in the token budget.
     
-    # Mock retrieval and generation
+    Returns the prompt, the hits used and the context's token count.
+    """
+    used = []
+    sections = []
+    tokens = 0
+    for hit in hits:
+        section = f"[{len(used) + 1}] {hit['text'].strip()}"
+        section_tokens = count_tokens(section)
+        if tokens + section_tokens > max_context_tokens:
+            continue
+        used.append(hit)
+        sections.append(section)
+        tokens += section_tokens
+    prompt = RAG_PROMPT_TEMPLATE.format(context="\n\n".join(sections), query=query_text)
+    return prompt, used, tokens
+
+def _check_retrieval_mode(retrieval: str) -> None:
+    if retrieval not in RETRIEVAL_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported retrieval mode '{retrieval}', expected one of {list(RETRIEVAL_MODES)}"
+        )
+
+def _require_embeddings(db: Session, rag_system: RAGSystem) -> List[Tuple[str, str, str]]:
+    embeddings = get_rag_embeddings(db, rag_system)
+    if not embeddings:
+        raise HTTPException(
+            status_code=409,
+            detail="None of the RAG system's documents have completed embeddings for its embedding model"
+        )
+    return embeddings
+
+async def retrieve(
+    db: Session,
+    rag_system: RAGSystem,
+    embeddings: List[Tuple[str, str, str]],
+    queries: List[str],
+    top_k: int,
+    retrieval: str,
+    timings: Dict[str, float]
+) -> List[List[Dict[str, Any]]]:
+    """Ranked hits (without text) for each query.
+    
+    All queries go through each stage together: one embedding call and one
+    matrix-matrix search per vector DB however many queries there are.
+    """
+    # Each retriever contributes a deeper candidate list to the fusion
+    candidates = top_k * RAG_FUSION_CANDIDATES if retrieval == "hybrid" else top_k
+    rankings = []
+    if retrieval != "vector":
+        with _timed(timings, "lexical_search"):
+            rankings.append(await lexical_search(db, embeddings, queries, candidates))
+    if retrieval != "lexical":
+        with _timed(timings, "embed_query"):
+            vectors = await embed_queries(rag_system.embedding_model, queries)
+        with _timed(timings, "vector_search"):
+            rankings.append(await vector_search(db, embeddings, vectors, candidates))
+    
+    with _timed(timings, "fusion"):
+        if len(rankings) > 1:
+            return [fuse_rankings(list(query_rankings), top_k) for query_rankings in zip(*rankings)]
+        return [hits[:top_k] for hits in rankings[0]]
+
+def _chunk_result(hit: Dict[str, Any]) -> Dict[str, Any]:
     return {
-        "query": query_text,
-        "retrieved_chunks": [
-            {"text": f"Retrieved chunk from document {doc_id}", "score": round(0.7 + 0.2 * random.random(), 3)}
-            for doc_id in document_ids[:3]  # Use up to 3 documents for demonstration
+        "id": hit["id"],
+        "document_id": hit["document_id"],
+        "embedding_id": hit["embedding_id"],
+        "position": hit["position"],
+        "text": hit["text"],
+        "score": round(hit["score"], 4)
+    }
+
+async def retrieve_batch(
+    db: Session,
+    rag_system: RAGSystem,
+    queries: List[str],
+    top_k: int = RAG_TOP_K,
+    retrieval: str = RAG_RETRIEVAL_MODE
+) -> Dict[str, Any]:
+    """Ranked chunks for many queries at once, without generation."""
+    _check_retrieval_mode(retrieval)
+    if len(queries) > RAG_MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {RAG_MAX_BATCH_QUERIES} queries can be retrieved per request"
+        )
+    timings: Dict[str, float] = {}
+    
+    with _timed(timings, "total"):
+        embeddings = _require_embeddings(db, rag_system)
+        ranked = await retrieve(db, rag_system, embeddings, queries, top_k, retrieval, timings)
+        with _timed(timings, "fetch_chunks"):
+            results = attach_chunks(db, ranked)
+    
+    return {
+        "results": [
+            {"query": query, "chunks": [_chunk_result(hit) for hit in hits]}
+            for query, hits in zip(queries, results)
         ],
-        "response": f"This is a generated response based on the retrieved context about: {query_text}",
-        "model_used": "llama3",
-        "embedding_model": rag_system.embedding_model
+        "embedding_model": rag_system.embedding_model,
+        "retrieval": retrieval,
+        "timings_ms": timings
+    }
+
+async def test_rag_system(
+    db: Session,
+    rag_system: RAGSystem,
+    query_text: str,
+    top_k: int = RAG_TOP_K,
+    model: Optional[str] = None,
+    max_context_tokens: int = RAG_CONTEXT_TOKENS,
+    retrieval: str = RAG_RETRIEVAL_MODE
+) -> Dict[str, Any]:
+    """Answer a query with a RAG system.
+    
+    1. Embed the query with the system's embedding model
+    2. Search the vectors and/or the BM25 index of the system's documents,
+       fusing the two rankings with reciprocal-rank fusion in hybrid mode
+    3. Fetch the text of the best chunks
+    4. Fill a prompt with them, within the context token budget
+    5. Generate a response with the LLM
+    
+    Lexical-only retrieval skips the query embedding. The time spent in
+    each stage is returned in `timings_ms`.
+    """
+    _check_retrieval_mode(retrieval)
+    model = model or RAG_LLM_MODEL
+    timings: Dict[str, float] = {}
+    
+    with _timed(timings, "total"):
+        embeddings = _require_embeddings(db, rag_system)
+        ranked = await retrieve(db, rag_system, embeddings, [query_text], top_k, retrieval, timings)
+        
+        with _timed(timings, "fetch_chunks"):
+            hits = attach_chunks(db, ranked)[0]
+        
+        with _timed(timings, "build_prompt"):
+            prompt, used, context_tokens = build_prompt(query_text, hits, max_context_tokens)
+        
+        with _timed(timings, "generate"):
+            try:
+                generation = await model_service.generate({"model": model, "prompt": prompt})
+            except OllamaError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.message)
+    
+    return {
+        "query": query_text,
+        "retrieved_chunks": [_chunk_result(hit) for hit in used],
+        "response": generation.get("response", ""),
+        "model_used": model,
+        "embedding_model": rag_system.embedding_model,
+        "retrieval": retrieval,
+        "context_tokens": context_tokens,
+        "timings_ms": timings
     }
@@ -0,0 +1,113 @@
+"""
+Garbage collection of content-addressed storage.
+
+Blobs and cached extractions are shared by every document with the same
+content, so deleting a document never removes them directly: a concurrent
+upload of the same content could otherwise have its blob deleted right after
+the store found it already present. Instead, every app process sweeps
+periodically and removes what no document references, once it is older than
+STORAGE_GC_GRACE_SECONDS (longer than any upload takes to go from writing
+the blob to committing its row).
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core import blob_store
+from app.db.database import SessionLocal
+from app.models.document import Document
+from app.models.extracted_text import ExtractedText
+from app.services.extraction_cache import delete_extracted_text
+from app.utils.logging import logger
+
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", "3600"))
+STORAGE_GC_GRACE = float(os.getenv("STORAGE_GC_GRACE_SECONDS", "3600"))
+STORAGE_GC_BATCH = 500
+
+_sweeper: Optional[asyncio.Task] = None
+
+def _batches(items: Iterable[str], size: int = STORAGE_GC_BATCH) -> Iterator[List[str]]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+def _referenced(db: Session, hashes: List[str], blob_only: bool = False) -> Set[str]:
+    query = db.query(Document.content_sha256).filter(Document.content_sha256.in_(hashes))
+    if blob_only:
+        query = query.filter(Document.storage == "blob")
+    return {sha for (sha,) in query}
+
+def sweep_blobs(db: Session, grace: float = STORAGE_GC_GRACE) -> int:
+    """Delete blobs that no blob-stored document references."""
+    removed = 0
+    for batch in _batches(blob_store.iter_blobs(older_than=grace)):
+        referenced = _referenced(db, batch, blob_only=True)
+        for sha256 in batch:
+            # The mtime is checked again after the reference query, so a
+            # blob an upload refreshed in the meantime is kept
+            if sha256 not in referenced and blob_store.delete_blob(sha256, older_than=grace):
+                removed += 1
+    removed_tmp = blob_store.delete_stale_temp_files(older_than=grace)
+    if removed_tmp:
+        logger.info(f"Removed {removed_tmp} stale blob temp files")
+    return removed
+
+def sweep_extracted_texts(db: Session, grace: float = STORAGE_GC_GRACE) -> int:
+    """Delete cached extractions of content that no document has anymore."""
+    cutoff = datetime.utcnow() - timedelta(seconds=grace)
+    candidates = [
+        sha for (sha,) in db.query(ExtractedText.content_sha256)
+        .filter(ExtractedText.created_at < cutoff)
+        .distinct()
+    ]
+    removed = 0
+    for batch in _batches(candidates):
+        referenced = _referenced(db, batch)
+        for sha256 in batch:
+            if sha256 not in referenced:
+                delete_extracted_text(db, sha256)
+                removed += 1
+    return removed
+
+def sweep_storage(grace: float = STORAGE_GC_GRACE) -> Dict[str, int]:
+    """Run one sweep of the blob store and the extraction cache."""
+    db = SessionLocal()
+    try:
+        removed = {
+            "blobs": sweep_blobs(db, grace),
+            "extracted_texts": sweep_extracted_texts(db, grace)
+        }
+    finally:
+        db.close()
+    if any(removed.values()):
+        logger.info(f"Storage sweep removed {removed['blobs']} blobs and "
+                    f"{removed['extracted_texts']} cached extractions")
+    return removed
+
+async def _sweep_loop() -> None:
+    while True:
+        await asyncio.sleep(STORAGE_GC_INTERVAL)
+        try:
+            await asyncio.to_thread(sweep_storage)
+        except Exception as e:
+            logger.exception(f"Storage sweep failed: {e}")
+
+def start_storage_gc() -> None:
+    """Start this process's periodic sweep (called on app startup)."""
+    global _sweeper
+    if _sweeper is None and STORAGE_GC_INTERVAL > 0:
+        _sweeper = asyncio.create_task(_sweep_loop())
+
+async def stop_storage_gc() -> None:
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        await asyncio.gather(_sweeper, return_exceptions=True)
+        _sweeper = None
@@ -2,9 +2,20 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Tuple, Optional, Dict
 from uuid import uuid4
+import os
+import time
 
+from app.core.vector_store import get_vector_index, drop_vector_index, INDEX_TYPES
+from app.core.lexical_index import LexicalIndex, get_lexical_index, drop_lexical_index
+from app.models.chunk import Chunk
+from app.models.embedding import Embedding
 from app.models.vector_db import VectorDB
 from app.schemas.vector_db import VectorDBCreate, VectorDBUpdate
+from app.services.chunk_service import get_chunks_by_ids
+
+# Seconds between checks that a lexical index matches the chunks table
+LEXICAL_SYNC_INTERVAL = float(os.getenv("LEXICAL_SYNC_INTERVAL", "5"))
+LEXICAL_SYNC_BATCH = 50  # Embeddings whose chunk texts are loaded at once
 
 def get_vector_dbs(
     db: Session, 
@@ -40,12 +51,20 @@ def get_vector_db_by_id(db: Session, db_id: str, user_id: str) -> Optional[Vecto
 
 def create_vector_db(db: Session, vector_db_in: VectorDBCreate, user_id: str) -> VectorDB:
     """Create a new vector database configuration."""
+    if vector_db_in.index_type not in INDEX_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported index type '{vector_db_in.index_type}', expected one of {list(INDEX_TYPES)}"
+        )
+    
     # Create vector DB
     db_vector_db = VectorDB(
         id=str(uuid4()),
         name=vector_db_in.name,
         type=vector_db_in.type,
         connection_string=vector_db_in.connection_string,
+        index_type=vector_db_in.index_type,
+        index_params=vector_db_in.index_params,
         creator_id=user_id
     )
     
@@ -63,6 +82,98 @@ def delete_vector_db(db: Session, db_id: str) -> None:
     
     db.delete(vector_db)
     db.commit()
+    
+    drop_vector_index(db_id)
+    drop_lexical_index(db_id)
+
+def search_vector_db(
+    vector_db: VectorDB,
+    vectors: List[List[float]],
+    top_k: int = 10,
+    embedding_ids: Optional[List[str]] = None,
+    nprobe: Optional[int] = None
+) -> List[List[Dict]]:
+    """Run a batched top-k similarity search against a vector database."""
+    index = get_vector_index(vector_db)
+    if index.dimensions is not None and any(len(v) != index.dimensions for v in vectors):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Query vectors must have {index.dimensions} dimensions"
+        )
+    
+    results = index.search(vectors, top_k=top_k, groups=embedding_ids, nprobe=nprobe)
+    return [
+        [{"id": hit.id, "score": hit.score, "embedding_id": hit.group} for hit in hits]
+        for hits in results
+    ]
+
+def attach_chunk_text(db: Session, results: List[List[Dict]]) -> List[List[Dict]]:
+    """Add chunk text and position to search hits, fetching only the hit chunks."""
+    chunks = get_chunks_by_ids(db, [hit["id"] for hits in results for hit in hits])
+    for hits in results:
+        for hit in hits:
+            chunk = chunks.get(hit["id"])
+            if chunk is not None:
+                hit["position"] = chunk.position
+                hit["text"] = chunk.text
+    return results
+
+def sync_lexical_index(db: Session, vector_db_id: str, force: bool = False) -> LexicalIndex:
+    """Bring a vector DB's lexical index up to date with the chunks table.
+    
+    Embeddings completed in this process are indexed as they finish; this
+    catches up with embeddings completed (or deleted) by other processes,
+    and builds the index on first use. Each embedding is indexed at the
+    completed_at it was synced for, so only changed embeddings are reloaded.
+    """
+    index = get_lexical_index(vector_db_id)
+    if not force and time.monotonic() - index.synced_at < LEXICAL_SYNC_INTERVAL:
+        return index
+    
+    with index.sync_lock:
+        current = dict(db.query(Embedding.id, Embedding.completed_at).filter(
+            Embedding.vector_db_id == vector_db_id,
+            Embedding.status == "completed"
+        ))
+        for embedding_id in [e for e in index.versions if e not in current]:
+            index.remove_group(embedding_id)
+            del index.versions[embedding_id]
+        
+        stale = [e for e, completed_at in current.items() if index.versions.get(e) != completed_at]
+        for i in range(0, len(stale), LEXICAL_SYNC_BATCH):
+            batch = stale[i:i + LEXICAL_SYNC_BATCH]
+            texts: Dict[str, Tuple[List[str], List[str]]] = {e: ([], []) for e in batch}
+            rows = db.query(Chunk.embedding_id, Chunk.id, Chunk.text).filter(
+                Chunk.embedding_id.in_(batch)
+            ).yield_per(5000)
+            for embedding_id, chunk_id, text in rows:
+                texts[embedding_id][0].append(chunk_id)
+                texts[embedding_id][1].append(text)
+            for embedding_id, (chunk_ids, chunk_texts) in texts.items():
+                index.remove_group(embedding_id)
+                index.add(chunk_ids, chunk_texts, group=embedding_id)
+                index.versions[embedding_id] = current[embedding_id]
+        index.synced_at = time.monotonic()
+    return index
+
+def search_lexical(
+    db: Session,
+    vector_db_id: str,
+    queries: List[str],
+    top_k: int = 10,
+    embedding_ids: Optional[List[str]] = None
+) -> List[List[Dict]]:
+    """Run BM25 top-k searches over a vector database's chunks."""
+    index = sync_lexical_index(db, vector_db_id)
+    results = index.search(queries, top_k=top_k, groups=embedding_ids)
+    return [
+        [{"id": hit.id, "score": hit.score, "embedding_id": hit.group} for hit in hits]
+        for hits in results
+    ]
+
+def get_vector_index_stats(vector_db: VectorDB) -> Dict:
+    """Get size and configuration of the index behind a vector database."""
+    return get_vector_index(vector_db).stats()
 
 def get_vector_db_types() -> List[Dict[str, str]]:
     """Get list of supported vector database types."""
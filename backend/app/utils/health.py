@@ -1,13 +1,10 @@
 import time
-import requests
 import os
 from typing import Dict, Any
 from sqlalchemy.orm import Session
+from app.core import ollama_client
 from app.db.database import get_db
 
-# Configuration for Ollama API
-OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api")
-
 class HealthChecker:
     """Health check utility for the application."""
     
@@ -34,16 +31,16 @@ class HealthChecker:
         }
     
     @staticmethod
-    def check_ollama_api() -> Dict[str, Any]:
+    async def check_ollama_api() -> Dict[str, Any]:
         """Check Ollama API connection."""
         start_time = time.time()
         try:
-            response = requests.get(
-                f"{OLLAMA_API_URL}/tags", 
-                timeout=5.0
-            )
-            status = "healthy" if response.status_code == 200 else "unhealthy"
-            error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+            await ollama_client.request("GET", "tags")
+            status = "healthy"
+            error = None
+        except ollama_client.OllamaError as e:
+            status = "unhealthy"
+            error = f"HTTP {e.status_code}"
         except Exception as e:
             status = "unhealthy"
             error = str(e)
@@ -58,12 +55,12 @@ class HealthChecker:
         }
     
     @classmethod
-    def check_all(cls, db: Session) -> Dict[str, Any]:
+    async def check_all(cls, db: Session) -> Dict[str, Any]:
         """Run all health checks."""
         start_time = time.time()
         
         db_check = cls.check_database(db)
-        ollama_check = cls.check_ollama_api()
+        ollama_check = await cls.check_ollama_api()
         
         # Overall status is healthy only if all components are healthy
         overall_status = "healthy"
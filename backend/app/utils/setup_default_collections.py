@@ -6,21 +6,21 @@ from typing import List
 from uuid import uuid4
 from datetime import datetime
 
-from app.models.vector_db import VectorDatabase
+from app.models.vector_db import VectorDB
 from app.models.user import User
 
-def create_sample_collections(db: Session, admin_user_id: str) -> List[VectorDatabase]:
+def create_sample_collections(db: Session, admin_user_id: str) -> List[VectorDB]:
     """Create sample vector database collections for new installations."""
     
     # Check if collections already exist
-    existing_collections = db.query(VectorDatabase).count()
+    existing_collections = db.query(VectorDB).count()
     if existing_collections > 0:
         # Collections already exist, don't create duplicates
         return []
     
     # Create sample collections
     collections = [
-        VectorDatabase(
+        VectorDB(
             id=str(uuid4()),
             name="General Knowledge",
             type="chroma",
@@ -29,7 +29,7 @@ def create_sample_collections(db: Session, admin_user_id: str) -> List[VectorDat
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         ),
-        VectorDatabase(
+        VectorDB(
             id=str(uuid4()),
             name="Workshop Documentation",
             type="chroma",
@@ -38,7 +38,7 @@ def create_sample_collections(db: Session, admin_user_id: str) -> List[VectorDat
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         ),
-        VectorDatabase(
+        VectorDB(
             id=str(uuid4()),
             name="Technical Reference",
             type="chroma",
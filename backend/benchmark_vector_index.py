@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# benchmark_vector_index.py
+"""
+Recall-vs-latency benchmark of the IVF index against exact search.
+
+Builds a synthetic clustered collection, searches it with the exact index to
+get ground truth, then reports recall@k and per-query latency of the IVF
+index for a range of nprobe values.
+
+    python benchmark_vector_index.py --rows 200000 --dimensions 384 --nprobe 1 4 16 64
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.core.vector_store import VectorIndex
+from app.core.vector_ann import IVFIndex
+
+def make_dataset(
+    rows: int, dimensions: int, clusters: int, seed: int, spread: float, intrinsic: int
+) -> np.ndarray:
+    """Overlapping Gaussian blobs, roughly like embedding clusters.
+
+    Like real embeddings, the points vary along far fewer directions than
+    they have dimensions: blobs are drawn in an `intrinsic`-dimensional space
+    and projected up, with a little isotropic noise on top. Points lie about
+    `spread` times the center scale from their center, so many true
+    neighbours sit in other clusters and recall depends on nprobe.
+    """
+    rng = np.random.default_rng(seed)
+    intrinsic = min(intrinsic, dimensions)
+    centers = rng.standard_normal((clusters, intrinsic)).astype(np.float32)
+    labels = rng.integers(0, clusters, rows)
+    latent = centers[labels] + spread * rng.standard_normal((rows, intrinsic)).astype(np.float32)
+    projection = rng.standard_normal((intrinsic, dimensions)).astype(np.float32) / np.sqrt(intrinsic)
+    noise = rng.standard_normal((rows, dimensions)).astype(np.float32)
+    return latent @ projection + 0.1 * noise
+
+def time_search(index, queries: np.ndarray, top_k: int, **params):
+    """Return (batched results, ms/query batched, ms/query one at a time)."""
+    start = time.perf_counter()
+    results = index.search(queries, top_k=top_k, **params)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, top_k=top_k, **params)
+    single_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return results, batch_ms, single_ms
+
+def recall(results, truth) -> float:
+    found = sum(
+        len({hit.id for hit in hits} & {hit.id for hit in expected})
+        for hits, expected in zip(results, truth)
+    )
+    return found / sum(len(expected) for expected in truth)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=1.0, help="Within-cluster spread relative to the center scale")
+    parser.add_argument("--intrinsic", type=int, default=32, help="Intrinsic dimensionality of the data")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} x {args.dimensions} vectors...")
+    data = make_dataset(
+        args.rows + args.queries, args.dimensions, args.clusters, args.seed, args.spread, args.intrinsic
+    )
+    vectors, queries = data[:args.rows], data[args.rows:]
+    ids = [str(i) for i in range(args.rows)]
+
+    exact = VectorIndex()
+    exact.add(ids, vectors)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(VectorIndex(), nlist=args.nlist, min_train_rows=args.rows)
+    ivf.add(ids, vectors)
+    ivf.wait_for_training()
+    print(f"IVF build (train + assign, nlist={ivf.nlist}): {time.perf_counter() - start:.2f}s")
+
+    truth, batch_ms, single_ms = time_search(exact, queries, args.top_k)
+    header = f"{'index':<8}{'nprobe':>8}{'recall@' + str(args.top_k):>12}{'ms/q batch':>12}{'ms/q single':>13}"
+    print("\n" + header)
+    print(f"{'exact':<8}{'-':>8}{1.0:>12.3f}{batch_ms:>12.3f}{single_ms:>13.3f}")
+    for nprobe in args.nprobe:
+        results, batch_ms, single_ms = time_search(ivf, queries, args.top_k, nprobe=nprobe)
+        print(f"{'ivf':<8}{nprobe:>8}{recall(results, truth):>12.3f}{batch_ms:>12.3f}{single_ms:>13.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+# Make `app` importable when pytest is run from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Run CPU-bound helpers on a thread instead of spawning worker processes
+os.environ.setdefault("PROCESS_POOL_SIZE", "0")
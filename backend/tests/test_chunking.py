@@ -0,0 +1,96 @@
+# tests/test_chunking.py
+import random
+
+import pytest
+
+from app.services.chunking import chunk_pages, count_tokens, iter_chunk_spans, tokenize
+
+def make_sentences(count, seed=0):
+    rng = random.Random(seed)
+    words = ["vector", "index", "chunk", "token", "segment", "query", "embedding", "retrieval", "42", "x"]
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(4, 14))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+def make_pages(num_pages=6, sentences_per_page=25, seed=0):
+    sentences = make_sentences(num_pages * sentences_per_page, seed)
+    pages = []
+    for page in range(num_pages):
+        page_sentences = sentences[page * sentences_per_page:(page + 1) * sentences_per_page]
+        # A paragraph break every few sentences
+        paragraphs = [" ".join(page_sentences[i:i + 6]) for i in range(0, len(page_sentences), 6)]
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(32, 0), (64, 8), (128, 32), (256, 32)])
+def test_chunks_never_exceed_chunk_size(chunk_size, chunk_overlap):
+    spans, texts = chunk_pages(make_pages(), chunk_size, chunk_overlap)
+    assert len(texts) > 1
+    assert max(spans.token_counts) <= chunk_size
+    assert [count_tokens(text) for text in texts] == spans.token_counts.tolist()
+
+def test_spans_point_into_the_joined_text():
+    pages = make_pages()
+    joined = "\n\n".join(pages)
+    spans, texts = chunk_pages(pages, 64, 8)
+    assert texts == [joined[start:end] for start, end in zip(spans.starts, spans.ends)]
+
+def test_chunks_cover_every_token():
+    pages = make_pages()
+    joined = "\n\n".join(pages)
+    spans, _ = chunk_pages(pages, 64, 8)
+    token_starts, _ = tokenize(joined)
+    covered = {start for chunk_start, chunk_end in zip(spans.starts, spans.ends)
+               for start in token_starts if chunk_start <= start < chunk_end}
+    assert covered == set(token_starts.tolist())
+
+def test_overlap_is_bounded_by_chunk_overlap():
+    spans, _ = chunk_pages(make_pages(), 64, 16)
+    joined = "\n\n".join(make_pages())
+    for start, previous_end in zip(spans.starts[1:], spans.ends[:-1]):
+        assert start < previous_end
+        assert count_tokens(joined[start:previous_end]) <= 16
+
+def test_no_overlap_when_chunk_overlap_is_zero():
+    spans, _ = chunk_pages(make_pages(), 64, 0)
+    assert all(start >= end for start, end in zip(spans.starts[1:], spans.ends[:-1]))
+
+def test_chunks_end_and_start_on_sentence_boundaries():
+    spans, texts = chunk_pages(make_pages(), 128, 32)
+    # Every sentence fits, so no chunk needs a hard cut
+    assert all(text.endswith(".") for text in texts)
+    assert all(text[0].isupper() for text in texts)
+
+def test_streaming_matches_chunking_the_joined_text():
+    pages = make_pages(num_pages=9, sentences_per_page=7, seed=3)
+    streamed, streamed_texts = chunk_pages(pages, 64, 16)
+    whole, whole_texts = chunk_pages(["\n\n".join(pages)], 64, 16)
+    assert streamed_texts == whole_texts
+    assert streamed.starts.tolist() == whole.starts.tolist()
+    assert streamed.ends.tolist() == whole.ends.tolist()
+
+def test_chunks_are_yielded_before_the_last_page():
+    pages = make_pages(num_pages=5)
+    consumed = []
+
+    def page_stream():
+        for page in pages:
+            consumed.append(page)
+            yield page
+
+    first_spans, _ = next(iter_chunk_spans(page_stream(), 64, 8))
+    assert len(first_spans) and len(consumed) < len(pages)
+
+def test_hard_cut_without_boundaries():
+    text = " ".join(["word"] * 500)
+    spans, texts = chunk_pages([text], 100, 10)
+    assert spans.token_counts.tolist()[:-1] == [100] * (len(texts) - 1)
+
+def test_empty_input():
+    spans, texts = chunk_pages(["", "   "], 64, 8)
+    assert len(spans) == 0 and texts == []
+
+def test_invalid_chunk_size():
+    with pytest.raises(ValueError):
+        chunk_pages(["text"], 0, 0)
@@ -0,0 +1,86 @@
+# tests/test_lexical_index.py
+from app.core.lexical_index import COMPACT_MIN_DEAD, LexicalIndex, tokenize
+
+def ids(hits):
+    return [hit.id for hit in hits]
+
+def make_index():
+    index = LexicalIndex()
+    index.add(
+        ["a", "b", "c", "d"],
+        [
+            "The connection failed with ERR_CONN_42 after a timeout.",
+            "Timeouts are retried with exponential backoff.",
+            "Backoff backoff backoff: the retry policy doubles the wait.",
+            "Install the e5-large-v2 model before indexing documents.",
+        ],
+        group="e1"
+    )
+    return index
+
+def test_tokenize_keeps_compounds_and_their_parts():
+    terms = tokenize("Error ERR_CONN_42 in e5-large-v2")
+    assert "err_conn_42" in terms and "conn" in terms and "42" in terms
+    assert "e5-large-v2" in terms and "large" in terms
+
+def test_exact_identifier_ranks_first():
+    index = make_index()
+    assert ids(index.search(["ERR_CONN_42"])[0]) == ["a"]
+    assert ids(index.search(["e5-large-v2"])[0])[0] == "d"
+
+def test_term_frequency_and_rarity_order_hits():
+    index = make_index()
+    assert ids(index.search(["backoff"])[0]) == ["c", "b"]
+    # "timeout" is in one document, "the" in three: the rare term decides
+    assert ids(index.search(["the timeout"])[0])[0] == "a"
+
+def test_unmatched_query_returns_nothing():
+    index = make_index()
+    assert index.search(["kubernetes"], top_k=5) == [[]]
+
+def test_batch_of_queries_and_top_k():
+    index = make_index()
+    results = index.search(["backoff", "model", "the"], top_k=2)
+    assert ids(results[0]) == ["c", "b"]
+    assert ids(results[1]) == ["d"]
+    assert len(results[2]) == 2
+
+def test_groups_filter_and_removal():
+    index = make_index()
+    index.add(["e"], ["Backoff for the second embedding."], group="e2")
+    assert ids(index.search(["backoff"], groups=["e2"])[0]) == ["e"]
+
+    index.remove_group("e1")
+    assert ids(index.search(["backoff"])[0]) == ["e"]
+    assert index.remove(["e", "missing"]) == 1
+    assert index.search(["backoff"]) == [[]]
+
+def test_readding_an_id_replaces_its_text():
+    index = make_index()
+    index.add(["a"], ["Nothing about connections anymore."], group="e1")
+    assert index.search(["ERR_CONN_42"]) == [[]]
+    assert len(index) == 4
+
+def test_compaction_keeps_results_and_drops_dead_rows():
+    index = LexicalIndex()
+    count = 3 * COMPACT_MIN_DEAD
+    index.add([str(i) for i in range(count)], [f"document number{i} shared" for i in range(count)])
+    before = index.search(["number2500 shared"], top_k=3)[0]
+
+    # Removing two thirds of the rows compacts the index
+    index.remove([str(i) for i in range(0, 2 * COMPACT_MIN_DEAD)])
+    stats = index.stats()
+    assert stats["rows"] == stats["documents"] == COMPACT_MIN_DEAD
+    assert stats["postings"] < 3 * count
+
+    after = index.search(["number2500 shared"], top_k=3)[0]
+    assert ids(after)[0] == ids(before)[0] == "2500"
+    assert index.search(["number5"]) == [[]]
+    assert ids(index.search([f"number{count - 1}"])[0]) == [str(count - 1)]
+
+def test_explicit_compact():
+    index = make_index()
+    index.remove(["b"])
+    index.compact()
+    assert index.stats()["rows"] == 3
+    assert ids(index.search(["backoff"])[0]) == ["c"]
@@ -0,0 +1,95 @@
+# tests/test_vector_ann.py
+import numpy as np
+
+from app.core import vector_ann
+from app.core.vector_ann import IVFIndex, train_kmeans
+from app.core.vector_segments import SegmentedVectorIndex
+from app.core.vector_store import COMPACT_MIN_DEAD, VectorIndex
+
+def make_vectors(rows, dimensions=24, seed=0):
+    return np.random.default_rng(seed).standard_normal((rows, dimensions)).astype(np.float32)
+
+def ids(results):
+    return [[hit.id for hit in hits] for hits in results]
+
+def trained_index(rows=3000, base=None, **params):
+    index = IVFIndex(VectorIndex() if base is None else base, min_train_rows=rows, **params)
+    index.add([str(i) for i in range(rows)], make_vectors(rows), group="e1")
+    assert index.wait_for_training(timeout=60)
+    return index
+
+def test_untrained_index_searches_exactly():
+    index = IVFIndex(VectorIndex(), min_train_rows=1000)
+    vectors = make_vectors(100)
+    index.add([str(i) for i in range(100)], vectors)
+    assert not index.trained
+    assert ids(index.search(vectors[:3], top_k=1)) == [["0"], ["1"], ["2"]]
+
+def test_probing_every_list_matches_exact_search():
+    index = trained_index()
+    assert index.ready
+    queries = make_vectors(30, seed=1)
+    assert ids(index.search(queries, top_k=10, nprobe=index.nlist)) == ids(index.base.search(queries, top_k=10))
+
+def test_batched_search_matches_single_queries():
+    index = trained_index()
+    queries = make_vectors(12, seed=2)
+    batched = ids(index.search(queries, top_k=5, nprobe=3))
+    assert batched == [ids(index.search(query, top_k=5, nprobe=3))[0] for query in queries]
+
+def test_recall_grows_with_nprobe():
+    index = trained_index()
+    queries = make_vectors(50, seed=3)
+    truth = ids(index.base.search(queries, top_k=10))
+
+    def recall(nprobe):
+        found = ids(index.search(queries, top_k=10, nprobe=nprobe))
+        return sum(len(set(a) & set(b)) for a, b in zip(found, truth)) / (10 * len(queries))
+
+    assert recall(1) < recall(8) <= recall(index.nlist) == 1.0
+
+def test_new_rows_are_searchable_without_retraining():
+    index = trained_index()
+    extra = make_vectors(5, seed=4)
+    index.add([f"new{i}" for i in range(5)], extra)
+    assert index.wait_for_training(timeout=60)
+    assert ids(index.search(extra, top_k=1, nprobe=index.nlist)) == [[f"new{i}"] for i in range(5)]
+
+def test_retrains_with_more_lists_after_growth(monkeypatch):
+    monkeypatch.setattr(vector_ann, "IVF_RETRAIN_GROWTH", 2)
+    index = trained_index(rows=1000)
+    assert index.nlist == int(np.sqrt(1000))
+    index.add([f"more{i}" for i in range(3000)], make_vectors(3000, seed=5))
+    assert index.wait_for_training(timeout=60)
+    assert index.stats()["trained_rows"] == 4000
+    assert index.nlist == int(np.sqrt(4000))
+
+def test_lists_are_rebuilt_after_compaction():
+    index = trained_index(rows=3 * COMPACT_MIN_DEAD)
+    index.remove([str(i) for i in range(2 * COMPACT_MIN_DEAD)])
+    assert index.wait_for_training(timeout=60)
+    assert index.ready
+    queries = make_vectors(20, seed=6)
+    assert ids(index.search(queries, top_k=5, nprobe=index.nlist)) == ids(index.base.search(queries, top_k=5))
+
+def test_other_processes_load_the_saved_quantizer(tmp_path):
+    index = trained_index(base=SegmentedVectorIndex(str(tmp_path)))
+    other = IVFIndex(SegmentedVectorIndex(str(tmp_path)), min_train_rows=3000)
+    assert other.wait_for_training(timeout=60)
+    assert other.ready and other.nlist == index.nlist
+    np.testing.assert_array_equal(other._centroids, index._centroids)
+
+def test_group_filter():
+    index = trained_index()
+    vectors = make_vectors(3, seed=7)
+    index.add(["a", "b", "c"], vectors, group="e2")
+    hits = index.search(vectors[0], top_k=10, groups=["e2"], nprobe=index.nlist)[0]
+    assert [hit.id for hit in hits][0] == "a"
+    assert {hit.group for hit in hits} == {"e2"}
+
+def test_train_kmeans_finds_separated_clusters():
+    rng = np.random.default_rng(0)
+    centers = np.eye(4, dtype=np.float32)
+    sample = centers[rng.integers(0, 4, 400)] + 0.01 * rng.standard_normal((400, 4)).astype(np.float32)
+    centroids = train_kmeans(sample / np.linalg.norm(sample, axis=1, keepdims=True), 4)
+    assert sorted(np.argmax(centroids, axis=1).tolist()) == [0, 1, 2, 3]
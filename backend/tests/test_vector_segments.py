@@ -0,0 +1,110 @@
+# tests/test_vector_segments.py
+import os
+
+import numpy as np
+import pytest
+
+from app.core import vector_segments
+from app.core.vector_segments import SegmentedVectorIndex
+from app.core.vector_store import COMPACT_MIN_DEAD, VectorIndex
+
+def make_vectors(rows, dimensions=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((rows, dimensions)).astype(np.float32)
+
+def top_ids(index, queries, top_k=1):
+    return [[hit.id for hit in hits] for hits in index.search(queries, top_k=top_k)]
+
+def test_rows_survive_reopening(tmp_path):
+    vectors = make_vectors(200)
+    index = SegmentedVectorIndex(str(tmp_path))
+    index.add([f"c{i}" for i in range(200)], vectors, group="e1")
+    index.remove(["c0", "c1"])
+
+    reopened = SegmentedVectorIndex(str(tmp_path))
+    assert len(reopened) == 198
+    assert reopened.dimensions == 16
+    assert top_ids(reopened, vectors[5]) == [["c5"]]
+    assert "c0" not in top_ids(reopened, vectors[0], top_k=5)[0]
+    assert reopened.search(vectors[5], top_k=1)[0][0].group == "e1"
+
+def test_second_instance_sees_writes(tmp_path):
+    vectors = make_vectors(20)
+    writer = SegmentedVectorIndex(str(tmp_path))
+    reader = SegmentedVectorIndex(str(tmp_path))
+    writer.add([f"c{i}" for i in range(10)], vectors[:10])
+    assert top_ids(reader, vectors[3]) == [["c3"]]
+
+    reader.add([f"c{i}" for i in range(10, 20)], vectors[10:])
+    writer.remove(["c15"])
+    assert len(reader.search(vectors, top_k=1)) == 20
+    assert top_ids(reader, vectors[15], top_k=1) != [["c15"]]
+    assert len(writer) == len(reader) == 19
+
+def test_replacing_an_id_keeps_one_row_live(tmp_path):
+    vectors = make_vectors(2)
+    index = SegmentedVectorIndex(str(tmp_path))
+    index.add(["c"], vectors[:1])
+    index.add(["c"], vectors[1:])
+    assert len(SegmentedVectorIndex(str(tmp_path))) == 1
+    assert top_ids(index, vectors[1]) == [["c"]]
+
+def test_rows_span_several_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_segments, "SEGMENT_MAX_ROWS", 64)
+    vectors = make_vectors(300)
+    index = SegmentedVectorIndex(str(tmp_path))
+    index.add([f"c{i}" for i in range(300)], vectors)
+    assert index.stats()["segments"] == 5
+
+    reopened = SegmentedVectorIndex(str(tmp_path))
+    assert top_ids(reopened, vectors[[0, 63, 64, 299]]) == [["c0"], ["c63"], ["c64"], ["c299"]]
+
+def test_compaction_reclaims_removed_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_segments, "SEGMENT_MAX_ROWS", 1000)
+    rows = 3 * COMPACT_MIN_DEAD
+    vectors = make_vectors(rows)
+    index = SegmentedVectorIndex(str(tmp_path))
+    reader = SegmentedVectorIndex(str(tmp_path))
+    index.add([f"c{i}" for i in range(rows)], vectors, group="e1")
+    assert top_ids(reader, vectors[0]) == [["c0"]]
+
+    # Removing two thirds of the rows triggers compaction into a new generation
+    index.remove([f"c{i}" for i in range(2 * COMPACT_MIN_DEAD)])
+    stats = index.stats()
+    assert stats["rows"] == stats["vectors"] == COMPACT_MIN_DEAD
+    assert stats["generation"] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("seg-000000-")]
+
+    # Other instances follow the new generation, new ones open it directly
+    for other in (reader, SegmentedVectorIndex(str(tmp_path))):
+        assert top_ids(other, vectors[rows - 1]) == [[f"c{rows - 1}"]]
+        assert other.stats()["rows"] == COMPACT_MIN_DEAD
+    queries = vectors[2 * COMPACT_MIN_DEAD:]
+    assert top_ids(reader, queries) == [[f"c{i}"] for i in range(2 * COMPACT_MIN_DEAD, rows)]
+
+    # Writes after compaction go to the new generation
+    reader.add(["new"], make_vectors(1, seed=1))
+    assert top_ids(index, make_vectors(1, seed=1)) == [["new"]]
+    assert len(SegmentedVectorIndex(str(tmp_path))) == COMPACT_MIN_DEAD + 1
+
+def test_compact_with_nothing_removed_is_a_no_op(tmp_path):
+    index = SegmentedVectorIndex(str(tmp_path))
+    index.add(["a", "b"], make_vectors(2))
+    index.compact()
+    assert index.stats()["generation"] == 0
+
+def test_in_memory_index_compacts_on_dead_rows():
+    rows = 3 * COMPACT_MIN_DEAD
+    vectors = make_vectors(rows)
+    index = VectorIndex()
+    index.add([f"c{i}" for i in range(rows)], vectors)
+    epoch = index._epoch
+    index.remove([f"c{i}" for i in range(2 * COMPACT_MIN_DEAD)])
+    assert index.stats()["rows"] == COMPACT_MIN_DEAD
+    assert index._epoch == epoch + 1
+    assert top_ids(index, vectors[-1]) == [[f"c{rows - 1}"]]
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    index = SegmentedVectorIndex(str(tmp_path))
+    index.add(["a"], make_vectors(1))
+    with pytest.raises(ValueError):
+        index.add(["b"], make_vectors(1, dimensions=8))
@@ -149,7 +149,7 @@ export interface Embedding {
   creator_id?: string;
   created_at?: string;
   completed_at?: string;
-  chunks?: any[];
+  num_chunks?: number;
 }
 
 // Response interfaces with pagination